@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Analizar el peso de las teselas de trees.pmtiles.
+
+Recorre los directorios del archivo, decodifica cada tesela MVT y reporta
+por zoom la distribución de bytes (comprimidos y crudos) y de features, un
+histograma de tamaños y las teselas más pesadas. Con presupuestos
+configurados termina con código 1 si alguna tesela los excede, para usarlo
+como control de regresión cuando cambian los datos o el teselado.
+
+El presupuesto por defecto es de 500 KB crudos (lo que decodifica el
+navegador) por tesela.
+
+Uso:
+    python scripts/analyze_pmtiles.py
+    python scripts/analyze_pmtiles.py otro/trees.pmtiles --top 20 --max-bytes 100000
+    python scripts/analyze_pmtiles.py --max-features 20000 --json reporte.json
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import numpy as np
+from pathlib import Path
+
+import mvt
+from archivo_pmtiles import COMPRESION_GZIP, LectorPMTiles
+
+BASE_DIR = Path(__file__).parent.parent
+WEB_PUBLIC = BASE_DIR / "web" / "public"
+
+# Presupuesto de bytes decodificados por tesela (móviles)
+MAX_CRUDO = 500_000
+TOP = 10
+
+# Límites superiores (bytes) de las columnas del histograma
+CUBETAS = [1_024, 4_096, 16_384, 65_536, 262_144, 500_000]
+ETIQUETAS_CUBETAS = ["<1K", "1-4K", "4-16K", "16-64K", "64-256K", "256-500K", ">500K"]
+
+
+def analizar(ruta):
+    """Header, metadata y una fila (z, x, y, bytes, crudo, features por capa) por tesela."""
+    teselas = []
+    with LectorPMTiles(ruta) as lector:
+        header = lector.header
+        metadata = lector.metadata()
+        comprimidas = header["tile_compression"] == COMPRESION_GZIP
+        previo = medida = None
+        for z, x, y, datos in lector.teselas():
+            # Las teselas repetidas (run_length) comparten los mismos bytes
+            if datos is not previo:
+                crudo = gzip.decompress(datos) if comprimidas else datos
+                capas = mvt.decodificar(crudo)
+                medida = (len(datos), len(crudo),
+                          {nombre: len(capa["features"]) for nombre, capa in capas.items()})
+                previo = datos
+            teselas.append((z, x, y, *medida))
+    return header, metadata, teselas
+
+
+def resumen_por_zoom(teselas):
+    """Estadísticas de bytes, crudo y features para cada zoom."""
+    por_zoom = {}
+    for z in sorted({t[0] for t in teselas}):
+        filas = [t for t in teselas if t[0] == z]
+        bytes_ = np.array([t[3] for t in filas])
+        crudo = np.array([t[4] for t in filas])
+        features = np.array([sum(t[5].values()) for t in filas])
+        histograma = np.bincount(np.searchsorted(CUBETAS, bytes_, side="left"),
+                                 minlength=len(ETIQUETAS_CUBETAS))
+        por_zoom[z] = {
+            "teselas": len(filas),
+            "bytes": int(bytes_.sum()),
+            "bytes_p50": int(np.percentile(bytes_, 50)),
+            "bytes_p90": int(np.percentile(bytes_, 90)),
+            "bytes_max": int(bytes_.max()),
+            "crudo_max": int(crudo.max()),
+            "features_p50": int(np.percentile(features, 50)),
+            "features_max": int(features.max()),
+            "histograma": dict(zip(ETIQUETAS_CUBETAS, histograma.tolist())),
+        }
+    return por_zoom
+
+
+def excedidas(teselas, max_bytes=None, max_crudo=None, max_features=None):
+    """Teselas que pasan algún presupuesto (los None no se controlan)."""
+    resultado = []
+    for z, x, y, bytes_, crudo, capas in teselas:
+        motivos = []
+        if max_bytes is not None and bytes_ > max_bytes:
+            motivos.append(f"{bytes_:,} bytes > {max_bytes:,}")
+        if max_crudo is not None and crudo > max_crudo:
+            motivos.append(f"{crudo:,} bytes crudos > {max_crudo:,}")
+        if max_features is not None and sum(capas.values()) > max_features:
+            motivos.append(f"{sum(capas.values()):,} features > {max_features:,}")
+        if motivos:
+            resultado.append({"tesela": f"{z}/{x}/{y}", "motivos": motivos})
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analizar el peso de las teselas de un PMTiles.")
+    parser.add_argument("pmtiles", type=Path, nargs="?", default=WEB_PUBLIC / "trees.pmtiles")
+    parser.add_argument("--top", type=int, default=TOP, help=f"teselas más pesadas a listar (default {TOP})")
+    parser.add_argument("--max-bytes", type=int, default=None,
+                        help="presupuesto de bytes comprimidos por tesela")
+    parser.add_argument("--max-crudo", type=int, default=MAX_CRUDO,
+                        help=f"presupuesto de bytes decodificados por tesela (default {MAX_CRUDO:,}; 0 = sin control)")
+    parser.add_argument("--max-features", type=int, default=None,
+                        help="presupuesto de features por tesela")
+    parser.add_argument("--json", type=Path, default=None, help="guardar el reporte en JSON")
+    args = parser.parse_args(argv)
+
+    header, metadata, teselas = analizar(args.pmtiles)
+    por_zoom = resumen_por_zoom(teselas)
+    pesadas = sorted(teselas, key=lambda t: (-t[3], t[0], t[1], t[2]))[:args.top]
+    problemas = excedidas(teselas, args.max_bytes, args.max_crudo or None, args.max_features)
+
+    print(f"{args.pmtiles} ({args.pmtiles.stat().st_size / 1024 / 1024:.1f} MB), "
+          f"zoom {header['min_zoom']}-{header['max_zoom']}, capas: "
+          f"{', '.join(c['id'] for c in metadata.get('vector_layers', []))}")
+    print(f"  {header['addressed_tiles']:,} teselas, {header['tile_entries']:,} entradas, "
+          f"{header['tile_contents']:,} contenidos distintos; directorio raíz "
+          f"{header['root_length']:,} bytes, hojas {header['leaf_length']:,} bytes")
+
+    print(f"\n{'zoom':>4s} {'teselas':>8s} {'total KB':>9s} {'p50':>8s} {'p90':>8s} {'max':>8s} "
+          f"{'crudo max':>10s} {'feat p50':>9s} {'feat max':>9s}")
+    for z, r in por_zoom.items():
+        print(f"{z:4d} {r['teselas']:8,} {r['bytes'] / 1024:9.0f} {r['bytes_p50']:8,} "
+              f"{r['bytes_p90']:8,} {r['bytes_max']:8,} {r['crudo_max']:10,} "
+              f"{r['features_p50']:9,} {r['features_max']:9,}")
+
+    print(f"\nTeselas por tamaño comprimido:\n{'zoom':>4s} " +
+          " ".join(f"{e:>8s}" for e in ETIQUETAS_CUBETAS))
+    for z, r in por_zoom.items():
+        print(f"{z:4d} " + " ".join(f"{n:8,}" for n in r["histograma"].values()))
+
+    print(f"\nLas {len(pesadas)} teselas más pesadas:")
+    for z, x, y, bytes_, crudo, capas in pesadas:
+        detalle = ", ".join(f"{nombre} {n:,}" for nombre, n in capas.items())
+        print(f"  {f'{z}/{x}/{y}':16s} {bytes_:9,} bytes {crudo:10,} crudos  ({detalle})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "archivo": str(args.pmtiles),
+                "por_zoom": por_zoom,
+                "mas_pesadas": [{"tesela": f"{z}/{x}/{y}", "bytes": b, "crudo": c, "features": capas}
+                                for z, x, y, b, c, capas in pesadas],
+                "excedidas": problemas,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\nReporte guardado en {args.json}")
+
+    if problemas:
+        print(f"\nError: {len(problemas):,} teselas exceden el presupuesto")
+        for problema in problemas[:args.top]:
+            print(f"  {problema['tesela']}: {'; '.join(problema['motivos'])}")
+        return 1
+    print("\nOK: todas las teselas dentro del presupuesto")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
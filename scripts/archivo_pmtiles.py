@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Lectura y escritura de archivos PMTiles v3.
+
+El archivo tiene un header fijo de 127 bytes, un directorio raíz (que debe
+entrar en los primeros 16 KB), metadata JSON, directorios hoja opcionales y
+los datos de las teselas. Los directorios se comprimen con gzip.
+
+Referencia: https://github.com/protomaps/PMTiles/blob/main/spec/v3/spec.md
+"""
+
+import gzip
+import json
+import shutil
+import struct
+import tempfile
+from dataclasses import dataclass
+
+MAGIC = b"PMTiles"
+VERSION = 3
+TAMANO_HEADER = 127
+# El header y el directorio raíz tienen que entrar en la primera lectura
+TAMANO_RAIZ_MAX = 16384
+
+# Compresión
+COMPRESION_NINGUNA = 1
+COMPRESION_GZIP = 2
+
+# Tipo de tesela
+TIPO_MVT = 1
+
+FORMATO_HEADER = "<7sB11QBBBBBBiiiiBii"
+
+
+@dataclass
+class Entrada:
+    tile_id: int
+    offset: int
+    largo: int
+    repeticiones: int  # run_length; 0 indica un directorio hoja
+
+
+# ── Tile IDs (curva de Hilbert por zoom) ────────────────────────────────────
+
+def zxy_a_tile_id(z, x, y):
+    """Tile ID de PMTiles: teselas de zooms previos + índice de Hilbert."""
+    acumulado = ((1 << (2 * z)) - 1) // 3
+    n = 1 << z
+    d = 0
+    s = n >> 1
+    while s > 0:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        if ry == 0:
+            if rx == 1:
+                x = n - 1 - x
+                y = n - 1 - y
+            x, y = y, x
+        s >>= 1
+    return acumulado + d
+
+
+def tile_id_a_zxy(tile_id):
+    """Inversa de zxy_a_tile_id."""
+    z = 0
+    acumulado = 0
+    while True:
+        en_zoom = 1 << (2 * z)
+        if tile_id < acumulado + en_zoom:
+            break
+        acumulado += en_zoom
+        z += 1
+    n = 1 << z
+    t = tile_id - acumulado
+    x = y = 0
+    s = 1
+    while s < n:
+        rx = 1 & (t // 2)
+        ry = 1 & (t ^ rx)
+        if ry == 0:
+            if rx == 1:
+                x = s - 1 - x
+                y = s - 1 - y
+            x, y = y, x
+        x += s * rx
+        y += s * ry
+        t //= 4
+        s <<= 1
+    return z, x, y
+
+
+# ── Directorios ──────────────────────────────────────────────────────────────
+
+def _varint(n, salida):
+    while n > 0x7F:
+        salida.append((n & 0x7F) | 0x80)
+        n >>= 7
+    salida.append(n)
+
+
+def _leer_varint(datos, pos):
+    resultado = 0
+    desplazamiento = 0
+    while True:
+        b = datos[pos]
+        pos += 1
+        resultado |= (b & 0x7F) << desplazamiento
+        if b < 0x80:
+            return resultado, pos
+        desplazamiento += 7
+
+
+def serializar_directorio(entradas):
+    """Directorio comprimido: columnas de varints con tile_id delta-codificado."""
+    salida = bytearray()
+    _varint(len(entradas), salida)
+    anterior = 0
+    for e in entradas:
+        _varint(e.tile_id - anterior, salida)
+        anterior = e.tile_id
+    for e in entradas:
+        _varint(e.repeticiones, salida)
+    for e in entradas:
+        _varint(e.largo, salida)
+    for i, e in enumerate(entradas):
+        # 0 = contiguo a la entrada anterior
+        if i > 0 and e.offset == entradas[i - 1].offset + entradas[i - 1].largo:
+            _varint(0, salida)
+        else:
+            _varint(e.offset + 1, salida)
+    return gzip.compress(bytes(salida), mtime=0)
+
+
+def deserializar_directorio(datos):
+    datos = gzip.decompress(datos)
+    n, pos = _leer_varint(datos, 0)
+    entradas = [Entrada(0, 0, 0, 0) for _ in range(n)]
+    anterior = 0
+    for e in entradas:
+        delta, pos = _leer_varint(datos, pos)
+        anterior += delta
+        e.tile_id = anterior
+    for e in entradas:
+        e.repeticiones, pos = _leer_varint(datos, pos)
+    for e in entradas:
+        e.largo, pos = _leer_varint(datos, pos)
+    for i, e in enumerate(entradas):
+        valor, pos = _leer_varint(datos, pos)
+        if valor == 0 and i > 0:
+            e.offset = entradas[i - 1].offset + entradas[i - 1].largo
+        else:
+            e.offset = valor - 1
+    return entradas
+
+
+def construir_directorios(entradas):
+    """Directorio raíz y directorios hoja (bytes) para las entradas dadas.
+
+    Si todas las entradas no entran en el directorio raíz se reparten en
+    hojas de tamaño creciente hasta que la raíz quepa.
+    """
+    raiz = serializar_directorio(entradas)
+    if len(raiz) <= TAMANO_RAIZ_MAX - TAMANO_HEADER:
+        return raiz, b""
+
+    tamano_hoja = 4096
+    while True:
+        hojas = bytearray()
+        entradas_raiz = []
+        for inicio in range(0, len(entradas), tamano_hoja):
+            bloque = entradas[inicio:inicio + tamano_hoja]
+            serializado = serializar_directorio(bloque)
+            entradas_raiz.append(Entrada(bloque[0].tile_id, len(hojas), len(serializado), 0))
+            hojas += serializado
+        raiz = serializar_directorio(entradas_raiz)
+        if len(raiz) <= TAMANO_RAIZ_MAX - TAMANO_HEADER:
+            return raiz, bytes(hojas)
+        tamano_hoja = int(tamano_hoja * 1.2)
+
+
+# ── Header ───────────────────────────────────────────────────────────────────
+
+def serializar_header(h):
+    return struct.pack(
+        FORMATO_HEADER, MAGIC, VERSION,
+        h["root_offset"], h["root_length"],
+        h["metadata_offset"], h["metadata_length"],
+        h["leaf_offset"], h["leaf_length"],
+        h["data_offset"], h["data_length"],
+        h["addressed_tiles"], h["tile_entries"], h["tile_contents"],
+        h["clustered"], h["internal_compression"], h["tile_compression"], h["tile_type"],
+        h["min_zoom"], h["max_zoom"],
+        h["min_lon_e7"], h["min_lat_e7"], h["max_lon_e7"], h["max_lat_e7"],
+        h["center_zoom"], h["center_lon_e7"], h["center_lat_e7"],
+    )
+
+
+def deserializar_header(datos):
+    valores = struct.unpack(FORMATO_HEADER, datos[:TAMANO_HEADER])
+    if valores[0] != MAGIC or valores[1] != VERSION:
+        raise ValueError("no es un archivo PMTiles v3")
+    nombres = [
+        "root_offset", "root_length", "metadata_offset", "metadata_length",
+        "leaf_offset", "leaf_length", "data_offset", "data_length",
+        "addressed_tiles", "tile_entries", "tile_contents",
+        "clustered", "internal_compression", "tile_compression", "tile_type",
+        "min_zoom", "max_zoom", "min_lon_e7", "min_lat_e7", "max_lon_e7", "max_lat_e7",
+        "center_zoom", "center_lon_e7", "center_lat_e7",
+    ]
+    return dict(zip(nombres, valores[2:]))
+
+
+# ── Escritura ────────────────────────────────────────────────────────────────
+
+class EscritorPMTiles:
+    """Escribe un PMTiles a partir de teselas agregadas en orden de tile_id.
+
+    Los datos se acumulan en un archivo temporal, así que la memoria no
+    depende del tamaño del archivo final. Teselas consecutivas idénticas se
+    guardan una sola vez (run_length).
+    """
+
+    def __init__(self, ruta, tile_compression=COMPRESION_GZIP, tile_type=TIPO_MVT):
+        self.ruta = ruta
+        self.tile_compression = tile_compression
+        self.tile_type = tile_type
+        self.entradas = []
+        self.contenidos = 0
+        self._datos = tempfile.TemporaryFile()
+        self._largo_datos = 0
+        self._ultimo = None
+
+    def agregar(self, tile_id, datos):
+        if self.entradas and tile_id <= self.entradas[-1].tile_id:
+            raise ValueError("las teselas deben agregarse en orden de tile_id")
+        anterior = self.entradas[-1] if self.entradas else None
+        if (anterior is not None and datos == self._ultimo
+                and tile_id == anterior.tile_id + anterior.repeticiones):
+            anterior.repeticiones += 1
+            return
+        self.entradas.append(Entrada(tile_id, self._largo_datos, len(datos), 1))
+        self._datos.write(datos)
+        self._largo_datos += len(datos)
+        self._ultimo = datos
+        self.contenidos += 1
+
+    def cerrar(self, metadata, min_zoom, max_zoom, limites, centro):
+        """Escribir header, directorios, metadata y datos.
+
+        limites = (min_lon, min_lat, max_lon, max_lat); centro = (lon, lat, zoom).
+        """
+        raiz, hojas = construir_directorios(self.entradas)
+        metadata = gzip.compress(json.dumps(metadata, ensure_ascii=False).encode("utf-8"), mtime=0)
+
+        offset_raiz = TAMANO_HEADER
+        offset_metadata = offset_raiz + len(raiz)
+        offset_hojas = offset_metadata + len(metadata)
+        offset_datos = offset_hojas + len(hojas)
+        header = serializar_header({
+            "root_offset": offset_raiz, "root_length": len(raiz),
+            "metadata_offset": offset_metadata, "metadata_length": len(metadata),
+            "leaf_offset": offset_hojas, "leaf_length": len(hojas),
+            "data_offset": offset_datos, "data_length": self._largo_datos,
+            "addressed_tiles": sum(e.repeticiones for e in self.entradas),
+            "tile_entries": len(self.entradas),
+            "tile_contents": self.contenidos,
+            "clustered": 1,
+            "internal_compression": COMPRESION_GZIP,
+            "tile_compression": self.tile_compression,
+            "tile_type": self.tile_type,
+            "min_zoom": min_zoom, "max_zoom": max_zoom,
+            "min_lon_e7": round(limites[0] * 1e7), "min_lat_e7": round(limites[1] * 1e7),
+            "max_lon_e7": round(limites[2] * 1e7), "max_lat_e7": round(limites[3] * 1e7),
+            "center_zoom": centro[2],
+            "center_lon_e7": round(centro[0] * 1e7), "center_lat_e7": round(centro[1] * 1e7),
+        })
+
+        with open(self.ruta, "wb") as f:
+            f.write(header)
+            f.write(raiz)
+            f.write(metadata)
+            f.write(hojas)
+            self._datos.seek(0)
+            shutil.copyfileobj(self._datos, f)
+        self._datos.close()
+        return offset_datos + self._largo_datos
+
+
+# ── Lectura ──────────────────────────────────────────────────────────────────
+
+class LectorPMTiles:
+    """Acceso a header, metadata y teselas de un PMTiles local."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._f = open(ruta, "rb")
+        self.header = deserializar_header(self._leer(0, TAMANO_HEADER))
+
+    def _leer(self, offset, largo):
+        self._f.seek(offset)
+        return self._f.read(largo)
+
+    def cerrar(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def metadata(self):
+        h = self.header
+        datos = self._leer(h["metadata_offset"], h["metadata_length"])
+        if h["internal_compression"] == COMPRESION_GZIP:
+            datos = gzip.decompress(datos)
+        return json.loads(datos)
+
+    def entradas(self):
+        """Todas las entradas de teselas (expandiendo directorios hoja)."""
+        h = self.header
+        yield from self._recorrer(self._leer(h["root_offset"], h["root_length"]))
+
+    def _recorrer(self, directorio):
+        for e in deserializar_directorio(directorio):
+            if e.repeticiones == 0:
+                yield from self._recorrer(self._leer(self.header["leaf_offset"] + e.offset, e.largo))
+            else:
+                yield e
+
+    def teselas(self):
+        """Iterar (z, x, y, datos) con los datos tal como están guardados."""
+        base = self.header["data_offset"]
+        for e in self.entradas():
+            datos = self._leer(base + e.offset, e.largo)
+            for k in range(e.repeticiones):
+                yield (*tile_id_a_zxy(e.tile_id + k), datos)
+
+    def tesela(self, z, x, y):
+        """Datos de una tesela (None si no existe)."""
+        tile_id = zxy_a_tile_id(z, x, y)
+        for e in self.entradas():
+            if e.tile_id <= tile_id < e.tile_id + e.repeticiones:
+                return self._leer(self.header["data_offset"] + e.offset, e.largo)
+            if e.tile_id > tile_id:
+                break
+        return None
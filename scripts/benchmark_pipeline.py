@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Benchmark de escala del pipeline sobre censos sintéticos.
+
+Para cada escala (por defecto 1x, 10x y 100x el censo real) genera los datos
+con generate_synthetic.py y corre cada etapa del pipeline en un proceso
+separado, apuntando sus rutas al directorio sintético. Registra tiempo real y
+pico de RSS por etapa (y las sub-etapas de cada metrics.json), y estima el
+exponente de escala: ~1 es lineal, valores mayores delatan etapas
+superlineales como los loops con iterrows.
+
+Uso:
+    python scripts/benchmark_pipeline.py --escalas 1 10 100
+    python scripts/benchmark_pipeline.py --escalas 0.1 0.5 1 --etapas merge_datasets geocode_improved
+"""
+
+import argparse
+import importlib
+import inspect
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from pathlib import Path
+
+import generate_synthetic
+from metrics import Metricas
+
+BASE_DIR = Path(__file__).parent.parent
+BENCHMARK_DIR = BASE_DIR / "data" / "benchmark"
+
+# Etapas en el orden del pipeline (cada una consume la salida de la anterior)
+ETAPAS = [
+    "analyze_data",
+    "merge_datasets",
+    "geocode_improved",
+    "geocode_inverso",
+    "clean_common_names",
+    "generate_geojson",
+    "generate_pmtiles",
+    "generate_addresses",
+    "generate_report",
+]
+
+# Exponente de escala a partir del cual una etapa se considera superlineal
+UMBRAL_SUPERLINEAL = 1.15
+
+
+def rutas_datos(datos):
+    """Rutas que cada script toma como constantes de módulo."""
+    processed = datos / "processed"
+    return {
+        "RAW_DIR": datos / "raw",
+        "PROCESSED_DIR": processed,
+        "WEB_PUBLIC": datos / "web",
+        "CSV_PATH": processed / "arboles_montevideo_geo.csv",
+        "DATA_FILE": processed / "arboles_montevideo_geo.csv",
+        "OUTPUT_FILE": processed / "reporte_arbolado.html",
+        "CACHE_DIR": processed / "cache" / "reporte",
+    }
+
+
+def ejecutar_etapa(modulo, datos, ruta_metrics):
+    """Correr el main() de un script con sus rutas redirigidas a datos/ (proceso hijo)."""
+    mod = importlib.import_module(modulo)
+    for nombre, ruta in rutas_datos(datos).items():
+        if hasattr(mod, nombre):
+            setattr(mod, nombre, ruta)
+
+    if "argv" in inspect.signature(mod.main).parameters:
+        mod.main(["--metrics", str(ruta_metrics)])
+    else:
+        # Scripts sin instrumentación propia: medir el main completo
+        metricas = Metricas(modulo)
+        with metricas.etapa("main"):
+            mod.main()
+        metricas.guardar(ruta_metrics)
+
+
+def medir_etapa(modulo, datos, ruta_metrics, ruta_log):
+    """Lanzar una etapa en un proceso hijo y medir tiempo y pico de RSS."""
+    comando = [
+        sys.executable, str(Path(__file__).resolve()),
+        "--ejecutar", modulo, "--datos", str(datos), "--metrics-hijo", str(ruta_metrics),
+    ]
+    inicio = time.perf_counter()
+    with open(ruta_log, "w") as log:
+        proceso = subprocess.Popen(comando, stdout=log, stderr=subprocess.STDOUT,
+                                   cwd=Path(__file__).parent)
+        _, estado, uso = os.wait4(proceso.pid, 0)
+    tiempo = time.perf_counter() - inicio
+    # wait4 ya recolectó al hijo: registrar el código para que Popen no lo espere
+    proceso.returncode = os.waitstatus_to_exitcode(estado)
+
+    pico = uso.ru_maxrss if sys.platform == "darwin" else uso.ru_maxrss * 1024
+    resultado = {
+        "etapa": modulo,
+        "ok": proceso.returncode == 0,
+        "tiempo_s": round(tiempo, 3),
+        "cpu_s": round(uso.ru_utime + uso.ru_stime, 3),
+        "rss_pico_bytes": pico,
+        "log": str(ruta_log),
+    }
+    if resultado["ok"] and ruta_metrics.exists():
+        with open(ruta_metrics) as f:
+            resultado["sub_etapas"] = {
+                e["etapa"]: e["tiempo_s"] for e in json.load(f)["etapas"]
+            }
+    return resultado
+
+
+def exponente(escalas, valores):
+    """Pendiente log-log de valores vs escala (None si no hay datos suficientes)."""
+    pares = [(e, v) for e, v in zip(escalas, valores) if v and v > 0]
+    if len(pares) < 2:
+        return None
+    x, y = np.log([p[0] for p in pares]), np.log([p[1] for p in pares])
+    return float(np.polyfit(x, y, 1)[0])
+
+
+def correr_benchmark(escalas, etapas, destino, regenerar=False):
+    """Generar datos y correr las etapas para cada escala."""
+    resultados = {}
+    for escala in escalas:
+        datos = destino / f"x{escala:g}"
+        print("\n" + "=" * 60)
+        print(f"ESCALA {escala:g}x → {datos}")
+        print("=" * 60)
+
+        if regenerar or not (datos / "raw" / "wfs_puertas.geojson").exists():
+            generate_synthetic.generar(escala, datos)
+        for sub in ("processed", "web", "metrics", "logs"):
+            (datos / sub).mkdir(parents=True, exist_ok=True)
+
+        resultados[escala] = {}
+        for etapa in etapas:
+            print(f"  {etapa}...", end=" ", flush=True)
+            r = medir_etapa(etapa, datos, datos / "metrics" / f"{etapa}.json",
+                            datos / "logs" / f"{etapa}.log")
+            resultados[escala][etapa] = r
+            estado = "ok" if r["ok"] else f"ERROR (ver {r['log']})"
+            print(f"{r['tiempo_s']:.1f}s, {r['rss_pico_bytes'] / 1024 / 1024:.0f} MB, {estado}")
+            if not r["ok"]:
+                break
+    return resultados
+
+
+def reporte(resultados, etapas):
+    """Curvas de tiempo y memoria por etapa, con su exponente de escala."""
+    escalas = sorted(resultados)
+    filas = []
+    for etapa in etapas:
+        medidas = [resultados[e].get(etapa) for e in escalas]
+        tiempos = [m["tiempo_s"] if m and m["ok"] else None for m in medidas]
+        memoria = [m["rss_pico_bytes"] if m and m["ok"] else None for m in medidas]
+        filas.append({
+            "etapa": etapa,
+            "tiempos_s": tiempos,
+            "rss_pico_bytes": memoria,
+            "exponente_tiempo": exponente(escalas, tiempos),
+            "exponente_memoria": exponente(escalas, memoria),
+        })
+
+        # Sub-etapas instrumentadas (metrics.json de cada script)
+        nombres = []
+        for m in medidas:
+            for nombre in (m or {}).get("sub_etapas", {}):
+                if nombre not in nombres:
+                    nombres.append(nombre)
+        for nombre in nombres:
+            sub = [(m or {}).get("sub_etapas", {}).get(nombre) for m in medidas]
+            filas.append({
+                "etapa": f"{etapa}/{nombre}",
+                "tiempos_s": sub,
+                "exponente_tiempo": exponente(escalas, sub),
+            })
+
+    cabecera = " ".join(f"{e:>9g}x" for e in escalas)
+    print("\n" + "=" * 60)
+    print("CURVAS DE ESCALA (tiempo en segundos)")
+    print("=" * 60)
+    print(f"{'Etapa':50s} {cabecera}  {'exp':>5s}")
+    for fila in filas:
+        valores = " ".join(f"{t:>10.2f}" if t is not None else f"{'-':>10s}" for t in fila["tiempos_s"])
+        exp = fila["exponente_tiempo"]
+        exp_txt = f"{exp:5.2f}" if exp is not None else "    -"
+        marca = "  ← SUPERLINEAL" if exp is not None and exp > UMBRAL_SUPERLINEAL else ""
+        print(f"{fila['etapa'][:50]:50s} {valores}  {exp_txt}{marca}")
+
+    print(f"\n{'Pico de RSS (MB)':50s} {cabecera}  {'exp':>5s}")
+    for fila in filas:
+        if "rss_pico_bytes" not in fila:
+            continue
+        valores = " ".join(f"{m / 1024 / 1024:>10.0f}" if m else f"{'-':>10s}" for m in fila["rss_pico_bytes"])
+        exp = fila["exponente_memoria"]
+        exp_txt = f"{exp:5.2f}" if exp is not None else "    -"
+        print(f"{fila['etapa']:50s} {valores}  {exp_txt}")
+    return filas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de escala del pipeline.")
+    parser.add_argument("--escalas", type=float, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--etapas", nargs="+", default=ETAPAS, choices=ETAPAS)
+    parser.add_argument("--destino", type=Path, default=BENCHMARK_DIR)
+    parser.add_argument("--regenerar", action="store_true",
+                        help="regenerar los datos sintéticos aunque ya existan")
+    # Uso interno: correr una sola etapa en el proceso hijo
+    parser.add_argument("--ejecutar", help=argparse.SUPPRESS)
+    parser.add_argument("--datos", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--metrics-hijo", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.ejecutar:
+        ejecutar_etapa(args.ejecutar, args.datos, args.metrics_hijo)
+        return
+
+    resultados = correr_benchmark(args.escalas, args.etapas, args.destino, args.regenerar)
+    filas = reporte(resultados, args.etapas)
+
+    salida = args.destino / "benchmark.json"
+    with open(salida, "w") as f:
+        json.dump({
+            "escalas": sorted(resultados),
+            "resultados": {f"{e:g}": r for e, r in resultados.items()},
+            "curvas": filas,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados guardados en {salida}")
+
+
+if __name__ == "__main__":
+    main()
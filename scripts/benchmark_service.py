@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de query_service.py.
+
+Levanta el servicio en un proceso aparte (o usa --url), abre varias
+conexiones keep-alive concurrentes y manda una mezcla de consultas
+armadas a partir de los datos reales: árbol por id, bbox de ~500 m,
+conteos filtrados y k vecinos más cercanos. Reporta peticiones por
+segundo y latencia p50/p99 por tipo de consulta, y la latencia de las
+mismas consultas llamando al índice en el proceso (sin HTTP).
+
+Uso:
+    python scripts/benchmark_service.py
+    python scripts/benchmark_service.py --conexiones 32 --peticiones 20000
+    python scripts/benchmark_service.py --url http://127.0.0.1:8765 --json carga.json
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+import numpy as np
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+import query_service
+
+CONEXIONES = 16
+PETICIONES = 10_000
+SEMILLA = 42
+# Medio lado de los bbox de prueba en grados (~500 m de lado)
+MEDIO_BBOX = 0.0025
+TIPOS = ["tree", "bbox", "count", "nearest"]
+
+
+def consultas(servicio, n, semilla=SEMILLA):
+    """Lista de (tipo, ruta, llamada directa al servicio) con una mezcla reproducible."""
+    rng = np.random.default_rng(semilla)
+    especies = [e for e in servicio.especies if e]
+    pesos = np.bincount(servicio.especie, minlength=len(servicio.especies))[1:].astype(float)
+    pesos /= pesos.sum()
+    resultado = []
+    for k in range(n):
+        tipo = TIPOS[k % len(TIPOS)]
+        fila = int(rng.integers(len(servicio)))
+        lat, lng = float(servicio.lat[fila]), float(servicio.lng[fila])
+        especie = especies[rng.choice(len(especies), p=pesos)] if rng.random() < 0.5 else None
+        filtro = f"&especie={quote(especie)}" if especie else ""
+        if tipo == "tree":
+            tree_id = int(servicio.ids[fila])
+            resultado.append((tipo, f"/tree/{tree_id}", lambda i=tree_id: servicio.arbol(i)))
+        elif tipo == "bbox":
+            caja = (lng - MEDIO_BBOX, lat - MEDIO_BBOX, lng + MEDIO_BBOX, lat + MEDIO_BBOX)
+            texto = ",".join(f"{v:.6f}" for v in caja)
+            resultado.append((tipo, f"/bbox?bbox={texto}{filtro}",
+                              lambda c=caja, e=especie: servicio.bbox(c, e)))
+        elif tipo == "count":
+            caja = (lng - MEDIO_BBOX, lat - MEDIO_BBOX, lng + MEDIO_BBOX, lat + MEDIO_BBOX)
+            texto = ",".join(f"{v:.6f}" for v in caja)
+            resultado.append((tipo, f"/count?bbox={texto}{filtro}",
+                              lambda c=caja, e=especie: servicio.conteo(c, e)))
+        else:
+            resultado.append((tipo, f"/nearest?lat={lat:.6f}&lng={lng:.6f}&k=10{filtro}",
+                              lambda la=lat, ln=lng, e=especie: servicio.cercanos(la, ln, 10, e)))
+    return resultado
+
+
+def percentiles(latencias):
+    """p50/p99/max en milisegundos."""
+    ms = np.array(latencias) * 1000
+    return {"n": len(ms), "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3), "max_ms": round(float(ms.max()), 3)}
+
+
+def medir_directo(lista):
+    """Latencia de cada consulta llamando al servicio en el proceso."""
+    por_tipo = {tipo: [] for tipo in TIPOS}
+    for tipo, _, llamada in lista:
+        inicio = time.perf_counter()
+        llamada()
+        por_tipo[tipo].append(time.perf_counter() - inicio)
+    return {tipo: percentiles(v) for tipo, v in por_tipo.items() if v}
+
+
+async def cliente(host, puerto, cola, por_tipo, errores):
+    """Una conexión keep-alive que consume consultas de la cola."""
+    lector, escritor = await asyncio.open_connection(host, puerto)
+    try:
+        while True:
+            try:
+                tipo, ruta = cola.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            inicio = time.perf_counter()
+            escritor.write(f"GET {ruta} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+            await escritor.drain()
+            status = int((await lector.readline()).split()[1])
+            largo = 0
+            while True:
+                linea = await lector.readline()
+                if linea in (b"\r\n", b""):
+                    break
+                nombre, _, valor = linea.decode("latin-1").partition(":")
+                if nombre.lower() == "content-length":
+                    largo = int(valor)
+            await lector.readexactly(largo)
+            por_tipo[tipo].append(time.perf_counter() - inicio)
+            if status not in (200, 404):
+                errores.append((ruta, status))
+    finally:
+        escritor.close()
+
+
+async def cargar(host, puerto, lista, conexiones):
+    cola = asyncio.Queue()
+    for tipo, ruta, _ in lista:
+        cola.put_nowait((tipo, ruta))
+    por_tipo = {tipo: [] for tipo in TIPOS}
+    errores = []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(host, puerto, cola, por_tipo, errores) for _ in range(conexiones)))
+    return time.perf_counter() - inicio, por_tipo, errores
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind((query_service.HOST, 0))
+        return s.getsockname()[1]
+
+
+def esperar_servicio(host, puerto, proceso, limite=120):
+    """Esperar a que el servicio acepte conexiones."""
+    fin = time.time() + limite
+    while time.time() < fin:
+        if proceso is not None and proceso.poll() is not None:
+            raise RuntimeError("el servicio terminó antes de aceptar conexiones")
+        try:
+            socket.create_connection((host, puerto), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"el servicio no respondió en {limite}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio de consultas.")
+    parser.add_argument("--url", default=None,
+                        help="servicio ya levantado (default: levantar uno en un proceso aparte)")
+    parser.add_argument("--datos", type=Path, default=None,
+                        help="trees-data.bin o CSV procesado (default web/public/trees-data.bin)")
+    parser.add_argument("--conexiones", type=int, default=CONEXIONES)
+    parser.add_argument("--peticiones", type=int, default=PETICIONES)
+    parser.add_argument("--json", type=Path, default=None, help="guardar el reporte en JSON")
+    args = parser.parse_args(argv)
+
+    # Las consultas se arman con los mismos datos que sirve el servicio
+    servicio = query_service.cargar_servicio(args.datos)
+    lista = consultas(servicio, args.peticiones)
+
+    print(f"\nLatencia en el proceso ({len(lista):,} consultas, sin HTTP)...")
+    directo = medir_directo(lista)
+
+    proceso = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, puerto = url.hostname, url.port
+    else:
+        host, puerto = query_service.HOST, puerto_libre()
+        comando = [sys.executable, str(Path(query_service.__file__)), "--puerto", str(puerto)]
+        if args.datos:
+            comando += ["--datos", str(args.datos)]
+        proceso = subprocess.Popen(comando, stdout=subprocess.DEVNULL)
+    try:
+        esperar_servicio(host, puerto, proceso)
+        print(f"Carga HTTP: {len(lista):,} peticiones, {args.conexiones} conexiones a {host}:{puerto}...")
+        duracion, por_tipo, errores = asyncio.run(cargar(host, puerto, lista, args.conexiones))
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait()
+
+    http = {tipo: percentiles(v) for tipo, v in por_tipo.items() if v}
+    total = sum(len(v) for v in por_tipo.values())
+    print(f"\n{total:,} peticiones en {duracion:.2f}s: {total / duracion:,.0f} peticiones/s"
+          f" ({len(errores)} errores)")
+    print(f"\n{'consulta':10s} {'n':>7s} {'HTTP p50':>10s} {'HTTP p99':>10s} "
+          f"{'índice p50':>11s} {'índice p99':>11s}   (ms)")
+    for tipo in TIPOS:
+        if tipo in http:
+            h, d = http[tipo], directo[tipo]
+            print(f"{tipo:10s} {h['n']:7,} {h['p50_ms']:10.3f} {h['p99_ms']:10.3f} "
+                  f"{d['p50_ms']:11.3f} {d['p99_ms']:11.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"peticiones": total, "conexiones": args.conexiones, "segundos": round(duracion, 3),
+                       "peticiones_por_s": round(total / duracion, 1), "errores": len(errores),
+                       "http": http, "indice": directo}, f, ensure_ascii=False, indent=2)
+        print(f"\nReporte guardado en {args.json}")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Índice de búsqueda por prefijo para especies y calles (search-index.json).
+
+Cada entrada es un texto de un campo (nombre común, nombre científico,
+calle) con la cantidad de árboles que le corresponden. Los textos se pliegan
+(sin tildes, minúsculas, puntuación como espacio) y se indexan por el
+sufijo que empieza en cada palabra, así "sombra" encuentra "Plátano de
+sombra". Los resultados se ordenan por cantidad de árboles.
+
+Los campos son libres: sumar otro idioma u otra ciudad es agregar entradas
+con su propio campo, sin cambiar el formato.
+
+Formato (columnar):
+    campos      nombres de los campos
+    campo, texto, n   una posición por entrada
+    claves      textos plegados desde cada palabra, ordenados
+    entrada_clave     entrada de cada clave
+    prefijos    {prefijo plegado de 1-2 letras: entradas mejor rankeadas}
+
+Uso (benchmark contra el filtro lineal del cliente):
+    python scripts/busqueda.py
+    python scripts/busqueda.py --consultas 5000
+"""
+
+import argparse
+import re
+import time
+import unicodedata
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from generate_addresses import rango_prefijo
+from metrics import Metricas, agregar_argumentos
+
+BASE_DIR = Path(__file__).parent.parent
+PROCESSED_DIR = BASE_DIR / "data" / "processed"
+
+VERSION = 1
+LARGO_PREFIJOS = 2
+LIMITE = 10
+
+# (campo, columna del CSV)
+CAMPOS = [
+    ("especie", "Nombre común"),
+    ("cientifico", "Nombre científico"),
+    ("calle", "Calle"),
+]
+
+
+def plegar(texto):
+    """Texto sin tildes, en minúsculas y con la puntuación como espacio."""
+    texto = unicodedata.normalize("NFKD", str(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).casefold()
+    return " ".join(re.sub(r"[^\w]+", " ", texto).split())
+
+
+def claves_de(texto):
+    """Sufijos del texto plegado que empiezan en cada palabra."""
+    plegado = plegar(texto)
+    return [plegado[m.start():] for m in re.finditer(r"(?<!\S)\S", plegado)]
+
+
+def entradas_desde_df(df):
+    """(campo, texto, árboles) de cada valor de cada campo presente en df."""
+    entradas = []
+    for campo, columna in CAMPOS:
+        if columna not in df.columns:
+            continue
+        conteos = df[columna].dropna().astype(str).str.strip()
+        conteos = conteos[conteos != ""].value_counts()
+        entradas += [(campo, texto, int(n)) for texto, n in conteos.items()]
+    return entradas
+
+
+def rankear(entradas, candidatas, limite):
+    """Entradas por árboles (mayor a menor), luego por texto."""
+    return sorted(set(candidatas), key=lambda e: (-entradas[e][2], entradas[e][1]))[:limite]
+
+
+def construir(entradas):
+    """Estructura de search-index.json a partir de (campo, texto, árboles)."""
+    campos = list(dict.fromkeys(e[0] for e in entradas))
+    pares = sorted((clave, k) for k, e in enumerate(entradas) for clave in set(claves_de(e[1])))
+    claves = [p[0] for p in pares]
+    entrada_clave = [p[1] for p in pares]
+
+    prefijos = {}
+    for largo in range(1, LARGO_PREFIJOS + 1):
+        for prefijo in sorted({c[:largo] for c in claves if len(c) >= largo}):
+            inicio, fin = rango_prefijo(claves, prefijo)
+            prefijos[prefijo] = rankear(entradas, entrada_clave[inicio:fin], LIMITE)
+
+    return {
+        "version": VERSION,
+        "campos": campos,
+        "campo": [campos.index(e[0]) for e in entradas],
+        "texto": [e[1] for e in entradas],
+        "n": [e[2] for e in entradas],
+        "claves": claves,
+        "entrada_clave": entrada_clave,
+        "prefijos": prefijos,
+    }
+
+
+class IndiceBusqueda:
+    """Implementación de referencia de la búsqueda sobre search-index.json."""
+
+    def __init__(self, datos):
+        self.entradas = [(datos["campos"][c], t, n)
+                         for c, t, n in zip(datos["campo"], datos["texto"], datos["n"])]
+        self.claves = datos["claves"]
+        self.entrada_clave = datos["entrada_clave"]
+        self.prefijos = datos["prefijos"]
+
+    def buscar(self, texto, campo=None, limite=LIMITE):
+        """[(campo, texto, árboles)] cuyo texto tiene una palabra que empieza con lo escrito."""
+        prefijo = plegar(texto)
+        if not prefijo:
+            return []
+        if campo is None and prefijo in self.prefijos:
+            encontradas = self.prefijos[prefijo][:limite]
+        else:
+            inicio, fin = rango_prefijo(self.claves, prefijo)
+            candidatas = self.entrada_clave[inicio:fin]
+            if campo is not None:
+                candidatas = [e for e in candidatas if self.entradas[e][0] == campo]
+            encontradas = rankear(self.entradas, candidatas, limite)
+        return [self.entradas[e] for e in encontradas]
+
+
+# ── Benchmark ────────────────────────────────────────────────────────────────
+
+def consultas_al_azar(entradas, n, semilla=42):
+    """Prefijos de una palabra de entradas elegidas por cantidad de árboles."""
+    rng = np.random.default_rng(semilla)
+    pesos = np.array([e[2] for e in entradas], dtype=float)
+    pesos /= pesos.sum()
+    resultado = []
+    for k in rng.choice(len(entradas), size=n, p=pesos).tolist():
+        palabras = entradas[k][1].split()
+        palabra = palabras[rng.integers(len(palabras))]
+        resultado.append(palabra[:rng.integers(1, len(palabra) + 1)].lower())
+    return resultado
+
+
+def buscar_lineal(entradas, texto, limite=LIMITE):
+    """Lo que hace hoy el cliente: recorrer todos los textos buscando la subcadena."""
+    texto = texto.lower()
+    return sorted((e for e in entradas if texto in e[1].lower()), key=lambda e: -e[2])[:limite]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del índice de búsqueda vs filtro lineal.")
+    parser.add_argument("--consultas", type=int, default=2_000)
+    agregar_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas = Metricas.desde_args("busqueda", args)
+
+    with metricas.etapa("construir_indice") as etapa:
+        df = pd.read_csv(PROCESSED_DIR / "arboles_montevideo_geo.csv",
+                         usecols=[c for _, c in CAMPOS], low_memory=False)
+        entradas = entradas_desde_df(df)
+        indice = IndiceBusqueda(construir(entradas))
+        etapa.filas_salida = len(indice.claves)
+    print(f"{len(entradas):,} entradas, {len(indice.claves):,} claves, {len(indice.prefijos):,} prefijos")
+
+    lista = consultas_al_azar(entradas, args.consultas)
+    tiempos = {}
+    for nombre, buscar in (("índice", indice.buscar), ("lineal", lambda t: buscar_lineal(entradas, t))):
+        with metricas.etapa(nombre, filas_entrada=len(lista)) as etapa:
+            medidas = []
+            for texto in lista:
+                inicio = time.perf_counter()
+                buscar(texto)
+                medidas.append(time.perf_counter() - inicio)
+            ms = np.array(medidas) * 1000
+            tiempos[nombre] = (float(np.percentile(ms, 50)), float(np.percentile(ms, 99)))
+            etapa.extra["p50_ms"] = round(tiempos[nombre][0], 4)
+            etapa.extra["p99_ms"] = round(tiempos[nombre][1], 4)
+
+    print(f"\n{len(lista):,} consultas de búsqueda mientras se escribe")
+    for nombre, (p50, p99) in tiempos.items():
+        print(f"  {nombre:8s} p50 {p50:.3f} ms, p99 {p99:.3f} ms")
+
+    metricas.guardar(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
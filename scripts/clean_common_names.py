@@ -11,9 +11,12 @@ Aplica correcciones de:
 - Corrección de nombre científico (Ginkgo bilboa → biloba)
 """
 
+import argparse
 import pandas as pd
 from pathlib import Path
 
+from metrics import Metricas, agregar_argumentos
+
 BASE_DIR = Path(__file__).parent.parent
 PROCESSED_DIR = BASE_DIR / "data" / "processed"
 CSV_PATH = PROCESSED_DIR / "arboles_montevideo_geo.csv"
@@ -652,9 +655,16 @@ SCIENTIFIC_NAME_FIXES = {
 }
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Limpiar nombres comunes de especies.")
+    agregar_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas = Metricas.desde_args("clean_common_names", args)
+
     print("Cargando datos...")
-    df = pd.read_csv(CSV_PATH, low_memory=False)
+    with metricas.etapa("cargar_csv") as etapa:
+        df = pd.read_csv(CSV_PATH, low_memory=False)
+        etapa.filas_salida = len(df)
     total = len(df)
     print(f"Total árboles: {total:,}")
 
@@ -662,89 +672,103 @@ def main():
     print(f"Sin nombre común antes: {sin_nombre_antes:,}")
 
     # ── H. Corrección de nombres científicos ─────────────────────────────
-    count_h = 0
-    for old, new in SCIENTIFIC_NAME_FIXES.items():
-        mask = df["Nombre científico"] == old
-        n = mask.sum()
-        if n > 0:
-            df.loc[mask, "Nombre científico"] = new
-            count_h += n
-            print(f"  '{old}' → '{new}': {n}")
-    print(f"Correcciones nombres científicos: {count_h:,}")
+    with metricas.etapa("H_nombres_cientificos", filas_entrada=total) as etapa:
+        count_h = 0
+        for old, new in SCIENTIFIC_NAME_FIXES.items():
+            mask = df["Nombre científico"] == old
+            n = mask.sum()
+            if n > 0:
+                df.loc[mask, "Nombre científico"] = new
+                count_h += n
+                print(f"  '{old}' → '{new}': {n}")
+        print(f"Correcciones nombres científicos: {count_h:,}")
+        etapa.filas_salida = count_h
 
     # ── A. Nombres con coma ──────────────────────────────────────────────
-    count_a = 0
-    for old, new in COMMA_FIXES.items():
-        mask = df["Nombre común"] == old
-        n = mask.sum()
-        if n > 0:
-            df.loc[mask, "Nombre común"] = new
-            count_a += n
-            print(f"  '{old}' → '{new}': {n}")
-    print(f"Correcciones coma: {count_a:,}")
+    with metricas.etapa("A_comas", filas_entrada=total) as etapa:
+        count_a = 0
+        for old, new in COMMA_FIXES.items():
+            mask = df["Nombre común"] == old
+            n = mask.sum()
+            if n > 0:
+                df.loc[mask, "Nombre común"] = new
+                count_a += n
+                print(f"  '{old}' → '{new}': {n}")
+        print(f"Correcciones coma: {count_a:,}")
+        etapa.filas_salida = count_a
 
     # ── B. Nombres truncados ─────────────────────────────────────────────
-    count_b = 0
-    for old, new in TRUNCATED_FIXES.items():
-        mask = df["Nombre común"] == old
-        n = mask.sum()
-        if n > 0:
-            df.loc[mask, "Nombre común"] = new
-            count_b += n
-            print(f"  '{old}' → '{new}': {n}")
-    print(f"Correcciones truncados: {count_b:,}")
+    with metricas.etapa("B_truncados", filas_entrada=total) as etapa:
+        count_b = 0
+        for old, new in TRUNCATED_FIXES.items():
+            mask = df["Nombre común"] == old
+            n = mask.sum()
+            if n > 0:
+                df.loc[mask, "Nombre común"] = new
+                count_b += n
+                print(f"  '{old}' → '{new}': {n}")
+        print(f"Correcciones truncados: {count_b:,}")
+        etapa.filas_salida = count_b
 
     # ── C. Abreviaciones científicas ─────────────────────────────────────
-    count_c = 0
-    for old, new in ABBREVIATION_FIXES.items():
-        mask = df["Nombre común"] == old
-        n = mask.sum()
-        if n > 0:
-            df.loc[mask, "Nombre común"] = new
-            count_c += n
-            print(f"  '{old}' → '{new}': {n}")
-    print(f"Correcciones abreviaciones: {count_c:,}")
+    with metricas.etapa("C_abreviaciones", filas_entrada=total) as etapa:
+        count_c = 0
+        for old, new in ABBREVIATION_FIXES.items():
+            mask = df["Nombre común"] == old
+            n = mask.sum()
+            if n > 0:
+                df.loc[mask, "Nombre común"] = new
+                count_c += n
+                print(f"  '{old}' → '{new}': {n}")
+        print(f"Correcciones abreviaciones: {count_c:,}")
+        etapa.filas_salida = count_c
 
     # ── D. Capitalización ────────────────────────────────────────────────
-    count_d = 0
-    for old, new in CAPITALIZATION_FIXES.items():
-        mask = df["Nombre común"] == old
-        n = mask.sum()
-        if n > 0:
-            df.loc[mask, "Nombre común"] = new
-            count_d += n
-            print(f"  '{old}' → '{new}': {n}")
-    print(f"Correcciones capitalización: {count_d:,}")
+    with metricas.etapa("D_capitalizacion", filas_entrada=total) as etapa:
+        count_d = 0
+        for old, new in CAPITALIZATION_FIXES.items():
+            mask = df["Nombre común"] == old
+            n = mask.sum()
+            if n > 0:
+                df.loc[mask, "Nombre común"] = new
+                count_d += n
+                print(f"  '{old}' → '{new}': {n}")
+        print(f"Correcciones capitalización: {count_d:,}")
+        etapa.filas_salida = count_d
 
     # ── E. Asignar nombre común por nombre científico ────────────────────
-    count_e = 0
-    sin_nombre = df["Nombre común"].isna()
-    for sci_name, common_name in SCIENTIFIC_TO_COMMON.items():
-        mask = sin_nombre & (df["Nombre científico"] == sci_name)
-        n = mask.sum()
-        if n > 0:
-            df.loc[mask, "Nombre común"] = common_name
-            count_e += n
-            print(f"  {sci_name} → '{common_name}': {n}")
-            # Update the mask after assignment
-            sin_nombre = df["Nombre común"].isna()
-    print(f"Asignaciones por nombre científico: {count_e:,}")
+    with metricas.etapa("E_cientifico_a_comun", filas_entrada=total) as etapa:
+        count_e = 0
+        sin_nombre = df["Nombre común"].isna()
+        for sci_name, common_name in SCIENTIFIC_TO_COMMON.items():
+            mask = sin_nombre & (df["Nombre científico"] == sci_name)
+            n = mask.sum()
+            if n > 0:
+                df.loc[mask, "Nombre común"] = common_name
+                count_e += n
+                print(f"  {sci_name} → '{common_name}': {n}")
+                # Update the mask after assignment
+                sin_nombre = df["Nombre común"].isna()
+        print(f"Asignaciones por nombre científico: {count_e:,}")
+        etapa.filas_salida = count_e
 
     # ── G. Unificación de nombres comunes ──────────────────────────────
-    # Combinar UNIFY_NAMES con SCIENTIFIC_TO_COMMON para corregir data entry errors
-    all_mappings = {**SCIENTIFIC_TO_COMMON, **UNIFY_NAMES}  # UNIFY_NAMES tiene prioridad
-
-    count_g = 0
-    for sci_name, common_name in all_mappings.items():
-        mask = (df["Nombre científico"] == sci_name) & (
-            df["Nombre común"].isna() | (df["Nombre común"] != common_name)
-        )
-        n = mask.sum()
-        if n > 0:
-            df.loc[mask, "Nombre común"] = common_name
-            count_g += n
-            print(f"  {sci_name} → '{common_name}': {n}")
-    print(f"Unificaciones (data entry fixes): {count_g:,}")
+    with metricas.etapa("G_unificacion", filas_entrada=total) as etapa:
+        # Combinar UNIFY_NAMES con SCIENTIFIC_TO_COMMON para corregir data entry errors
+        all_mappings = {**SCIENTIFIC_TO_COMMON, **UNIFY_NAMES}  # UNIFY_NAMES tiene prioridad
+
+        count_g = 0
+        for sci_name, common_name in all_mappings.items():
+            mask = (df["Nombre científico"] == sci_name) & (
+                df["Nombre común"].isna() | (df["Nombre común"] != common_name)
+            )
+            n = mask.sum()
+            if n > 0:
+                df.loc[mask, "Nombre común"] = common_name
+                count_g += n
+                print(f"  {sci_name} → '{common_name}': {n}")
+        print(f"Unificaciones (data entry fixes): {count_g:,}")
+        etapa.filas_salida = count_g
 
     # ── Resumen ──────────────────────────────────────────────────────────
     sin_nombre_despues = df["Nombre común"].isna().sum()
@@ -756,7 +780,11 @@ def main():
 
     # ── Guardar ──────────────────────────────────────────────────────────
     print(f"\nGuardando en {CSV_PATH}...")
-    df.to_csv(CSV_PATH, index=False)
+    with metricas.etapa("guardar_csv", filas_entrada=len(df)) as etapa:
+        df.to_csv(CSV_PATH, index=False)
+        etapa.filas_salida = len(df)
+
+    metricas.guardar(args.metrics)
     print("Listo.")
 
 
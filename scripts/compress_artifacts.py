@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Precomprimir los archivos de web/public en .gz, .br y .zst.
+
+Comprime cada artefacto con cada códec en hilos paralelos y escribe un
+reporte de tamaños (crudo vs cada códec). Si el contenido y el nivel no
+cambiaron desde la corrida anterior (hash SHA-256), no se vuelve a comprimir.
+
+Brotli y Zstandard son opcionales (paquetes brotli y zstandard): si no están
+instalados esos códecs se omiten. trees.pmtiles no se toca: sus teselas ya
+van comprimidas y el cliente lo lee por rangos de bytes.
+
+Uso:
+    python scripts/compress_artifacts.py
+    python scripts/compress_artifacts.py --codecs gz br --nivel-br 9
+    python scripts/compress_artifacts.py --forzar
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from metrics import Metricas, agregar_argumentos
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BASE_DIR = Path(__file__).parent.parent
+PROCESSED_DIR = BASE_DIR / "data" / "processed"
+WEB_PUBLIC = BASE_DIR / "web" / "public"
+
+# Artefactos a precomprimir (recorre también subdirectorios, p. ej. trees-data/)
+EXTENSIONES = {".json", ".bin", ".js", ".svg"}
+
+NIVELES = {"gz": 9, "br": 11, "zst": 19}
+
+
+def comprimir_gz(datos, nivel):
+    # mtime=0: el .gz no cambia si el contenido no cambia
+    return gzip.compress(datos, compresslevel=nivel, mtime=0)
+
+
+def comprimir_br(datos, nivel):
+    return brotli.compress(datos, quality=nivel)
+
+
+def comprimir_zst(datos, nivel):
+    return zstandard.ZstdCompressor(level=nivel).compress(datos)
+
+
+COMPRESORES = {
+    "gz": comprimir_gz,
+    "br": comprimir_br if brotli is not None else None,
+    "zst": comprimir_zst if zstandard is not None else None,
+}
+
+
+def artefactos(directorio):
+    """Archivos a comprimir, en orden estable."""
+    return sorted(
+        p for p in directorio.rglob("*")
+        if p.is_file() and p.suffix in EXTENSIONES
+    )
+
+
+def sha256(ruta):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def comprimir(ruta, codec, nivel):
+    """Escribir ruta.<codec>; devuelve su tamaño en bytes."""
+    datos = COMPRESORES[codec](ruta.read_bytes(), nivel)
+    destino = ruta.with_name(f"{ruta.name}.{codec}")
+    destino.write_bytes(datos)
+    return len(datos)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precomprimir los artefactos de web/public.")
+    parser.add_argument("--codecs", nargs="+", default=list(NIVELES), choices=list(NIVELES))
+    for codec, nivel in NIVELES.items():
+        parser.add_argument(f"--nivel-{codec}", type=int, default=nivel,
+                            help=f"nivel de compresión {codec} (default {nivel})")
+    parser.add_argument("--hilos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--forzar", action="store_true",
+                        help="recomprimir aunque el contenido no haya cambiado")
+    parser.add_argument("--reporte", type=Path, default=PROCESSED_DIR / "compresion.json",
+                        help="reporte de tamaños (también sirve de caché de hashes)")
+    agregar_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas = Metricas.desde_args("compress_artifacts", args)
+
+    codecs = []
+    for codec in args.codecs:
+        if COMPRESORES[codec] is None:
+            paquete = {"br": "brotli", "zst": "zstandard"}[codec]
+            print(f"Aviso: falta el paquete {paquete}, se omite .{codec}")
+        else:
+            codecs.append(codec)
+    niveles = {codec: getattr(args, f"nivel_{codec}") for codec in codecs}
+
+    previo = {}
+    if args.reporte.exists() and not args.forzar:
+        with open(args.reporte, encoding="utf-8") as f:
+            previo = json.load(f).get("archivos", {})
+
+    with metricas.etapa("hash") as etapa:
+        rutas = artefactos(WEB_PUBLIC)
+        hashes = {ruta: sha256(ruta) for ruta in rutas}
+        etapa.filas_salida = len(rutas)
+
+    archivos = {}
+    tareas = []
+    for ruta in rutas:
+        nombre = ruta.relative_to(WEB_PUBLIC).as_posix()
+        anterior = previo.get(nombre, {})
+        registro = {"sha256": hashes[ruta], "bytes": ruta.stat().st_size, "codecs": {}}
+        for codec in codecs:
+            hecho = anterior.get("codecs", {}).get(codec)
+            if (hecho and anterior.get("sha256") == hashes[ruta]
+                    and hecho["nivel"] == niveles[codec]
+                    and ruta.with_name(f"{ruta.name}.{codec}").exists()):
+                registro["codecs"][codec] = hecho
+            else:
+                tareas.append((nombre, ruta, codec))
+        archivos[nombre] = registro
+
+    print(f"Comprimiendo {len(tareas)} variantes ({len(rutas)} archivos, "
+          f"{', '.join(codecs)}; {args.hilos} hilos)...")
+    with metricas.etapa("comprimir", filas_entrada=len(tareas)) as etapa:
+        with ThreadPoolExecutor(max_workers=args.hilos) as pool:
+            futuros = [(nombre, codec, pool.submit(comprimir, ruta, codec, niveles[codec]))
+                       for nombre, ruta, codec in tareas]
+            for nombre, codec, futuro in futuros:
+                archivos[nombre]["codecs"][codec] = {"nivel": niveles[codec], "bytes": futuro.result()}
+        etapa.filas_salida = len(tareas)
+        etapa.extra["omitidos"] = len(rutas) * len(codecs) - len(tareas)
+
+    # ── Reporte ──────────────────────────────────────────────────────────
+    totales = {"crudo": sum(a["bytes"] for a in archivos.values())}
+    for codec in codecs:
+        totales[codec] = sum(a["codecs"][codec]["bytes"] for a in archivos.values())
+
+    print(f"\n{'Archivo':40s} {'crudo':>12s} " + " ".join(f"{c:>12s}" for c in codecs))
+    for nombre, archivo in archivos.items():
+        tamanos = " ".join(f"{archivo['codecs'][c]['bytes']:12,}" for c in codecs)
+        print(f"{nombre[:40]:40s} {archivo['bytes']:12,} {tamanos}")
+    tamanos = " ".join(f"{totales[c]:12,}" for c in codecs)
+    print(f"{'TOTAL':40s} {totales['crudo']:12,} {tamanos}")
+
+    args.reporte.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.reporte, "w", encoding="utf-8") as f:
+        json.dump({"niveles": niveles, "totales": totales, "archivos": archivos},
+                  f, ensure_ascii=False, indent=2)
+    print(f"\nReporte guardado en {args.reporte}")
+
+    metricas.guardar(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
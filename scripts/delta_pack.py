@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Paquetes delta entre versiones de trees-data.json.
+
+Compara dos versiones (dict por id de árbol) y genera un paquete con los
+registros agregados, eliminados y modificados (solo los campos que
+cambiaron), comprimido con gzip. Cada versión se identifica por el hash de
+su contenido canónico, y versiones.json guarda la cadena de deltas para que
+un cliente con una versión vieja aplique solo lo que le falta.
+
+Uso:
+    python scripts/delta_pack.py crear viejo/trees-data.json web/public/trees-data.json
+    python scripts/delta_pack.py aplicar viejo/trees-data.json web/public/deltas/<delta>.json.gz
+    python scripts/delta_pack.py aplicar-cadena viejo/trees-data.json
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+DELTAS_DIR = BASE_DIR / "web" / "public" / "deltas"
+
+VERSIONES = "versiones.json"
+LARGO_VERSION = 12
+
+
+def cargar(ruta):
+    """Leer un trees-data (.json o .json.gz)."""
+    ruta = Path(ruta)
+    datos = ruta.read_bytes()
+    if ruta.suffix == ".gz":
+        datos = gzip.decompress(datos)
+    return json.loads(datos)
+
+
+def version(registros):
+    """Hash del contenido, independiente del orden de los ids."""
+    canonico = json.dumps(registros, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonico.encode("utf-8")).hexdigest()[:LARGO_VERSION]
+
+
+def diferencias(base, nuevo):
+    """Delta de base a nuevo: agregados, eliminados y campos modificados."""
+    agregados = {k: v for k, v in nuevo.items() if k not in base}
+    eliminados = [k for k in base if k not in nuevo]
+    modificados = {}
+    for k, registro in nuevo.items():
+        previo = base.get(k)
+        if previo is None or previo == registro:
+            continue
+        if previo.keys() != registro.keys():
+            # Cambió la estructura del registro: se reemplaza entero
+            eliminados.append(k)
+            agregados[k] = registro
+            continue
+        modificados[k] = {campo: valor for campo, valor in registro.items()
+                          if previo[campo] != valor}
+    return {
+        "formato": "trees-data-delta",
+        "desde": version(base),
+        "hasta": version(nuevo),
+        "agregados": agregados,
+        "eliminados": eliminados,
+        "modificados": modificados,
+    }
+
+
+def aplicar(base, delta):
+    """Aplicar un delta; falla si la base o el resultado no son las versiones esperadas."""
+    if version(base) != delta["desde"]:
+        raise ValueError(f"la base no es la versión {delta['desde']}")
+    nuevo = dict(base)
+    for k in delta["eliminados"]:
+        del nuevo[k]
+    for k, cambios in delta["modificados"].items():
+        nuevo[k] = {**nuevo[k], **cambios}
+    nuevo.update(delta["agregados"])
+    if version(nuevo) != delta["hasta"]:
+        raise ValueError(f"el resultado no coincide con la versión {delta['hasta']}")
+    return nuevo
+
+
+def cadena(versiones, desde):
+    """Deltas a aplicar, en orden, para llevar `desde` a la versión actual (None si no hay)."""
+    por_origen = {d["desde"]: d for d in versiones["deltas"]}
+    pasos = []
+    actual = desde
+    while actual != versiones["actual"]:
+        paso = por_origen.get(actual)
+        if paso is None or paso in pasos:
+            return None
+        pasos.append(paso)
+        actual = paso["hasta"]
+    return pasos
+
+
+def aplicar_cadena(base, destino):
+    """Llevar base a la versión actual de destino/versiones.json; devuelve (nuevo, pasos)."""
+    with open(destino / VERSIONES, encoding="utf-8") as f:
+        versiones = json.load(f)
+    pasos = cadena(versiones, version(base))
+    if pasos is None:
+        raise ValueError(f"no hay cadena de deltas de {version(base)} a {versiones['actual']}")
+    for paso in pasos:
+        base = aplicar(base, cargar(destino / paso["archivo"]))
+    return base, pasos
+
+
+def crear(ruta_base, ruta_nuevo, destino):
+    """Escribir el delta en destino y agregarlo a versiones.json."""
+    base, nuevo = cargar(ruta_base), cargar(ruta_nuevo)
+    delta = diferencias(base, nuevo)
+    aplicar(base, delta)  # verificación: base + delta == nuevo
+
+    destino.mkdir(parents=True, exist_ok=True)
+    archivo = f"delta-{delta['desde']}-{delta['hasta']}.json.gz"
+    texto = json.dumps(delta, ensure_ascii=False, separators=(",", ":"))
+    datos = gzip.compress(texto.encode("utf-8"), compresslevel=9, mtime=0)
+    (destino / archivo).write_bytes(datos)
+
+    ruta_versiones = destino / VERSIONES
+    if ruta_versiones.exists():
+        with open(ruta_versiones, encoding="utf-8") as f:
+            versiones = json.load(f)
+    else:
+        versiones = {"actual": None, "versiones": [], "deltas": []}
+    conocidas = {v["version"] for v in versiones["versiones"]}
+    fecha = datetime.now().isoformat(timespec="seconds")
+    for v, registros in ((delta["desde"], base), (delta["hasta"], nuevo)):
+        if v not in conocidas:
+            versiones["versiones"].append({"version": v, "fecha": fecha, "arboles": len(registros)})
+            conocidas.add(v)
+    versiones["deltas"] = [d for d in versiones["deltas"] if d["desde"] != delta["desde"]]
+    versiones["deltas"].append({
+        "desde": delta["desde"],
+        "hasta": delta["hasta"],
+        "archivo": archivo,
+        "bytes": len(datos),
+        "agregados": len(delta["agregados"]),
+        "eliminados": len(delta["eliminados"]),
+        "modificados": len(delta["modificados"]),
+    })
+    versiones["actual"] = delta["hasta"]
+    with open(ruta_versiones, "w", encoding="utf-8") as f:
+        json.dump(versiones, f, ensure_ascii=False, indent=2)
+    return delta, destino / archivo, len(datos)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Paquetes delta de trees-data.json.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_crear = sub.add_parser("crear", help="generar el delta entre dos versiones")
+    p_crear.add_argument("base", type=Path)
+    p_crear.add_argument("nuevo", type=Path)
+    p_crear.add_argument("--destino", type=Path, default=DELTAS_DIR)
+    p_aplicar = sub.add_parser("aplicar", help="aplicar y verificar un delta")
+    p_aplicar.add_argument("base", type=Path)
+    p_aplicar.add_argument("delta", type=Path)
+    p_aplicar.add_argument("--salida", type=Path, help="escribir el resultado como trees-data.json")
+    p_cadena = sub.add_parser("aplicar-cadena",
+                              help="llevar una versión a la actual con la cadena de versiones.json")
+    p_cadena.add_argument("base", type=Path)
+    p_cadena.add_argument("--destino", type=Path, default=DELTAS_DIR)
+    p_cadena.add_argument("--salida", type=Path, help="escribir el resultado como trees-data.json")
+    args = parser.parse_args(argv)
+
+    if args.comando == "crear":
+        delta, ruta, tamano = crear(args.base, args.nuevo, args.destino)
+        completo = len(gzip.compress(args.nuevo.read_bytes(), 9, mtime=0)) \
+            if args.nuevo.suffix != ".gz" else args.nuevo.stat().st_size
+        print(f"Delta {delta['desde']} -> {delta['hasta']}: "
+              f"{len(delta['agregados']):,} agregados, {len(delta['eliminados']):,} eliminados, "
+              f"{len(delta['modificados']):,} modificados")
+        print(f"  {ruta} ({tamano / 1024:.1f} KB vs {completo / 1024:.1f} KB la versión completa)")
+        print(f"  {args.destino / VERSIONES} actualizado")
+        return 0
+
+    try:
+        if args.comando == "aplicar-cadena":
+            nuevo, pasos = aplicar_cadena(cargar(args.base), args.destino)
+        else:
+            nuevo = aplicar(cargar(args.base), cargar(args.delta))
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    if args.comando == "aplicar-cadena":
+        print(f"OK: {len(pasos)} delta(s) aplicados, versión {version(nuevo)} ({len(nuevo):,} árboles)")
+    else:
+        print(f"OK: base + delta = versión {version(nuevo)} ({len(nuevo):,} árboles)")
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(nuevo, f, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
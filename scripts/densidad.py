@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Rasterizado de densidad de puntos a PNG, al estilo de datashader.
+
+Agrega todos los árboles en una grilla de píxeles (conteos por celda con
+numpy, opcionalmente por especie), los sombrea con escala logarítmica o
+ecualización de histograma y escribe un PNG RGBA sin dependencias (zlib y
+struct). El resultado se usa como imagen superpuesta en un mapa: las filas
+son uniformes en Web Mercator, así la imagen coincide con el mapa base al
+estirarla entre las esquinas de la extensión.
+"""
+
+import struct
+import zlib
+import numpy as np
+
+ANCHO = 800
+# Alto máximo del raster: una extensión alta y angosta no agranda la grilla
+ALTO_MAXIMO = 2 * ANCHO
+# (lng0, lat0, lng1, lat1) máximo del mapa: Montevideo y alrededores. Los
+# puntos fuera (coordenadas mal geocodificadas) no agrandan la extensión.
+LIMITES = (-56.60, -35.00, -55.50, -34.40)
+# Colores de la rampa de densidad (bajo -> alto)
+RAMPA = ("#c7e9c0", "#00441b")
+# Colores de las especies más comunes en el modo por especie (el resto: gris)
+COLORES_ESPECIES = ["#1b9e77", "#d95f02", "#7570b3", "#e7298a",
+                    "#66a61e", "#e6ab02", "#a6761d", "#1f78b4"]
+COLOR_OTRAS = "#999999"
+ALFA_MINIMO = 40
+
+
+def mercator_y(lat):
+    lat = np.radians(np.clip(lat, -85, 85))
+    return np.log(np.tan(np.pi / 4 + lat / 2))
+
+
+def extension(lat, lng, margen=1e-4, limites=LIMITES):
+    """(lng0, lat0, lng1, lat1) de los puntos dentro de limites, con un margen en grados.
+
+    Sin puntos dentro de limites devuelve limites.
+    """
+    lat, lng = np.asarray(lat, dtype=float), np.asarray(lng, dtype=float)
+    lng0, lat0, lng1, lat1 = limites
+    dentro = (lng >= lng0) & (lng <= lng1) & (lat >= lat0) & (lat <= lat1)
+    if not dentro.any():
+        return tuple(float(v) for v in limites)
+    lat, lng = lat[dentro], lng[dentro]
+    return (max(float(lng.min()) - margen, lng0), max(float(lat.min()) - margen, lat0),
+            min(float(lng.max()) + margen, lng1), min(float(lat.max()) + margen, lat1))
+
+
+def tamano(ext, ancho=ANCHO):
+    """(ancho, alto) en píxeles respetando la proporción en Mercator (alto hasta ALTO_MAXIMO)."""
+    lng0, lat0, lng1, lat1 = ext
+    alto_rel = (mercator_y(lat1) - mercator_y(lat0)) / max(np.radians(lng1 - lng0), 1e-12)
+    return ancho, min(max(1, int(round(ancho * alto_rel))), ALTO_MAXIMO)
+
+
+def agregar(lat, lng, ext, ancho=ANCHO, categorias=None, n_categorias=1):
+    """Conteos (n_categorias, alto, ancho); la fila 0 es el norte.
+
+    categorias es el código (0..n_categorias-1) de cada punto; los puntos
+    fuera de la extensión se descartan.
+    """
+    lng0, lat0, lng1, lat1 = ext
+    ancho, alto = tamano(ext, ancho)
+    lat = np.asarray(lat, dtype=float)
+    lng = np.asarray(lng, dtype=float)
+    x = (lng - lng0) / (lng1 - lng0) * ancho
+    y = (mercator_y(lat1) - mercator_y(lat)) / (mercator_y(lat1) - mercator_y(lat0)) * alto
+    dentro = (x >= 0) & (x <= ancho) & (y >= 0) & (y <= alto)
+    celda = (np.minimum(y[dentro], alto - 1).astype(np.int64) * ancho +
+             np.minimum(x[dentro], ancho - 1).astype(np.int64))
+    if categorias is not None:
+        celda = celda + np.asarray(categorias)[dentro].astype(np.int64) * (alto * ancho)
+    conteos = np.bincount(celda, minlength=n_categorias * alto * ancho)
+    return conteos.astype(np.uint32).reshape(n_categorias, alto, ancho)
+
+
+# ── Sombreado ────────────────────────────────────────────────────────────────
+
+def normalizar(conteos, como="eq_hist"):
+    """Valores en [0, 1] por píxel (0 = vacío) con escala log o eq_hist."""
+    conteos = np.asarray(conteos, dtype=float)
+    resultado = np.zeros_like(conteos)
+    ocupados = conteos > 0
+    if not ocupados.any():
+        return resultado
+    if como == "log":
+        resultado[ocupados] = np.log1p(conteos[ocupados]) / np.log1p(conteos.max())
+    elif como == "eq_hist":
+        valores = np.sort(conteos[ocupados])
+        resultado[ocupados] = np.searchsorted(valores, conteos[ocupados], side="right") / len(valores)
+    else:
+        raise ValueError(f"sombreado desconocido: {como}")
+    return resultado
+
+
+def rgb(color):
+    return np.array([int(color[k:k + 2], 16) for k in (1, 3, 5)], dtype=float)
+
+
+def sombrear(conteos, como="eq_hist", rampa=RAMPA):
+    """RGBA uint8 (alto, ancho, 4) de una grilla de conteos con la rampa de color."""
+    t = normalizar(conteos, como)
+    bajo, alto = rgb(rampa[0]), rgb(rampa[1])
+    imagen = np.zeros(t.shape + (4,), dtype=np.uint8)
+    imagen[..., :3] = np.rint(bajo + t[..., None] * (alto - bajo))
+    imagen[..., 3] = np.where(t > 0, np.rint(ALFA_MINIMO + t * (255 - ALFA_MINIMO)), 0)
+    return imagen
+
+
+def sombrear_categorias(conteos, colores, como="eq_hist"):
+    """RGBA mezclando el color de cada categoría según su peso en el píxel.
+
+    El alfa sale de la densidad total, como el sombreado categórico de
+    datashader.
+    """
+    conteos = np.asarray(conteos, dtype=float)
+    total = conteos.sum(axis=0)
+    paleta = np.array([rgb(c) for c in colores])
+    mezcla = np.einsum("kyx,kc->yxc", conteos, paleta) / np.maximum(total, 1)[..., None]
+    t = normalizar(total, como)
+    imagen = np.zeros(total.shape + (4,), dtype=np.uint8)
+    imagen[..., :3] = np.rint(mezcla)
+    imagen[..., 3] = np.where(t > 0, np.rint(ALFA_MINIMO + t * (255 - ALFA_MINIMO)), 0)
+    return imagen
+
+
+# ── PNG ──────────────────────────────────────────────────────────────────────
+
+def png(imagen, nivel=9):
+    """Bytes PNG de una imagen RGBA uint8 (alto, ancho, 4)."""
+    alto, ancho, _ = imagen.shape
+    filas = np.zeros((alto, ancho * 4 + 1), dtype=np.uint8)  # byte de filtro 0 por fila
+    filas[:, 1:] = imagen.reshape(alto, ancho * 4)
+
+    def bloque(tipo, datos):
+        return (struct.pack(">I", len(datos)) + tipo + datos +
+                struct.pack(">I", zlib.crc32(tipo + datos) & 0xFFFFFFFF))
+
+    return (b"\x89PNG\r\n\x1a\n" +
+            bloque(b"IHDR", struct.pack(">IIBBBBB", ancho, alto, 8, 6, 0, 0, 0)) +
+            bloque(b"IDAT", zlib.compress(filas.tobytes(), nivel)) +
+            bloque(b"IEND", b""))
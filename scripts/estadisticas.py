@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Cubo de agregados precalculados para la web (stats-cube.json).
+
+Cuenta árboles por especie × CCZ × estado (EV) × rango de altura × rango de
+CAP en una sola agrupación, y de esas mismas celdas deriva los resúmenes por
+especie, por CCZ y del total (promedios de altura, CAP y copa, altura máxima,
+distribución de estados). Se agregan las calles con más árboles. Así el modal
+de estadísticas y los contadores de los filtros no necesitan los datos por
+árbol.
+
+Formato: cada dimensión es una lista de valores (null = sin dato) y cada
+celda es [i_especie, i_ccz, i_estado, i_altura, i_cap, árboles] con índices
+a esas listas.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Rangos de altura (m), los mismos que muestra StatsModal
+BORDES_ALTURA = [0, 5, 10, 15, 20]
+# Rangos de CAP (cm)
+BORDES_CAP = [0, 30, 60, 90, 120, 180]
+# Alturas mayores se consideran errores de carga para la altura máxima
+ALTURA_MAX_VALIDA = 50
+# Calles con más árboles incluidas en el resumen
+CALLES_TOP = 10
+
+DIMENSIONES = ["especie", "ccz", "estado", "altura", "cap"]
+
+
+def etiquetas(bordes, unidad):
+    """'0-5m', '5-10m', ..., '20+m'."""
+    pares = [f"{a}-{b}{unidad}" for a, b in zip(bordes, bordes[1:])]
+    return pares + [f"{bordes[-1]}+{unidad}"]
+
+
+def rango(valores, bordes):
+    """Índice de rango de cada valor; -1 si falta o no es positivo."""
+    indices = np.searchsorted(bordes, valores, side="right") - 1
+    return np.where(np.isnan(valores) | (valores <= 0), -1, indices)
+
+
+def codificar(serie):
+    """Códigos y valores de una dimensión; el código -1 (sin dato) va al final."""
+    codigos, unicos = pd.factorize(serie, sort=True)
+    return codigos, [v.item() if hasattr(v, "item") else v for v in unicos]
+
+
+def resumenes(celdas, dimension=None):
+    """Estadísticas por valor de una dimensión (o del total) sumando celdas."""
+    claves = celdas[dimension] if dimension else np.zeros(len(celdas), dtype=np.int64)
+    celdas = celdas[claves >= 0].assign(_clave=claves[claves >= 0])
+    sumas = celdas.groupby("_clave").agg({
+        "arboles": "sum",
+        "altura_suma": "sum", "altura_n": "sum",
+        "cap_suma": "sum", "cap_n": "sum",
+        "copa_suma": "sum", "copa_n": "sum",
+        "altura_max": "max",
+    })
+    con_estado = celdas[celdas["estado"] >= 0]
+    estados = con_estado.groupby(["_clave", "estado"])["arboles"].sum()
+
+    def media(fila, columna):
+        n = fila[f"{columna}_n"]
+        return round(float(fila[f"{columna}_suma"] / n), 2) if n else None
+
+    resultado = {}
+    for clave, fila in sumas.iterrows():
+        resultado[clave] = {
+            "arboles": int(fila["arboles"]),
+            "altura_media": media(fila, "altura"),
+            "cap_media": media(fila, "cap"),
+            "copa_media": media(fila, "copa"),
+            "altura_max": float(fila["altura_max"]) if fila["altura_max"] > 0 else None,
+            "estado": {},
+        }
+    for (clave, estado), n in estados.items():
+        resultado[clave]["estado"][int(estado)] = int(n)
+    return resultado
+
+
+def construir_cubo(df):
+    """Cubo y resúmenes a partir de las filas del dataset (una sola agrupación)."""
+    especie, especies = codificar(df["Nombre común"])
+    ccz, cczs = codificar(df["CCZ"].astype("Int64"))
+    estado, estados = codificar(df["EV"].astype("Int64"))
+
+    altura = df["Altura"].to_numpy(dtype=float)
+    cap = df["CAP"].to_numpy(dtype=float)
+    copa = df["Diametro Copa"].to_numpy(dtype=float)
+    positivos = {nombre: np.nan_to_num(v) > 0
+                 for nombre, v in (("altura", altura), ("cap", cap), ("copa", copa))}
+
+    filas = pd.DataFrame({
+        "especie": especie,
+        "ccz": ccz,
+        "estado": estado,
+        "altura": rango(altura, BORDES_ALTURA),
+        "cap": rango(cap, BORDES_CAP),
+        "arboles": 1,
+        "altura_suma": np.where(positivos["altura"], altura, 0.0),
+        "altura_n": positivos["altura"].astype(np.int64),
+        "cap_suma": np.where(positivos["cap"], cap, 0.0),
+        "cap_n": positivos["cap"].astype(np.int64),
+        "copa_suma": np.where(positivos["copa"], copa, 0.0),
+        "copa_n": positivos["copa"].astype(np.int64),
+        "altura_max": np.where(positivos["altura"] & (np.nan_to_num(altura) <= ALTURA_MAX_VALIDA),
+                               altura, 0.0),
+    })
+    celdas = filas.groupby(DIMENSIONES, sort=True).agg({
+        "arboles": "sum",
+        "altura_suma": "sum", "altura_n": "sum",
+        "cap_suma": "sum", "cap_n": "sum",
+        "copa_suma": "sum", "copa_n": "sum",
+        "altura_max": "max",
+    }).reset_index()
+    # Los estados del resumen usan el código del EV, no su valor: mapear
+    por_estado = celdas.assign(estado=np.where(
+        celdas["estado"] >= 0, np.take(estados, celdas["estado"], mode="clip"), -1))
+
+    valores = {
+        "especie": especies,
+        "ccz": cczs,
+        "estado": estados,
+        "altura": etiquetas(BORDES_ALTURA, "m"),
+        "cap": etiquetas(BORDES_CAP, "cm"),
+    }
+    # El código -1 (sin dato) apunta al null agregado al final de cada dimensión
+    indices = [np.where(celdas[d] < 0, len(valores[d]), celdas[d]) for d in DIMENSIONES]
+
+    calles = df["Calle"].dropna().str.strip()
+    calles_top = calles[calles != ""].value_counts().head(CALLES_TOP)
+
+    return {
+        "version": 1,
+        "total": len(df),
+        "dimensiones": {d: valores[d] + [None] for d in DIMENSIONES},
+        "columnas": DIMENSIONES + ["arboles"],
+        "celdas": np.column_stack(indices + [celdas["arboles"]]).tolist(),
+        "resumen": {
+            "total": resumenes(por_estado)[0],
+            "especie": {especies[k]: r for k, r in resumenes(por_estado, "especie").items()},
+            "ccz": {str(cczs[k]): r for k, r in resumenes(por_estado, "ccz").items()},
+        },
+        "calles_top": [[calle, int(n)] for calle, n in calles_top.items()],
+    }
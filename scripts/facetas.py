@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Índices de bitmaps por faceta para filtrar árboles (facets.bin).
+
+Para cada valor de cada faceta (especie, CCZ, estado, interferencia aérea
+y subterránea, rango de altura) se guarda el conjunto de ids de árbol como
+bitmap Roaring (ver roaring.py). Un filtro combina con OR los valores
+elegidos de una faceta y con AND las facetas entre sí, así que cualquier
+combinación se resuelve con operaciones sobre bitmaps, sin recorrer filas.
+Las filas sin dato en una faceta no entran en ningún bitmap de esa faceta.
+
+Estructura de facets.bin (little-endian):
+
+    magic    8 bytes   b"FACETAS1"
+    largo    uint32    largo del header JSON
+    header   JSON      {"version", "arboles", "todos", "facetas": [...]}
+    (relleno hasta múltiplo de 8)
+    bitmaps            formato portable de Roaring, cada uno alineado a 8
+
+Cada faceta del header tiene nombre, columna de origen y una lista de
+valores con {"valor", "arboles", "offset", "largo"}; los offsets son desde
+el inicio de la sección de bitmaps. "todos" ubica el bitmap con todos los
+ids.
+
+Uso (benchmark contra filtrar el DataFrame):
+    python scripts/facetas.py
+    python scripts/facetas.py --consultas 2000
+"""
+
+import argparse
+import json
+import struct
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+import estadisticas
+from metrics import Metricas, agregar_argumentos
+from roaring import Bitmap
+
+BASE_DIR = Path(__file__).parent.parent
+PROCESSED_DIR = BASE_DIR / "data" / "processed"
+
+MAGIC = b"FACETAS1"
+VERSION = 1
+ALINEACION = 8
+
+# (faceta, columna del CSV)
+FACETAS = [
+    ("especie", "Nombre común"),
+    ("ccz", "CCZ"),
+    ("estado", "EV"),
+    ("int_aerea", "Int.Aerea"),
+    ("int_sub", "Int.Sub"),
+    ("altura", "Altura"),
+]
+
+
+def valores_faceta(df, columna):
+    """Valor de la faceta por fila (None sin dato); la altura va por rangos."""
+    if columna == "Altura":
+        nombres = estadisticas.etiquetas(estadisticas.BORDES_ALTURA, "m")
+        indices = estadisticas.rango(df[columna].to_numpy(dtype=float), estadisticas.BORDES_ALTURA)
+        return pd.Series([nombres[i] if i >= 0 else None for i in indices.tolist()], index=df.index)
+    serie = df[columna]
+    if columna in ("CCZ", "EV"):
+        serie = serie.astype("Int64")
+    return serie.astype(object).where(serie.notna(), None)
+
+
+class IndiceFacetas:
+    """Bitmaps de ids por valor de faceta; filtros como {faceta: valor o [valores]}."""
+
+    def __init__(self, todos, facetas):
+        self.todos = todos
+        self.facetas = facetas  # {faceta: {valor: Bitmap}}
+
+    @classmethod
+    def desde_df(cls, df):
+        """Índice de las filas de df (ya sin ids repetidos); omite columnas ausentes."""
+        ids = df["Arbol"].to_numpy(dtype=float).astype(np.int64)
+        facetas = {}
+        for nombre, columna in FACETAS:
+            if columna not in df.columns:
+                continue
+            codigos, unicos = pd.factorize(valores_faceta(df, columna), sort=True)
+            orden = np.argsort(codigos, kind="stable")
+            limites = np.searchsorted(codigos[orden], np.arange(len(unicos) + 1))
+            facetas[nombre] = {
+                (v.item() if hasattr(v, "item") else v):
+                    Bitmap.desde_valores(ids[orden[limites[k]:limites[k + 1]]])
+                for k, v in enumerate(unicos)
+            }
+        return cls(Bitmap.desde_valores(ids), facetas)
+
+    def _faceta(self, nombre, valores):
+        if nombre not in self.facetas:
+            raise KeyError(f"faceta desconocida: {nombre}")
+        if not isinstance(valores, (list, tuple, set)):
+            valores = [valores]
+        por_valor = self.facetas[nombre]
+        return Bitmap.union_de(por_valor[v] for v in valores if v in por_valor)
+
+    def filtrar(self, filtros=None, excepto=None):
+        """Bitmap de ids que cumplen los filtros (OR dentro de la faceta, AND entre facetas)."""
+        conjuntos = [self._faceta(nombre, valores) for nombre, valores in (filtros or {}).items()
+                     if nombre != excepto]
+        return Bitmap.interseccion_de(conjuntos) if conjuntos else self.todos
+
+    def conteo(self, filtros=None):
+        return len(self.filtrar(filtros))
+
+    def ids(self, filtros=None):
+        """Ids ordenados que cumplen los filtros."""
+        return self.filtrar(filtros).valores()
+
+    def conteos_por_faceta(self, filtros=None):
+        """Cantidad por valor de cada faceta con los filtros de las demás facetas.
+
+        Es lo que muestran los contadores de un panel de filtros: elegir más
+        valores de una faceta no cambia los conteos de esa misma faceta.
+        """
+        resultado = {}
+        for nombre, por_valor in self.facetas.items():
+            base = self.filtrar(filtros, excepto=nombre)
+            resultado[nombre] = {valor: len(base & bitmap) for valor, bitmap in por_valor.items()}
+        return resultado
+
+    # ── Archivo ──────────────────────────────────────────────────────────────
+
+    def escribir(self, ruta):
+        """Escribir facets.bin; devuelve el tamaño en bytes."""
+        datos = []
+        offset = 0
+
+        def agregar(bitmap):
+            nonlocal offset
+            serializado = bitmap.serializar()
+            datos.append(serializado + b"\0" * (-len(serializado) % ALINEACION))
+            ubicacion = {"arboles": len(bitmap), "offset": offset, "largo": len(serializado)}
+            offset += len(datos[-1])
+            return ubicacion
+
+        todos = agregar(self.todos)
+        facetas = [{
+            "nombre": nombre,
+            "columna": columna,
+            "valores": [{"valor": valor, **agregar(bitmap)}
+                        for valor, bitmap in self.facetas[nombre].items()],
+        } for nombre, columna in FACETAS if nombre in self.facetas]
+        header = json.dumps({
+            "version": VERSION,
+            "arboles": todos["arboles"],
+            "todos": todos,
+            "facetas": facetas,
+        }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        with open(ruta, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            f.write(b"\0" * (-f.tell() % ALINEACION))
+            f.writelines(datos)
+            return f.tell()
+
+    @classmethod
+    def leer(cls, ruta):
+        datos = Path(ruta).read_bytes()
+        if datos[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{ruta} no es un facets.bin")
+        largo = struct.unpack_from("<I", datos, len(MAGIC))[0]
+        inicio = len(MAGIC) + 4
+        header = json.loads(datos[inicio:inicio + largo])
+        base = inicio + largo
+        base += -base % ALINEACION
+
+        def bitmap(ubicacion):
+            desde = base + ubicacion["offset"]
+            return Bitmap.deserializar(datos[desde:desde + ubicacion["largo"]])
+
+        facetas = {f["nombre"]: {v["valor"]: bitmap(v) for v in f["valores"]} for f in header["facetas"]}
+        return cls(bitmap(header["todos"]), facetas)
+
+
+# ── Benchmark ────────────────────────────────────────────────────────────────
+
+def filtros_al_azar(indice, n, semilla=42):
+    """Combinaciones de 1 a 4 facetas con 1 a 3 valores cada una."""
+    rng = np.random.default_rng(semilla)
+    nombres = list(indice.facetas)
+    resultado = []
+    for _ in range(n):
+        filtros = {}
+        for nombre in rng.choice(nombres, size=rng.integers(1, 5), replace=False).tolist():
+            valores = list(indice.facetas[nombre])
+            elegidos = rng.choice(len(valores), size=min(len(valores), rng.integers(1, 4)), replace=False)
+            filtros[nombre] = [valores[k] for k in elegidos.tolist()]
+        resultado.append(filtros)
+    return resultado
+
+
+def mascara(columnas, filtros):
+    """Mismo filtro evaluado sobre las columnas del DataFrame (referencia)."""
+    resultado = np.ones(len(next(iter(columnas.values()))), dtype=bool)
+    for nombre, valores in filtros.items():
+        resultado &= columnas[nombre].isin(valores).to_numpy()
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de filtros por bitmaps vs DataFrame.")
+    parser.add_argument("--consultas", type=int, default=1_000)
+    agregar_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas = Metricas.desde_args("facetas", args)
+
+    with metricas.etapa("construir_indice") as etapa:
+        df = pd.read_csv(PROCESSED_DIR / "arboles_montevideo_geo.csv", low_memory=False)
+        df = df[df["lat"].notna() & df["lng"].notna()].drop_duplicates("Arbol", keep="last")
+        inicio = time.perf_counter()
+        indice = IndiceFacetas.desde_df(df)
+        construccion = time.perf_counter() - inicio
+        etapa.filas_salida = len(df)
+    bitmaps = sum(len(v) for v in indice.facetas.values())
+    print(f"{len(df):,} árboles, {bitmaps} bitmaps en {len(indice.facetas)} facetas, "
+          f"construidos en {construccion:.2f}s")
+
+    columnas = {nombre: valores_faceta(df, columna) for nombre, columna in FACETAS
+                if nombre in indice.facetas}
+    ids = df["Arbol"].to_numpy(dtype=float).astype(np.int64)
+    lista = filtros_al_azar(indice, args.consultas)
+
+    with metricas.etapa("bitmaps", filas_entrada=len(lista)) as etapa:
+        inicio = time.perf_counter()
+        conteos = [indice.conteo(f) for f in lista]
+        t_bitmaps = time.perf_counter() - inicio
+        etapa.extra["encontrados"] = int(sum(conteos))
+    with metricas.etapa("dataframe", filas_entrada=len(lista)):
+        inicio = time.perf_counter()
+        referencia = [int(mascara(columnas, f).sum()) for f in lista]
+        t_dataframe = time.perf_counter() - inicio
+    iguales = conteos == referencia and all(
+        np.array_equal(indice.ids(f), np.sort(ids[mascara(columnas, f)])) for f in lista[:50])
+
+    print(f"\n{len(lista):,} filtros al azar (1-4 facetas, 1-3 valores)")
+    print(f"  bitmaps:   {t_bitmaps / len(lista) * 1e6:8.0f} µs por conteo")
+    print(f"  DataFrame: {t_dataframe / len(lista) * 1e6:8.0f} µs por conteo "
+          f"({t_dataframe / t_bitmaps:.0f}x)")
+    print(f"  resultados iguales: {'sí' if iguales else 'NO'}")
+
+    metricas.guardar(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
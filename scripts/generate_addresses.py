@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Índice de autocompletado de direcciones a partir de la base de puertas.
+
+Genera web/public/addresses.json para buscar direcciones sin salir a un
+geocodificador externo. Las calles se normalizan con normalizar_calle
+(geocode_puertas.py) y se indexan por cada palabra: "AV DR LUIS ALBERTO DE
+HERRERA" se encuentra escribiendo "AV DR", "LUIS" o "HERRERA", y también
+por las variantes de crear_variantes_calle ("EDISON CAMI" como "CAMI EDISON").
+
+Formato de addresses.json:
+    calles     nombres normalizados, ordenados
+    puertas    puertas de cada calle (para ordenar resultados)
+    claves     sufijos de cada nombre desde el inicio de cada palabra, ordenados
+    calle_clave  calle de cada clave
+    prefijos   {prefijo de 1-2 letras: [inicio, fin, calles mejor rankeadas]}
+               rango de claves con ese prefijo y respuesta precalculada
+    numeros    por calle, números de puerta ordenados (diferencias)
+    lat, lng   por calle, coordenadas de cada número (diferencias, enteros
+               de 1e-5 grados)
+
+Una consulta busca por bisección el rango de claves con el prefijo escrito y
+rankea las calles por (la clave empieza el nombre, puertas). Si termina en un
+número se ubica la puerta: exacta o interpolada entre las vecinas.
+
+Uso:
+    python scripts/generate_addresses.py
+    python scripts/generate_addresses.py --consultas 5000
+"""
+
+import argparse
+import bisect
+import json
+import re
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from geocode_puertas import crear_variantes_calle, normalizar_calle
+from metrics import Metricas, agregar_argumentos
+
+BASE_DIR = Path(__file__).parent.parent
+RAW_DIR = BASE_DIR / "data" / "raw"
+WEB_PUBLIC = BASE_DIR / "web" / "public"
+
+VERSION = 1
+ESCALA = 100_000
+# Largo máximo de los prefijos con respuesta precalculada
+LARGO_PREFIJOS = 2
+LIMITE = 10
+
+NUMERO_FINAL = re.compile(r"^(.*\S)\s+(\d+)\s*$")
+
+
+# ── Construcción ─────────────────────────────────────────────────────────────
+
+def cargar_puertas(ruta):
+    """Puertas con calle normalizada, número y coordenadas (sin repetir calle+número)."""
+    with open(ruta, encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    df = pd.DataFrame({
+        "nom_calle": [f["properties"].get("nom_calle") for f in features],
+        "numero": [f["properties"].get("num_puerta") for f in features],
+        "lng": [f["geometry"]["coordinates"][0] if f["geometry"] else None for f in features],
+        "lat": [f["geometry"]["coordinates"][1] if f["geometry"] else None for f in features],
+    })
+    nombres = df["nom_calle"].dropna().unique()
+    df["calle"] = df["nom_calle"].map(dict(zip(nombres, map(normalizar_calle, nombres))))
+    df["numero"] = pd.to_numeric(df["numero"], errors="coerce")
+    df = df[(df["calle"].fillna("") != "") & (df["numero"] > 0) & df["lat"].notna() & df["lng"].notna()]
+    df = df.assign(numero=df["numero"].astype(np.int64))
+    return df.drop_duplicates(["calle", "numero"]).sort_values(["calle", "numero"], kind="stable")
+
+
+def claves_de(nombre):
+    """Sufijos desde cada palabra del nombre y de sus variantes ("EDISON CAMI", "CAMI EDISON")."""
+    return sorted({variante[m.start():] for variante in crear_variantes_calle(nombre)
+                   for m in re.finditer(r"(?<!\S)\S", variante)})
+
+
+def construir(puertas_df):
+    """Estructura de addresses.json a partir de las puertas."""
+    grupos = puertas_df.groupby("calle", sort=True)
+    calles = list(grupos.groups)
+    conteos = grupos.size().tolist()
+
+    pares = sorted((clave, k) for k, nombre in enumerate(calles) for clave in claves_de(nombre))
+    claves = [p[0] for p in pares]
+    calle_clave = [p[1] for p in pares]
+
+    prefijos = {}
+    for largo in range(1, LARGO_PREFIJOS + 1):
+        for prefijo in sorted({c[:largo] for c in claves if len(c) >= largo}):
+            inicio, fin = rango_prefijo(claves, prefijo)
+            prefijos[prefijo] = [inicio, fin, mejores(calles, conteos, claves, calle_clave,
+                                                      inicio, fin, LIMITE)]
+
+    def diferencias(valores):
+        return np.diff(valores, prepend=0).tolist()
+
+    numeros, lat, lng = [], [], []
+    for _, grupo in grupos:
+        numeros.append(diferencias(grupo["numero"].to_numpy()))
+        lat.append(diferencias(np.rint(grupo["lat"].to_numpy() * ESCALA).astype(np.int64)))
+        lng.append(diferencias(np.rint(grupo["lng"].to_numpy() * ESCALA).astype(np.int64)))
+
+    return {
+        "version": VERSION,
+        "escala": ESCALA,
+        "calles": calles,
+        "puertas": conteos,
+        "claves": claves,
+        "calle_clave": calle_clave,
+        "prefijos": prefijos,
+        "numeros": numeros,
+        "lat": lat,
+        "lng": lng,
+    }
+
+
+# ── Consulta ─────────────────────────────────────────────────────────────────
+
+def rango_prefijo(claves, prefijo):
+    """[inicio, fin) de las claves que empiezan con prefijo."""
+    inicio = bisect.bisect_left(claves, prefijo)
+    return inicio, bisect.bisect_left(claves, prefijo + "\uffff", inicio)
+
+
+def mejores(calles, puertas, claves, calle_clave, inicio, fin, limite):
+    """Calles del rango de claves, las que empiezan con el prefijo primero y por puertas."""
+    puntaje = {}
+    for k in range(inicio, fin):
+        calle = calle_clave[k]
+        al_inicio = calles[calle] == claves[k]
+        puntaje[calle] = max(puntaje.get(calle, (False, 0)), (al_inicio, puertas[calle]))
+    return sorted(puntaje, key=lambda c: (not puntaje[c][0], -puertas[c], calles[c]))[:limite]
+
+
+class IndiceDirecciones:
+    """Implementación de referencia de la búsqueda sobre addresses.json."""
+
+    def __init__(self, datos):
+        self.calles = datos["calles"]
+        self.puertas = datos["puertas"]
+        self.claves = datos["claves"]
+        self.calle_clave = datos["calle_clave"]
+        self.prefijos = datos["prefijos"]
+        escala = datos["escala"]
+        self.numeros = [np.cumsum(n).tolist() for n in datos["numeros"]]
+        self.lat = [(np.cumsum(v) / escala).tolist() for v in datos["lat"]]
+        self.lng = [(np.cumsum(v) / escala).tolist() for v in datos["lng"]]
+
+    @classmethod
+    def leer(cls, ruta):
+        with open(ruta, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def buscar_calles(self, texto, limite=LIMITE):
+        """Índices de las calles que tienen una palabra que empieza con texto."""
+        prefijo = normalizar_calle(texto)
+        if not prefijo:
+            return []
+        if prefijo in self.prefijos:
+            return self.prefijos[prefijo][2][:limite]
+        inicio, fin = rango_prefijo(self.claves, prefijo)
+        return mejores(self.calles, self.puertas, self.claves, self.calle_clave, inicio, fin, limite)
+
+    def ubicar(self, calle, numero):
+        """(lat, lng, exacto) del número en la calle, interpolado entre puertas vecinas."""
+        numeros, lat, lng = self.numeros[calle], self.lat[calle], self.lng[calle]
+        k = bisect.bisect_left(numeros, numero)
+        if k < len(numeros) and numeros[k] == numero:
+            return lat[k], lng[k], True
+        if k == 0 or k == len(numeros):
+            k = min(k, len(numeros) - 1)
+            return lat[k], lng[k], False
+        t = (numero - numeros[k - 1]) / (numeros[k] - numeros[k - 1])
+        return (lat[k - 1] + t * (lat[k] - lat[k - 1]),
+                lng[k - 1] + t * (lng[k] - lng[k - 1]), False)
+
+    def buscar(self, texto, limite=LIMITE):
+        """Resultados para lo escrito: calle con número si termina en uno, y calles."""
+        resultados = []
+        con_numero = NUMERO_FINAL.match(texto)
+        if con_numero:
+            numero = int(con_numero.group(2))
+            for calle in self.buscar_calles(con_numero.group(1), limite):
+                lat, lng, exacto = self.ubicar(calle, numero)
+                resultados.append({"calle": self.calles[calle], "numero": numero,
+                                   "lat": lat, "lng": lng, "exacto": exacto})
+        for calle in self.buscar_calles(texto, limite - len(resultados)):
+            medio = len(self.numeros[calle]) // 2
+            resultados.append({"calle": self.calles[calle], "numero": None,
+                               "lat": self.lat[calle][medio], "lng": self.lng[calle][medio],
+                               "exacto": False})
+        return resultados[:limite]
+
+
+# ── Benchmark ────────────────────────────────────────────────────────────────
+
+def consultas_al_azar(indice, n, semilla=42):
+    """Lo que se escribe al buscar: prefijos de una palabra de la calle, a veces con número."""
+    rng = np.random.default_rng(semilla)
+    pesos = np.array(indice.puertas, dtype=float)
+    pesos /= pesos.sum()
+    resultado = []
+    for calle in rng.choice(len(indice.calles), size=n, p=pesos).tolist():
+        claves = claves_de(indice.calles[calle])
+        clave = claves[rng.integers(len(claves))]
+        texto = clave[:rng.integers(1, len(clave) + 1)].lower()
+        if rng.random() < 0.5:
+            texto = f"{clave.lower()} {rng.choice(indice.numeros[calle])}"
+        resultado.append(texto)
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generar el índice de direcciones (addresses.json).")
+    parser.add_argument("--consultas", type=int, default=2_000,
+                        help="consultas al azar para medir la latencia (0 = no medir)")
+    agregar_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas = Metricas.desde_args("generate_addresses", args)
+
+    print("Cargando base de puertas...")
+    with metricas.etapa("cargar_puertas") as etapa:
+        puertas_df = cargar_puertas(RAW_DIR / "wfs_puertas.geojson")
+        etapa.filas_salida = len(puertas_df)
+    print(f"  {len(puertas_df):,} puertas con número y coordenadas")
+
+    print("Construyendo índice...")
+    with metricas.etapa("construir_indice", filas_entrada=len(puertas_df)) as etapa:
+        datos = construir(puertas_df)
+        etapa.filas_salida = len(datos["claves"])
+
+    ruta = WEB_PUBLIC / "addresses.json"
+    with metricas.etapa("addresses.json", filas_entrada=len(datos["calles"])) as etapa:
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False, separators=(",", ":"))
+        etapa.filas_salida = len(datos["calles"])
+        etapa.extra["bytes"] = ruta.stat().st_size
+    print(f"  {ruta} ({ruta.stat().st_size / 1024 / 1024:.1f} MB, {len(datos['calles']):,} calles, "
+          f"{len(datos['claves']):,} claves, {len(datos['prefijos']):,} prefijos)")
+
+    if args.consultas:
+        indice = IndiceDirecciones(datos)
+        lista = consultas_al_azar(indice, args.consultas)
+        with metricas.etapa("consultas", filas_entrada=len(lista)) as etapa:
+            tiempos = []
+            for texto in lista:
+                inicio = time.perf_counter()
+                indice.buscar(texto)
+                tiempos.append(time.perf_counter() - inicio)
+            ms = np.array(tiempos) * 1000
+            etapa.extra["p50_ms"] = round(float(np.percentile(ms, 50)), 4)
+            etapa.extra["p99_ms"] = round(float(np.percentile(ms, 99)), 4)
+        print(f"  {len(lista):,} consultas: p50 {etapa.extra['p50_ms']:.3f} ms, "
+              f"p99 {etapa.extra['p99_ms']:.3f} ms")
+
+    metricas.guardar(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,96 +3,358 @@
 Generar archivos JSON optimizados para la aplicación web.
 
 Genera en web/public/:
-  - trees.json      GeoJSON minimal (i=id, e=especie) para el mapa
+  - trees.json      GeoJSON minimal (i=id, e=especie, p=prioridad) para el mapa
   - trees-data.json Datos completos por id para el panel
+  - trees-data.bin  Los mismos datos en formato columnar binario
+  - trees-data/     Los mismos datos en shards espaciales comprimidos
   - species.json    Lista única de especies ordenada
+  - species-counts.json  Árboles por especie (mayor a menor)
+  - stats-cube.json Cubo de agregados para estadísticas y filtros
+  - facets.bin      Bitmaps de ids por valor de faceta para los filtros
+  - search-index.json  Índice por prefijo de especies y calles
+
+y en data/processed/ trees-data.store, los registros de trees-data.json
+por id para consultar con memory-map (ver trees_store.py).
 """
 
+import argparse
+import gzip
+import numpy as np
 import pandas as pd
 import json
 from pathlib import Path
 
+import busqueda
+import estadisticas
+import facetas
+import orden_espacial
+import prioridad
+import shards
+import trees_data_bin
+import trees_store
+from metrics import Metricas, agregar_argumentos
+
 BASE_DIR = Path(__file__).parent.parent
 PROCESSED_DIR = BASE_DIR / "data" / "processed"
 WEB_PUBLIC = BASE_DIR / "web" / "public"
 
+# Features serializados por bloque: acota la memoria sin penalizar la escritura
+TAMANO_BLOQUE = 20_000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generar archivos JSON para la web.")
+    parser.add_argument("--zoom-shards", type=int, default=shards.ZOOM_SHARDS,
+                        help=f"zoom de las celdas de trees-data/ (default {shards.ZOOM_SHARDS})")
+    parser.add_argument("--orden-espacial", action="store_true",
+                        help="escribir los árboles en orden de curva de Hilbert en vez del orden del CSV")
+    agregar_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas = Metricas.desde_args("generate_geojson", args)
 
-def main():
     print("Cargando datos...")
-    df = pd.read_csv(PROCESSED_DIR / "arboles_montevideo_geo.csv", low_memory=False)
+    with metricas.etapa("cargar_csv") as etapa:
+        df = pd.read_csv(PROCESSED_DIR / "arboles_montevideo_geo.csv", low_memory=False)
+        etapa.filas_salida = len(df)
 
     print(f"Total árboles: {len(df):,}")
 
     # Filtrar solo los que tienen coordenadas válidas
-    df = df[df["lat"].notna() & df["lng"].notna()]
+    with metricas.etapa("filtrar_coordenadas", filas_entrada=len(df)) as etapa:
+        df = df[df["lat"].notna() & df["lng"].notna()]
+        etapa.filas_salida = len(df)
     print(f"Con coordenadas válidas: {len(df):,}")
 
+    if args.orden_espacial:
+        with metricas.etapa("orden_espacial", filas_entrada=len(df)) as etapa:
+            df = orden_espacial.ordenar(df)
+            etapa.filas_salida = len(df)
+        print("Ordenado por curva de Hilbert")
+
     # ── trees.json (GeoJSON minimal) ─────────────────────────────────────
     print("\nGenerando trees.json...")
-    features = []
-    for _, row in df.iterrows():
-        feature = {
-            "type": "Feature",
-            "geometry": {
-                "type": "Point",
-                "coordinates": [
-                    round(float(row["lng"]), 6),
-                    round(float(row["lat"]), 6),
-                ],
-            },
-            "properties": {
-                "i": int(row["Arbol"]),
-                "e": row["Nombre común"] if pd.notna(row["Nombre común"]) else "",
-                "c": int(row["CCZ"]) if pd.notna(row["CCZ"]) else 0,
-            },
-        }
-        features.append(feature)
-
-    geojson = {"type": "FeatureCollection", "features": features}
+    with metricas.etapa("trees.json", filas_entrada=len(df)) as etapa:
+        escribir_trees_json(df, etapa)
+
+    # ── trees-data.json (datos completos por id) ─────────────────────────
+    print("Generando trees-data.json...")
+    with metricas.etapa("trees-data.json", filas_entrada=len(df)) as etapa:
+        escribir_trees_data(df, etapa)
+
+    # ── trees-data.bin (columnar binario) ────────────────────────────────
+    print("Generando trees-data.bin...")
+    with metricas.etapa("trees-data.bin", filas_entrada=len(df)) as etapa:
+        escribir_trees_bin(df, etapa)
+
+    # ── trees-data.store (registros por id, memory-map) ──────────────────
+    print("Generando trees-data.store...")
+    with metricas.etapa("trees-data.store", filas_entrada=len(df)) as etapa:
+        escribir_trees_store(df, etapa)
+
+    # ── trees-data/ (shards espaciales) ──────────────────────────────────
+    print("Generando shards de trees-data...")
+    with metricas.etapa("trees-data_shards", filas_entrada=len(df)) as etapa:
+        escribir_shards(df, etapa, args.zoom_shards)
+
+    # ── species.json (lista de especies) ─────────────────────────────────
+    print("Generando species.json...")
+    with metricas.etapa("species.json", filas_entrada=len(df)) as etapa:
+        escribir_species(df, etapa)
+
+    # ── species-counts.json y stats-cube.json (agregados) ────────────────
+    print("Generando species-counts.json...")
+    with metricas.etapa("species-counts.json", filas_entrada=len(df)) as etapa:
+        escribir_species_counts(df, etapa)
+
+    print("Generando stats-cube.json...")
+    with metricas.etapa("stats-cube.json", filas_entrada=len(df)) as etapa:
+        escribir_cubo(df, etapa)
+
+    # ── facets.bin (bitmaps por faceta) ──────────────────────────────────
+    print("Generando facets.bin...")
+    with metricas.etapa("facets.bin", filas_entrada=len(df)) as etapa:
+        escribir_facetas(df, etapa)
+
+    # ── search-index.json (búsqueda de especies y calles) ────────────────
+    print("Generando search-index.json...")
+    with metricas.etapa("search-index.json", filas_entrada=len(df)) as etapa:
+        escribir_busqueda(df, etapa)
+
+    metricas.guardar(args.metrics)
+    print("\nListo.")
+
+
+def bloques(n, tamano=TAMANO_BLOQUE):
+    """Rangos [inicio, fin) para recorrer n filas por bloques."""
+    for inicio in range(0, n, tamano):
+        yield inicio, min(inicio + tamano, n)
+
+
+def literales_texto(serie, vacio="null", ensure_ascii=True):
+    """Codificar una columna de texto como literales JSON.
+
+    Cada valor distinto se serializa una sola vez (codificación por
+    diccionario); los nulos se reemplazan por el literal `vacio`.
+    """
+    codigos, unicos = pd.factorize(serie)
+    literales = [json.dumps(u, ensure_ascii=ensure_ascii) for u in unicos]
+    # El código -1 (nulo) indexa el último elemento
+    return np.array(literales + [vacio], dtype=object)[codigos]
+
+
+def literales_float(valores, decimales=None):
+    """Literales JSON de una columna float (repr de Python, NaN -> null)."""
+    if decimales is None:
+        return ["null" if v != v else repr(v) for v in valores.tolist()]
+    return ["null" if v != v else repr(round(v, decimales)) for v in valores.tolist()]
+
+
+def literales_int(valores, validos, vacio="null"):
+    """Literales JSON de una columna entera; las filas no válidas usan `vacio`."""
+    enteros = np.where(validos, valores, 0).astype(np.int64).tolist()
+    return [str(v) if ok else vacio for v, ok in zip(enteros, validos.tolist())]
+
+
+def escribir_trees_json(df, etapa):
+    """trees.json: GeoJSON minimal (i=id, e=especie, c=CCZ, p=prioridad).
+
+    Se escribe por bloques de features ya serializados, con el mismo formato
+    que json.dump del FeatureCollection completo.
+    """
+    especie = literales_texto(df["Nombre común"], vacio='""')
+    ids = df["Arbol"].to_numpy(dtype=float).astype(np.int64)
+    ccz = df["CCZ"].to_numpy(dtype=float)
+    prioridades = prioridad.calcular(df)
+    lng = df["lng"].to_numpy(dtype=float)
+    lat = df["lat"].to_numpy(dtype=float)
 
     trees_path = WEB_PUBLIC / "trees.json"
     with open(trees_path, "w") as f:
-        json.dump(geojson, f)
+        f.write('{"type": "FeatureCollection", "features": [')
+        for inicio, fin in bloques(len(df)):
+            if inicio:
+                f.write(", ")
+            f.write(", ".join(
+                f'{{"type": "Feature", "geometry": {{"type": "Point", "coordinates": [{x}, {y}]}}, '
+                f'"properties": {{"i": {i}, "e": {e}, "c": {c}, "p": {p}}}}}'
+                for x, y, i, e, c, p in zip(
+                    literales_float(lng[inicio:fin], 6),
+                    literales_float(lat[inicio:fin], 6),
+                    ids[inicio:fin].tolist(),
+                    especie[inicio:fin],
+                    literales_int(ccz[inicio:fin], ~np.isnan(ccz[inicio:fin]), vacio="0"),
+                    prioridades[inicio:fin].tolist(),
+                )
+            ))
+        f.write("]}")
 
     size_mb = trees_path.stat().st_size / 1024 / 1024
-    print(f"  {trees_path} ({size_mb:.1f} MB, {len(features):,} árboles)")
+    print(f"  {trees_path} ({size_mb:.1f} MB, {len(df):,} árboles)")
+    etapa.filas_salida = len(df)
+    etapa.extra["bytes"] = trees_path.stat().st_size
+
+
+def filas_por_id(df):
+    """Posiciones de las filas que quedan en trees-data.json.
+
+    Reproduce la semántica del dict por id: ante ids repetidos gana la última
+    fila del CSV (según el índice original, aunque df esté reordenado), pero
+    la clave conserva la posición de su primera aparición en df.
+    """
+    ids = df["Arbol"].to_numpy(dtype=float).astype(np.int64)
+    posiciones = pd.Series(np.arange(len(ids)), index=ids)
+    if posiciones.index.is_unique:
+        return posiciones.to_numpy()
+    filas = pd.DataFrame({"id": ids, "original": df.index.to_numpy(), "posicion": np.arange(len(ids))})
+    primeras = filas.groupby("id", sort=False)["posicion"].first()
+    ultimas = filas.sort_values("original", kind="stable").groupby("id")["posicion"].last()
+    return ultimas.loc[primeras.index].to_numpy()
 
-    # ── trees-data.json (datos completos por id) ─────────────────────────
-    print("Generando trees-data.json...")
-    trees_data = {}
-    for _, row in df.iterrows():
-        tree_id = str(int(row["Arbol"]))
-        trees_data[tree_id] = {
-            "nombre_cientifico": row["Nombre científico"]
-            if pd.notna(row["Nombre científico"])
-            else None,
-            "nombre_comun": row["Nombre común"]
-            if pd.notna(row["Nombre común"])
-            else None,
-            "calle": row["Calle"] if pd.notna(row["Calle"]) else None,
-            "numero": int(row["Numero"])
-            if pd.notna(row["Numero"]) and row["Numero"] > 0
-            else None,
-            "ccz": int(row["CCZ"]) if pd.notna(row["CCZ"]) else None,
-            "altura": float(row["Altura"]) if pd.notna(row["Altura"]) else None,
-            "cap": float(row["CAP"]) if pd.notna(row["CAP"]) else None,
-            "diametro_copa": float(row["Diametro Copa"])
-            if pd.notna(row["Diametro Copa"])
-            else None,
-            "estado": int(row["EV"]) if pd.notna(row["EV"]) else None,
-            "lat": round(float(row["lat"]), 6),
-            "lng": round(float(row["lng"]), 6),
-        }
 
+def registros_trees_data(df):
+    """Ids y texto JSON de cada registro de trees-data, por bloque.
+
+    Las propiedades se limpian por columna; cada texto es idéntico a
+    json.dumps del registro.
+    """
+    ids = df["Arbol"].to_numpy(dtype=float).astype(np.int64)
+    cientifico = literales_texto(df["Nombre científico"], ensure_ascii=False)
+    comun = literales_texto(df["Nombre común"], ensure_ascii=False)
+    calle = literales_texto(df["Calle"], ensure_ascii=False)
+    numero = df["Numero"].to_numpy(dtype=float)
+    ccz = df["CCZ"].to_numpy(dtype=float)
+    ev = df["EV"].to_numpy(dtype=float)
+    altura = df["Altura"].to_numpy(dtype=float)
+    cap = df["CAP"].to_numpy(dtype=float)
+    copa = df["Diametro Copa"].to_numpy(dtype=float)
+    lat = df["lat"].to_numpy(dtype=float)
+    lng = df["lng"].to_numpy(dtype=float)
+
+    for inicio, fin in bloques(len(df)):
+        b = slice(inicio, fin)
+        yield ids[b].tolist(), [
+            f'{{"nombre_cientifico": {nc}, "nombre_comun": {nm}, "calle": {ca}, '
+            f'"numero": {nu}, "ccz": {cz}, "altura": {al}, "cap": {cp}, '
+            f'"diametro_copa": {dc}, "estado": {es}, "lat": {la}, "lng": {ln}}}'
+            for nc, nm, ca, nu, cz, al, cp, dc, es, la, ln in zip(
+                cientifico[b],
+                comun[b],
+                calle[b],
+                literales_int(numero[b], numero[b] > 0),
+                literales_int(ccz[b], ~np.isnan(ccz[b])),
+                literales_float(altura[b]),
+                literales_float(cap[b]),
+                literales_float(copa[b]),
+                literales_int(ev[b], ~np.isnan(ev[b])),
+                literales_float(lat[b], 6),
+                literales_float(lng[b], 6),
+            )
+        ]
+
+
+def fragmentos_trees_data(df):
+    """Texto JSON del dict por id de trees-data, en fragmentos por bloque.
+
+    El resultado concatenado es idéntico a json.dump del dict (df ya sin
+    ids repetidos).
+    """
+    yield "{"
+    for k, (ids, textos) in enumerate(registros_trees_data(df)):
+        if k:
+            yield ", "
+        yield ", ".join(f'"{i}": {texto}' for i, texto in zip(ids, textos))
+    yield "}"
+
+
+def escribir_trees_data(df, etapa):
+    """trees-data.json: datos completos por id para el panel."""
+    df = df.iloc[filas_por_id(df)]
     data_path = WEB_PUBLIC / "trees-data.json"
-    with open(data_path, "w") as f:
-        json.dump(trees_data, f, ensure_ascii=False)
+    with open(data_path, "w", encoding="utf-8") as f:
+        f.writelines(fragmentos_trees_data(df))
 
     size_mb = data_path.stat().st_size / 1024 / 1024
-    print(f"  {data_path} ({size_mb:.1f} MB, {len(trees_data):,} entradas)")
+    print(f"  {data_path} ({size_mb:.1f} MB, {len(df):,} entradas)")
+    etapa.filas_salida = len(df)
+    etapa.extra["bytes"] = data_path.stat().st_size
 
-    # ── species.json (lista de especies) ─────────────────────────────────
-    print("Generando species.json...")
+
+def escribir_trees_bin(df, etapa):
+    """trees-data.bin: trees-data en columnas tipadas (ver trees_data_bin.py)."""
+    df = df.iloc[filas_por_id(df)]
+    bin_path = WEB_PUBLIC / "trees-data.bin"
+    tamano = trees_data_bin.escribir(df, bin_path)
+
+    print(f"  {bin_path} ({tamano / 1024 / 1024:.1f} MB, {len(df):,} entradas)")
+    etapa.filas_salida = len(df)
+    etapa.extra["bytes"] = tamano
+
+
+def escribir_trees_store(df, etapa):
+    """trees-data.store: registros de trees-data.json por id (ver trees_store.py)."""
+    df = df.iloc[filas_por_id(df)]
+    ids, textos = [], []
+    for ids_bloque, textos_bloque in registros_trees_data(df):
+        ids += ids_bloque
+        textos += textos_bloque
+    store_path = PROCESSED_DIR / "trees-data.store"
+    tamano = trees_store.escribir(ids, textos, store_path)
+
+    print(f"  {store_path} ({tamano / 1024 / 1024:.1f} MB, {len(df):,} entradas)")
+    etapa.filas_salida = len(df)
+    etapa.extra["bytes"] = tamano
+
+
+def escribir_shards(df, etapa, zoom):
+    """trees-data/: un .json.gz por celda de tesela, manifest.json e ids.bin."""
+    df = df.iloc[filas_por_id(df)]
+    destino = WEB_PUBLIC / shards.DIRECTORIO
+    destino.mkdir(parents=True, exist_ok=True)
+    for viejo in destino.glob("*.json.gz"):
+        viejo.unlink()
+
+    tx, ty = shards.celdas(df["lat"], df["lng"], zoom)
+    clave = tx * (1 << zoom) + ty
+    orden = np.argsort(clave, kind="stable")
+    claves, inicios = np.unique(clave[orden], return_index=True)
+
+    entradas = []
+    for k, grupo in zip(claves.tolist(), np.split(orden, inicios[1:])):
+        x, y = k >> zoom, k & ((1 << zoom) - 1)
+        texto = "".join(fragmentos_trees_data(df.iloc[np.sort(grupo)]))
+        datos = gzip.compress(texto.encode("utf-8"), compresslevel=9, mtime=0)
+        archivo = shards.nombre_shard(zoom, x, y)
+        (destino / archivo).write_bytes(datos)
+        entradas.append({"x": x, "y": y, "archivo": archivo,
+                         "bytes": len(datos), "arboles": len(grupo)})
+
+    indice_ids = shards.escribir_indice_ids(
+        destino / shards.INDICE_IDS,
+        df["Arbol"].to_numpy(dtype=np.int64),
+        np.searchsorted(claves, clave),
+        len(entradas),
+    )
+    manifest = {
+        "version": 1,
+        "zoom": zoom,
+        "arboles": len(df),
+        "shards": entradas,
+        "ids": indice_ids,
+    }
+    with open(destino / shards.MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+
+    tamanos = [e["bytes"] for e in entradas]
+    print(f"  {destino} ({len(entradas):,} shards, mediana "
+          f"{np.median(tamanos) / 1024:.1f} KB, máximo {max(tamanos) / 1024:.1f} KB)")
+    etapa.filas_salida = len(df)
+    etapa.extra["shards"] = len(entradas)
+    etapa.extra["bytes"] = sum(tamanos)
+    etapa.extra["bytes_shard_max"] = max(tamanos)
+
+
+def escribir_species(df, etapa):
+    """species.json: lista única de especies ordenada."""
     especies = df["Nombre común"].dropna().unique()
     especies = sorted([e for e in especies if e])
 
@@ -101,8 +363,61 @@ def main():
         json.dump(especies, f, ensure_ascii=False, indent=2)
 
     print(f"  {species_path} ({len(especies)} especies)")
+    etapa.filas_salida = len(especies)
 
-    print("\nListo.")
+
+def escribir_species_counts(df, etapa):
+    """species-counts.json: árboles por especie, de mayor a menor."""
+    conteos = df["Nombre común"].dropna()
+    conteos = conteos[conteos != ""].value_counts()
+
+    counts_path = WEB_PUBLIC / "species-counts.json"
+    with open(counts_path, "w", encoding="utf-8") as f:
+        json.dump({k: int(v) for k, v in conteos.items()}, f, ensure_ascii=False, indent=2)
+
+    print(f"  {counts_path} ({len(conteos)} especies)")
+    etapa.filas_salida = len(conteos)
+
+
+def escribir_cubo(df, etapa):
+    """stats-cube.json: conteos por especie × CCZ × estado × altura × CAP y resúmenes."""
+    cubo = estadisticas.construir_cubo(df)
+
+    cubo_path = WEB_PUBLIC / "stats-cube.json"
+    with open(cubo_path, "w", encoding="utf-8") as f:
+        json.dump(cubo, f, ensure_ascii=False, separators=(",", ":"))
+
+    size_kb = cubo_path.stat().st_size / 1024
+    print(f"  {cubo_path} ({size_kb:.0f} KB, {len(cubo['celdas']):,} celdas)")
+    etapa.filas_salida = len(cubo["celdas"])
+    etapa.extra["bytes"] = cubo_path.stat().st_size
+
+
+def escribir_facetas(df, etapa):
+    """facets.bin: bitmaps Roaring de ids por valor de faceta (ver facetas.py)."""
+    df = df.iloc[filas_por_id(df)]
+    indice = facetas.IndiceFacetas.desde_df(df)
+    facets_path = WEB_PUBLIC / "facets.bin"
+    tamano = indice.escribir(facets_path)
+
+    bitmaps = sum(len(v) for v in indice.facetas.values())
+    print(f"  {facets_path} ({tamano / 1024:.0f} KB, {bitmaps} bitmaps)")
+    etapa.filas_salida = bitmaps
+    etapa.extra["bytes"] = tamano
+
+
+def escribir_busqueda(df, etapa):
+    """search-index.json: especies y calles por prefijo, con árboles (ver busqueda.py)."""
+    indice = busqueda.construir(busqueda.entradas_desde_df(df))
+    indice_path = WEB_PUBLIC / "search-index.json"
+    with open(indice_path, "w", encoding="utf-8") as f:
+        json.dump(indice, f, ensure_ascii=False, separators=(",", ":"))
+
+    size_kb = indice_path.stat().st_size / 1024
+    print(f"  {indice_path} ({size_kb:.0f} KB, {len(indice['texto']):,} entradas, "
+          f"{len(indice['claves']):,} claves)")
+    etapa.filas_salida = len(indice["texto"])
+    etapa.extra["bytes"] = indice_path.stat().st_size
 
 
 if __name__ == "__main__":
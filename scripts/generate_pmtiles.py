@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Generar web/public/trees.pmtiles directamente desde el CSV procesado.
+
+Reemplaza el paso por tippecanoe (que re-parsea trees.json): proyecta los
+puntos, los agrupa por tesela para cada zoom, codifica las teselas MVT en
+paralelo y escribe un PMTiles v3. Cada tesela respeta un presupuesto de
+features y de bytes: si lo excede se descartan los puntos de las zonas más
+densas (equivalente a --drop-densest-as-needed), y en cada zona se quedan
+los de mayor prioridad (prioridad.py: tamaño y rareza de la especie).
+
+Las propiedades son las mismas que en trees.json: i=id, e=especie, c=CCZ.
+Con --especies-enteras, e pasa a ser el id de la especie en
+species-ids.json (ordenado por frecuencia, -1 = sin nombre): teselas más
+chicas y filtros que comparan enteros en vez de texto. El diccionario se
+escribe siempre; validar_teselas.py verifica las teselas contra él.
+
+Con --zoom-puntos N, los zooms menores a N no llevan puntos sino la capa
+"clusters": todos los árboles agregados en una grilla por tesela, cada
+grupo con su cantidad (n), especie dominante (e) e histograma de especies
+(h, "id:árboles,..." con los ids de species-ids.json). No se descarta
+ningún árbol y las teselas de zoom bajo pesan mucho menos.
+
+Uso:
+    python scripts/generate_pmtiles.py
+    python scripts/generate_pmtiles.py --max-features 10000 --procesos 4
+    python scripts/generate_pmtiles.py --comparar-tippecanoe
+    python scripts/generate_pmtiles.py --especies-enteras
+    python scripts/generate_pmtiles.py --zoom-puntos 13
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+from pathlib import Path
+
+import mvt
+import orden_espacial
+import prioridad
+from archivo_pmtiles import EscritorPMTiles, zxy_a_tile_id
+from metrics import Metricas, agregar_argumentos
+
+BASE_DIR = Path(__file__).parent.parent
+PROCESSED_DIR = BASE_DIR / "data" / "processed"
+WEB_PUBLIC = BASE_DIR / "web" / "public"
+
+CAPA = "trees"
+CAPA_GRUPOS = "clusters"
+ZOOM_MIN = 10
+ZOOM_MAX = 16
+# Features por tesela antes de empezar a descartar los puntos más densos
+MAX_FEATURES = 20_000
+# Bytes (gzip) por tesela: si se pasa, se achica el presupuesto de features
+MAX_BYTES = 500_000
+# Lado de la celda de agrupación en unidades de tesela (4096 / 128 = 32x32 celdas)
+TAMANO_GRUPO = 128
+# Diccionario de especies (id = posición, por frecuencia descendente)
+DICCIONARIO = "species-ids.json"
+SIN_ESPECIE = -1
+
+# Puntos compartidos con los procesos de trabajo (ver iniciar_trabajador)
+_PUNTOS = None
+
+
+# ── Datos ────────────────────────────────────────────────────────────────────
+
+def cargar_puntos(ruta, espacial=False):
+    """Arrays de coordenadas y propiedades de los árboles con coordenadas."""
+    df = pd.read_csv(ruta, usecols=["Arbol", "lat", "lng", "Nombre común", "CCZ",
+                                    "Altura", "CAP", "Diametro Copa"],
+                     low_memory=False)
+    df = df[df["lat"].notna() & df["lng"].notna()]
+    if espacial:
+        df = orden_espacial.ordenar(df)
+    # Ids de especie por frecuencia (empates por nombre): los más comunes son
+    # los varints más cortos
+    conteos = df["Nombre común"].value_counts()
+    conteos = conteos.iloc[np.lexsort((conteos.index.to_numpy(), -conteos.to_numpy()))]
+    codigos = pd.Categorical(df["Nombre común"], categories=conteos.index).codes.astype(np.int64)
+    ids = df["Arbol"].to_numpy(dtype=np.int64)
+    return {
+        "lng": df["lng"].to_numpy(dtype=float),
+        "lat": df["lat"].to_numpy(dtype=float),
+        "i": ids,
+        # Especie codificada por diccionario; el código -1 (sin nombre) es ""
+        "e": codigos,
+        "especies": list(conteos.index) + [""],
+        "arboles_por_especie": conteos.to_numpy().tolist(),
+        # Valor de e en las teselas: nombre o id (ver --especies-enteras)
+        "e_entero": False,
+        "c": df["CCZ"].fillna(0).to_numpy(dtype=np.int64),
+        # Clave para decidir qué puntos se descartan (menor = se conserva)
+        "prioridad": prioridad.clave_orden(prioridad.calcular(df), ids),
+    }
+
+
+def proyectar(lng, lat, z):
+    """Web Mercator: tesela (x, y) y coordenadas dentro de la tesela (0..EXTENT)."""
+    n = 1 << z
+    wx = (lng + 180.0) / 360.0 * n
+    lat_rad = np.radians(lat)
+    wy = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * n
+    tx = np.floor(wx).astype(np.int64)
+    ty = np.floor(wy).astype(np.int64)
+    px = np.round((wx - tx) * mvt.EXTENT).astype(np.int64)
+    py = np.round((wy - ty) * mvt.EXTENT).astype(np.int64)
+    return tx, ty, px, py
+
+
+def agrupar_teselas(puntos, z):
+    """Lista de (z, x, y, índices de puntos) de las teselas no vacías del zoom."""
+    tx, ty, _, _ = proyectar(puntos["lng"], puntos["lat"], z)
+    clave = tx * (1 << z) + ty
+    orden = np.argsort(clave, kind="stable")
+    claves, inicios = np.unique(clave[orden], return_index=True)
+    grupos = np.split(orden, inicios[1:])
+    n = 1 << z
+    return [(z, int(k // n), int(k % n), g) for k, g in zip(claves, grupos)]
+
+
+# ── Teselas ──────────────────────────────────────────────────────────────────
+
+def seleccionar(px, py, prioridad, presupuesto):
+    """Posiciones a conservar en una tesela con más features que el presupuesto.
+
+    Se agrupa en una grilla cada vez más gruesa y se deja un punto por celda
+    (el de mayor prioridad) hasta entrar en el presupuesto: se pierden puntos
+    solo donde hay más densidad.
+    """
+    if len(px) <= presupuesto:
+        return np.arange(len(px))
+    orden = np.argsort(prioridad, kind="stable")
+    celdas = mvt.EXTENT
+    while True:
+        tamano = (mvt.EXTENT + celdas) // celdas
+        celda = (py[orden] // tamano) * (celdas + 1) + px[orden] // tamano
+        _, primeros = np.unique(celda, return_index=True)
+        if len(primeros) <= presupuesto or celdas == 1:
+            break
+        celdas //= 2
+    # primeros ya está en orden de prioridad: recortar si aún sobran
+    return np.sort(orden[np.sort(primeros)][:presupuesto])
+
+
+def iniciar_trabajador(puntos):
+    global _PUNTOS
+    _PUNTOS = puntos
+
+
+def codificar_tesela(tarea):
+    """Codificar una tesela: (tile_id, bytes gzip, features, descartados).
+
+    Si la tesela comprimida pasa de max_bytes se vuelve a seleccionar con un
+    presupuesto de features proporcionalmente menor.
+    """
+    z, x, y, indices, presupuesto, max_bytes = tarea
+    p = _PUNTOS
+    _, _, px, py = proyectar(p["lng"][indices], p["lat"][indices], z)
+    while True:
+        conservar = seleccionar(px, py, p["prioridad"][indices], presupuesto)
+        datos = gzip.compress(codificar_puntos(p, indices[conservar], px[conservar], py[conservar]),
+                              mtime=0)
+        if len(datos) <= max_bytes or len(conservar) <= 1:
+            break
+        presupuesto = max(1, min(len(conservar) - 1, int(len(conservar) * max_bytes / len(datos) * 0.95)))
+    return zxy_a_tile_id(z, x, y), datos, len(conservar), len(px) - len(conservar)
+
+
+def codificar_puntos(p, indices, px, py):
+    """Bytes MVT (sin comprimir) de la capa de puntos."""
+    if p["e_entero"]:
+        # El código -1 (sin nombre) coincide con SIN_ESPECIE
+        e = p["e"][indices].tolist()
+    else:
+        especies = p["especies"]
+        e = [especies[k] for k in p["e"][indices].tolist()]
+    return mvt.codificar_capa(
+        CAPA, px.tolist(), py.tolist(),
+        {
+            "i": p["i"][indices].tolist(),
+            "e": e,
+            "c": p["c"][indices].tolist(),
+        },
+    )
+
+
+def generar_teselas(puntos, tareas, procesos):
+    """Iterar los resultados de codificar_tesela en el orden de las tareas."""
+    if procesos <= 1:
+        iniciar_trabajador(puntos)
+        yield from map(codificar_tesela, tareas)
+        return
+    # Lotes chicos: las pocas teselas de zoom bajo concentran casi todo el trabajo
+    lote = max(1, len(tareas) // (procesos * 32))
+    with Pool(procesos, initializer=iniciar_trabajador, initargs=(puntos,)) as pool:
+        yield from pool.imap(codificar_tesela, tareas, chunksize=lote)
+
+
+# ── Grupos (zooms bajos) ─────────────────────────────────────────────────────
+
+def agrupar(puntos, z):
+    """Grupos de la grilla de zoom z, ordenados por tesela y celda.
+
+    Devuelve un DataFrame con una fila por celda no vacía: tesela (x, y),
+    posición media de sus árboles dentro de la tesela, cantidad, especie
+    dominante (la de más árboles; -1 solo si ninguno tiene nombre) e
+    histograma "id:árboles" de mayor a menor.
+    """
+    tx, ty, px, py = proyectar(puntos["lng"], puntos["lat"], z)
+    lados = mvt.EXTENT // TAMANO_GRUPO
+    cx = np.minimum(px // TAMANO_GRUPO, lados - 1)
+    cy = np.minimum(py // TAMANO_GRUPO, lados - 1)
+    n = 1 << z
+    filas = pd.DataFrame({
+        "celda": ((tx * n + ty) * lados + cy) * lados + cx,
+        "e": puntos["e"],
+        "px": px,
+        "py": py,
+    })
+    grupos = filas.groupby("celda").agg(n=("e", "size"), px=("px", "mean"), py=("py", "mean"))
+
+    conteos = filas.groupby(["celda", "e"]).size().rename("arboles").reset_index()
+    # Sin nombre al final; después más árboles primero, empates por id
+    conteos = conteos.assign(sin_nombre=conteos["e"] == SIN_ESPECIE).sort_values(
+        ["celda", "sin_nombre", "arboles", "e"], ascending=[True, True, False, True])
+    grupos["e"] = conteos.groupby("celda")["e"].first()
+    grupos["h"] = (conteos["e"].astype(str) + ":" + conteos["arboles"].astype(str)) \
+        .groupby(conteos["celda"]).agg(",".join)
+
+    tesela = grupos.index.to_numpy() // (lados * lados)
+    grupos["x"] = tesela // n
+    grupos["y"] = tesela % n
+    grupos["px"] = grupos["px"].round().astype(np.int64)
+    grupos["py"] = grupos["py"].round().astype(np.int64)
+    return grupos.reset_index(drop=True)
+
+
+def teselas_grupos(puntos, z):
+    """(tile_id, bytes gzip, grupos, árboles) de cada tesela de la capa de grupos."""
+    grupos = agrupar(puntos, z)
+    especies = puntos["especies"]
+    tesela = grupos["x"].to_numpy() * (1 << z) + grupos["y"].to_numpy()
+    _, inicios = np.unique(tesela, return_index=True)
+    resultado = []
+    for inicio, fin in zip(inicios, list(inicios[1:]) + [len(grupos)]):
+        g = grupos.iloc[inicio:fin]
+        e = g["e"].tolist()
+        datos = mvt.codificar_capa(
+            CAPA_GRUPOS, g["px"].tolist(), g["py"].tolist(),
+            {
+                "n": g["n"].tolist(),
+                "e": e if puntos["e_entero"] else [especies[k] for k in e],
+                "h": g["h"].tolist(),
+            },
+        )
+        x, y = int(g["x"].iloc[0]), int(g["y"].iloc[0])
+        resultado.append((zxy_a_tile_id(z, x, y), gzip.compress(datos, mtime=0),
+                          len(g), int(g["n"].sum())))
+    resultado.sort()
+    return resultado
+
+
+def diccionario_especies(puntos):
+    """Contenido de species-ids.json: nombres y árboles por id de especie."""
+    return {
+        "version": 1,
+        "sin_especie": SIN_ESPECIE,
+        "especies": puntos["especies"][:-1],
+        "arboles": puntos["arboles_por_especie"],
+    }
+
+
+def escribir_diccionario(diccionario, ruta):
+    """Escribir el diccionario; devuelve (bytes, sha256)."""
+    datos = json.dumps(diccionario, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    ruta.write_bytes(datos)
+    return len(datos), hashlib.sha256(datos).hexdigest()
+
+
+def metadata(min_zoom, max_zoom, especies=None, zoom_puntos=None):
+    """Metadata del PMTiles; especies = (archivo, sha256) si e es entero."""
+    tipo_e = "Number" if especies else "String"
+    capas = [{
+        "id": CAPA,
+        "fields": {"i": "Number", "e": tipo_e, "c": "Number"},
+        "minzoom": max(min_zoom, zoom_puntos or min_zoom),
+        "maxzoom": max_zoom,
+    }]
+    if zoom_puntos and zoom_puntos > min_zoom:
+        capas.insert(0, {
+            "id": CAPA_GRUPOS,
+            "fields": {"n": "Number", "e": tipo_e, "h": "String"},
+            "minzoom": min_zoom,
+            "maxzoom": min(zoom_puntos - 1, max_zoom),
+        })
+    datos = {
+        "name": CAPA,
+        "format": "pbf",
+        "type": "overlay",
+        "generator": "generate_pmtiles.py",
+        "vector_layers": capas,
+    }
+    if especies:
+        datos["species_dictionary"] = {"file": especies[0], "sha256": especies[1]}
+    return datos
+
+
+# ── tippecanoe (referencia) ──────────────────────────────────────────────────
+
+def correr_tippecanoe(geojson, min_zoom, max_zoom):
+    """Tiempo y tamaño del PMTiles de tippecanoe (None si no está instalado)."""
+    if shutil.which("tippecanoe") is None or not geojson.exists():
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        salida = Path(tmp) / "trees.pmtiles"
+        inicio = time.perf_counter()
+        subprocess.run([
+            "tippecanoe", "-o", str(salida), "--force", f"--layer={CAPA}",
+            f"--minimum-zoom={min_zoom}", f"--maximum-zoom={max_zoom}",
+            "--drop-densest-as-needed", "--quiet", str(geojson),
+        ], check=True)
+        return time.perf_counter() - inicio, salida.stat().st_size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generar trees.pmtiles sin tippecanoe.")
+    parser.add_argument("--min-zoom", type=int, default=ZOOM_MIN)
+    parser.add_argument("--max-zoom", type=int, default=ZOOM_MAX)
+    parser.add_argument("--max-features", type=int, default=MAX_FEATURES,
+                        help=f"presupuesto de features por tesela (default {MAX_FEATURES:,})")
+    parser.add_argument("--max-bytes", type=int, default=MAX_BYTES,
+                        help=f"tamaño máximo de una tesela comprimida (default {MAX_BYTES:,})")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1,
+                        help="procesos para codificar teselas (default: todos los núcleos)")
+    parser.add_argument("--salida", type=Path, default=None,
+                        help="ruta del PMTiles (default web/public/trees.pmtiles)")
+    parser.add_argument("--comparar-tippecanoe", action="store_true",
+                        help="medir también tippecanoe sobre web/public/trees.json")
+    parser.add_argument("--orden-espacial", action="store_true",
+                        help="ordenar los puntos (y los features de cada tesela) por curva de Hilbert")
+    parser.add_argument("--especies-enteras", action="store_true",
+                        help=f"codificar e como id de especie de {DICCIONARIO} en vez del nombre")
+    parser.add_argument("--zoom-puntos", type=int, default=None,
+                        help=f"zoom desde el que hay puntos; por debajo, capa {CAPA_GRUPOS} (p. ej. 13)")
+    agregar_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas = Metricas.desde_args("generate_pmtiles", args)
+    salida = args.salida or WEB_PUBLIC / "trees.pmtiles"
+
+    print("Cargando datos...")
+    with metricas.etapa("cargar_csv") as etapa:
+        puntos = cargar_puntos(PROCESSED_DIR / "arboles_montevideo_geo.csv", args.orden_espacial)
+        etapa.filas_salida = len(puntos["i"])
+        puntos["e_entero"] = args.especies_enteras
+    print(f"Árboles con coordenadas: {len(puntos['i']):,}")
+
+    with metricas.etapa("diccionario_especies") as etapa:
+        ruta_diccionario = salida.parent / DICCIONARIO
+        tamano, digest = escribir_diccionario(diccionario_especies(puntos), ruta_diccionario)
+        etapa.filas_salida = len(puntos["especies"]) - 1
+        etapa.extra["bytes"] = tamano
+    print(f"  {ruta_diccionario} ({etapa.filas_salida} especies"
+          f"{', e como id' if args.especies_enteras else ''})")
+
+    # Zooms con la capa de grupos (vacío sin --zoom-puntos)
+    zoom_puntos = max(args.min_zoom, args.zoom_puntos or args.min_zoom)
+    zooms_grupos = range(args.min_zoom, min(zoom_puntos, args.max_zoom + 1))
+    escritor = EscritorPMTiles(salida)
+    if zooms_grupos:
+        print(f"\nAgregando grupos (zoom {zooms_grupos[0]}-{zooms_grupos[-1]})...")
+        with metricas.etapa("grupos", filas_entrada=len(puntos["i"])) as etapa:
+            etapa.filas_salida = 0
+            for z in zooms_grupos:
+                # Los tile ids de un zoom son todos menores que los del siguiente
+                resultados = teselas_grupos(puntos, z)
+                for tile_id, datos, _, _ in resultados:
+                    escritor.agregar(tile_id, datos)
+                grupos = sum(r[2] for r in resultados)
+                etapa.filas_salida += grupos
+                print(f"  z{z:<2d} {len(resultados):6,} teselas  {grupos:9,} grupos   "
+                      f"{sum(r[3] for r in resultados):9,} árboles     "
+                      f"{sum(len(r[1]) for r in resultados) / 1024:9.0f} KB")
+
+    print(f"\nAgrupando por tesela (zoom {zoom_puntos}-{args.max_zoom})...")
+    with metricas.etapa("agrupar_teselas", filas_entrada=len(puntos["i"])) as etapa:
+        tareas = []
+        for z in range(zoom_puntos, args.max_zoom + 1):
+            tareas += [(*t, args.max_features, args.max_bytes) for t in agrupar_teselas(puntos, z)]
+        tareas.sort(key=lambda t: zxy_a_tile_id(t[0], t[1], t[2]))
+        etapa.filas_salida = len(tareas)
+    print(f"  {len(tareas):,} teselas")
+
+    print(f"Codificando teselas ({args.procesos} procesos)...")
+    with metricas.etapa("codificar_teselas", filas_entrada=len(tareas)) as etapa:
+        por_zoom = {}
+        for (z, *_), (tile_id, datos, features, descartados) in zip(
+                tareas, generar_teselas(puntos, tareas, args.procesos)):
+            escritor.agregar(tile_id, datos)
+            resumen = por_zoom.setdefault(z, [0, 0, 0, 0])
+            resumen[0] += 1
+            resumen[1] += features
+            resumen[2] += descartados
+            resumen[3] += len(datos)
+        etapa.filas_salida = sum(r[1] for r in por_zoom.values())
+        etapa.extra["descartados"] = sum(r[2] for r in por_zoom.values())
+
+    for z, (teselas, features, descartados, bytes_) in sorted(por_zoom.items()):
+        print(f"  z{z:<2d} {teselas:6,} teselas  {features:9,} features  "
+              f"{descartados:9,} descartados  {bytes_ / 1024:9.0f} KB")
+
+    with metricas.etapa("escribir_pmtiles") as etapa:
+        limites = (puntos["lng"].min(), puntos["lat"].min(),
+                   puntos["lng"].max(), puntos["lat"].max())
+        centro = ((limites[0] + limites[2]) / 2, (limites[1] + limites[3]) / 2, args.min_zoom)
+        etapa.extra["bytes"] = escritor.cerrar(
+            metadata(args.min_zoom, args.max_zoom,
+                     (DICCIONARIO, digest) if args.especies_enteras else None,
+                     zoom_puntos),
+            args.min_zoom, args.max_zoom, limites, centro)
+    print(f"\n  {salida} ({etapa.extra['bytes'] / 1024 / 1024:.1f} MB)")
+
+    if args.comparar_tippecanoe:
+        with metricas.etapa("tippecanoe") as etapa:
+            referencia = correr_tippecanoe(WEB_PUBLIC / "trees.json", args.min_zoom, args.max_zoom)
+        if referencia is None:
+            print("\ntippecanoe no disponible (o falta trees.json): sin comparación")
+        else:
+            tiempo, tamano = referencia
+            etapa.extra["bytes"] = tamano
+            propio = sum(e["tiempo_s"] for e in metricas.etapas
+                         if e["etapa"] in ("agrupar_teselas", "codificar_teselas", "escribir_pmtiles"))
+            print(f"\ntippecanoe: {tiempo:.1f}s, {tamano / 1024 / 1024:.1f} MB "
+                  f"(generate_pmtiles: {propio:.1f}s)")
+
+    metricas.guardar(args.metrics)
+    print("\nListo.")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,26 +3,175 @@
 Genera un reporte HTML interactivo del censo de arbolado de Montevideo.
 """
 
+import argparse
+import base64
+import hashlib
+import os
+import re
+import time
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs_version
 from plotly.subplots import make_subplots
 from pathlib import Path
+from dataclasses import dataclass
 from datetime import datetime
+from multiprocessing import Pool
+from types import SimpleNamespace
+
+import densidad
+from metrics import Metricas, agregar_argumentos
 
 # Rutas
 PROCESSED_DIR = Path(__file__).parent.parent / "data" / "processed"
 DATA_FILE = PROCESSED_DIR / "arboles_montevideo_geo.csv"  # Dataset con coordenadas
 OUTPUT_FILE = PROCESSED_DIR / "reporte_arbolado.html"
+CACHE_DIR = PROCESSED_DIR / "cache" / "reporte"  # Fragmentos HTML de cada gráfico
 
 def load_data():
     """Cargar datos procesados."""
     df = pd.read_csv(DATA_FILE, low_memory=False)
     return df
 
-def create_species_chart(df):
+# ── Resumen de agregados ─────────────────────────────────────────────────────
+
+# Columnas que lee el reporte (las únicas que entran en el hash del dataset)
+COLUMNAS = ['Nombre científico', 'CCZ', 'EV', 'Altura', 'Diametro Copa', 'Calle',
+            'Int.Aerea', 'Int.Sub', 'lat', 'lng']
+
+EV_LABELS = {
+    1: 'Muy bueno',
+    2: 'Bueno',
+    3: 'Regular',
+    4: 'Malo',
+    5: 'Muy malo',
+    6: 'Muerto',
+    7: 'Tocón'
+}
+
+# Bordes de los histogramas (metros): bins de 1 m hasta el máximo válido
+BORDES_ALTURA = np.arange(0, 51)
+BORDES_COPA = np.arange(0, 31)
+
+# plotly.js que entiende los fragmentos generados (plotly-latest quedó en 1.58,
+# sin Scattermap)
+PLOTLYJS_VERSION = get_plotlyjs_version()
+
+# Especies con color propio en el mapa por especie (el resto va en gris)
+ESPECIES_MAPA = len(densidad.COLORES_ESPECIES)
+
+
+@dataclass
+class ReportSummary:
+    """Todos los agregados que usan los gráficos, calculados en una pasada."""
+    hash: str
+    total_arboles: int
+    total_especies: int
+    total_calles: int
+    altura_media: float
+    copa_media: float
+    con_coords: int
+    total_con_ev: int
+    especies: pd.Series        # árboles por nombre científico, mayor a menor
+    ccz: pd.Series             # árboles por CCZ, ordenado por CCZ
+    estados: pd.Series         # árboles por EV válido (1-7)
+    calles: pd.Series          # árboles por calle, mayor a menor (top 15)
+    altura_hist: np.ndarray    # conteos por bin de BORDES_ALTURA
+    copa_hist: np.ndarray      # conteos por bin de BORDES_COPA
+    especies_ccz: pd.DataFrame  # top 10 especies × CCZ
+    altura_cajas: pd.DataFrame  # cuartiles y bigotes de altura, top 10 especies
+    interferencias: dict
+    especies_mapa: list        # especies con color propio en el mapa por especie
+    extension: tuple           # (lng0, lat0, lng1, lat1) del raster de densidad
+    densidad: np.ndarray       # árboles por píxel: (ESPECIES_MAPA + 1, alto, ancho)
+    fuera_mapa: int            # árboles con coordenadas fuera de la extensión del mapa
+
+
+_RESUMENES = {}
+
+
+def dataset_hash(df):
+    """Hash de las columnas del reporte (contenido, no identidad del DataFrame)."""
+    columnas = [c for c in COLUMNAS if c in df.columns]
+    valores = pd.util.hash_pandas_object(df[columnas], index=False).to_numpy()
+    return hashlib.sha256(valores.tobytes() + repr(columnas).encode()).hexdigest()[:16]
+
+
+def cajas(valores, grupos, orden):
+    """Estadísticas de box plot (bigotes a 1.5 IQR, como Plotly) por grupo."""
+    filas = []
+    for nombre in orden:
+        v = np.sort(valores[grupos == nombre])
+        if not len(v):
+            continue
+        q1, mediana, q3 = np.percentile(v, [25, 50, 75])
+        iqr = q3 - q1
+        dentro = v[(v >= q1 - 1.5 * iqr) & (v <= q3 + 1.5 * iqr)]
+        filas.append({'especie': nombre, 'n': len(v), 'q1': q1, 'mediana': mediana, 'q3': q3,
+                      'min': dentro.min(), 'max': dentro.max(), 'media': v.mean()})
+    return pd.DataFrame(filas)
+
+
+def build_summary(df):
+    """Resumen de agregados del dataset, memoizado por su hash."""
+    clave = dataset_hash(df)
+    if clave in _RESUMENES:
+        return _RESUMENES[clave]
+
+    especies = df['Nombre científico'].value_counts()
+    top_10 = especies.head(10).index
+    ev = pd.to_numeric(df['EV'], errors='coerce')
+    ev = ev[ev.isin(range(1, 8))].astype(int)
+    altura = df['Altura'].to_numpy(dtype=float)
+    copa = df['Diametro Copa'].to_numpy(dtype=float) if 'Diametro Copa' in df.columns else np.array([])
+    aerea = (df['Int.Aerea'] == 'S').to_numpy()
+    sub = (df['Int.Sub'] == 'S').to_numpy()
+    en_top = df['Nombre científico'].isin(top_10).to_numpy()
+    geo = df[df['lat'].notna() & df['lng'].notna()]
+    lat, lng = geo['lat'].to_numpy(dtype=float), geo['lng'].to_numpy(dtype=float)
+    ext = densidad.extension(lat, lng)
+    # Código de especie para el mapa: las más comunes 0..ESPECIES_MAPA-1, el resto ESPECIES_MAPA
+    codigo_mapa = pd.Categorical(geo['Nombre científico'], categories=especies.index[:ESPECIES_MAPA]).codes
+    codigo_mapa = np.where(codigo_mapa < 0, ESPECIES_MAPA, codigo_mapa)
+    conteos_mapa = densidad.agregar(lat, lng, ext, categorias=codigo_mapa, n_categorias=ESPECIES_MAPA + 1)
+
+    altura_valida = altura[(altura > 0) & (altura <= 50)]
+    copa_valida = copa[(copa > 0) & (copa <= 30)]
+    con_altura = en_top & (altura <= 50)
+
+    resumen = ReportSummary(
+        hash=clave,
+        total_arboles=len(df),
+        total_especies=len(especies),
+        total_calles=df['Calle'].nunique(),
+        altura_media=float(np.nanmean(altura)) if len(altura) else 0.0,
+        copa_media=float(np.nanmean(copa)) if len(copa) else 0.0,
+        con_coords=len(geo),
+        total_con_ev=int(df['EV'].notna().sum()),
+        especies=especies,
+        ccz=df['CCZ'].value_counts().sort_index(),
+        estados=ev.value_counts().sort_index(),
+        calles=df['Calle'].value_counts().head(15),
+        altura_hist=np.histogram(altura_valida, BORDES_ALTURA)[0],
+        copa_hist=np.histogram(copa_valida, BORDES_COPA)[0],
+        especies_ccz=pd.crosstab(df.loc[en_top, 'Nombre científico'], df.loc[en_top, 'CCZ']),
+        altura_cajas=cajas(altura[con_altura], df['Nombre científico'].to_numpy()[con_altura], top_10),
+        interferencias={'aerea': int(aerea.sum()), 'sub': int(sub.sum()), 'ambas': int((aerea & sub).sum())},
+        especies_mapa=list(especies.index[:ESPECIES_MAPA]),
+        extension=ext,
+        densidad=conteos_mapa,
+        fuera_mapa=len(geo) - int(conteos_mapa.sum()),
+    )
+    _RESUMENES[clave] = resumen
+    return resumen
+
+# ── Gráficos ─────────────────────────────────────────────────────────────────
+
+def create_species_chart(resumen):
     """Gráfico de barras horizontales con las especies más comunes."""
-    top_species = df['Nombre científico'].value_counts().head(20).reset_index()
+    top_species = resumen.especies.head(20).reset_index()
     top_species.columns = ['Especie', 'Cantidad']
 
     fig = go.Figure(go.Bar(
@@ -44,9 +193,9 @@ def create_species_chart(df):
     )
     return fig.to_html(full_html=False, include_plotlyjs=False)
 
-def create_ccz_chart(df):
+def create_ccz_chart(resumen):
     """Gráfico de barras por CCZ."""
-    ccz_counts = df['CCZ'].dropna().value_counts().sort_index().reset_index()
+    ccz_counts = resumen.ccz.reset_index()
     ccz_counts.columns = ['CCZ', 'Cantidad']
     ccz_counts['CCZ_label'] = ccz_counts['CCZ'].apply(lambda x: f'CCZ {int(x)}')
 
@@ -67,17 +216,8 @@ def create_ccz_chart(df):
     )
     return fig.to_html(full_html=False, include_plotlyjs=False)
 
-def create_health_chart(df):
+def create_health_chart(resumen):
     """Gráfico de torta del estado vegetativo."""
-    ev_labels = {
-        1: 'Muy bueno',
-        2: 'Bueno',
-        3: 'Regular',
-        4: 'Malo',
-        5: 'Muy malo',
-        6: 'Muerto',
-        7: 'Tocón'
-    }
     ev_colors = {
         'Muy bueno': '#2ecc71',
         'Bueno': '#27ae60',
@@ -87,20 +227,8 @@ def create_health_chart(df):
         'Muerto': '#7f8c8d',
         'Tocón': '#34495e'
     }
-
-    # Normalizar EV a enteros
-    def normalize_ev(val):
-        try:
-            v = int(float(val))
-            return v if v in range(1, 8) else None
-        except:
-            return None
-
-    ev_normalized = df['EV'].apply(normalize_ev).dropna().astype(int)
-    ev_counts = ev_normalized.value_counts().sort_index()
-
-    labels = [ev_labels.get(k, f'Estado {k}') for k in ev_counts.index]
-    colors = [ev_colors.get(l, '#95a5a6') for l in labels]
+    ev_counts = resumen.estados
+    labels = [EV_LABELS.get(k, f'Estado {k}') for k in ev_counts.index]
 
     fig = px.pie(
         values=ev_counts.values,
@@ -113,55 +241,38 @@ def create_health_chart(df):
     fig.update_layout(height=450)
     return fig.to_html(full_html=False, include_plotlyjs=False)
 
-def create_height_histogram(df):
-    """Histograma de altura."""
-    altura = df['Altura'].dropna()
-    altura = altura[(altura > 0) & (altura <= 50)].tolist()
-
-    fig = go.Figure(data=[go.Histogram(
-        x=altura,
-        nbinsx=50,
-        marker_color='#27ae60'
+def histogram_chart(conteos, bordes, color, title, xaxis_title):
+    """Histograma a partir de conteos por bin ya calculados."""
+    fig = go.Figure(data=[go.Bar(
+        x=(bordes[:-1] + bordes[1:]) / 2,
+        y=conteos,
+        width=np.diff(bordes) * 0.9,
+        marker_color=color,
+        hovertemplate='%{x}: %{y:,}<extra></extra>'
     )])
     fig.update_layout(
-        title='Distribución de Altura de los Árboles',
-        xaxis_title='Altura (metros)',
+        title=title,
+        xaxis_title=xaxis_title,
         yaxis_title='Cantidad de árboles',
         height=400,
-        showlegend=False,
-        bargap=0.1
+        showlegend=False
     )
     return fig.to_html(full_html=False, include_plotlyjs=False)
 
-def create_crown_histogram(df):
-    """Histograma de diámetro de copa."""
-    copa = df['Diametro Copa'].dropna()
-    copa = copa[(copa > 0) & (copa <= 30)].tolist()
+def create_height_histogram(resumen):
+    """Histograma de altura."""
+    return histogram_chart(resumen.altura_hist, BORDES_ALTURA, '#27ae60',
+                           'Distribución de Altura de los Árboles', 'Altura (metros)')
 
-    fig = go.Figure(data=[go.Histogram(
-        x=copa,
-        nbinsx=30,
-        marker_color='#8e44ad'
-    )])
-    fig.update_layout(
-        title='Distribución del Diámetro de Copa',
-        xaxis_title='Diámetro de copa (metros)',
-        yaxis_title='Cantidad de árboles',
-        height=400,
-        showlegend=False,
-        bargap=0.1
-    )
-    return fig.to_html(full_html=False, include_plotlyjs=False)
+def create_crown_histogram(resumen):
+    """Histograma de diámetro de copa."""
+    return histogram_chart(resumen.copa_hist, BORDES_COPA, '#8e44ad',
+                           'Distribución del Diámetro de Copa', 'Diámetro de copa (metros)')
 
-def create_species_by_ccz_heatmap(df):
+def create_species_by_ccz_heatmap(resumen):
     """Heatmap de especies por CCZ."""
-    top_10_species = df['Nombre científico'].value_counts().head(10).index.tolist()
-    df_filtered = df[df['Nombre científico'].isin(top_10_species)]
-
-    pivot = pd.crosstab(df_filtered['Nombre científico'], df_filtered['CCZ'])
-
     fig = px.imshow(
-        pivot,
+        resumen.especies_ccz,
         title='Distribución de las 10 Especies Principales por CCZ',
         labels={'x': 'CCZ', 'y': 'Especie', 'color': 'Cantidad'},
         color_continuous_scale='YlGn',
@@ -170,15 +281,14 @@ def create_species_by_ccz_heatmap(df):
     fig.update_layout(height=500)
     return fig.to_html(full_html=False, include_plotlyjs=False)
 
-def create_interference_chart(df):
+def create_interference_chart(resumen):
     """Gráfico de interferencias."""
-    aerial = (df['Int.Aerea'] == 'S').sum()
-    underground = (df['Int.Sub'] == 'S').sum()
-    none = len(df) - aerial - underground + ((df['Int.Aerea'] == 'S') & (df['Int.Sub'] == 'S')).sum()
+    i = resumen.interferencias
+    none = resumen.total_arboles - i['aerea'] - i['sub'] + i['ambas']
 
     data = {
         'Tipo': ['Aérea', 'Subterránea', 'Sin interferencia'],
-        'Cantidad': [aerial, underground, none]
+        'Cantidad': [i['aerea'], i['sub'], none]
     }
 
     fig = px.bar(
@@ -192,10 +302,10 @@ def create_interference_chart(df):
     fig.update_layout(height=400, showlegend=False)
     return fig.to_html(full_html=False, include_plotlyjs=False)
 
-def create_geo_coverage_chart(df):
+def create_geo_coverage_chart(resumen):
     """Gráfico de cobertura de georeferenciación."""
-    con_coords = df['lat'].notna().sum()
-    sin_coords = df['lat'].isna().sum()
+    con_coords = resumen.con_coords
+    sin_coords = resumen.total_arboles - con_coords
 
     fig = go.Figure(data=[go.Pie(
         labels=['Con coordenadas', 'Sin coordenadas'],
@@ -206,49 +316,47 @@ def create_geo_coverage_chart(df):
     fig.update_layout(
         title=f'Cobertura de Georeferenciación',
         height=350,
-        annotations=[dict(text=f'{con_coords/len(df)*100:.0f}%', x=0.5, y=0.5, font_size=24, showarrow=False)]
+        annotations=[dict(text=f'{con_coords/resumen.total_arboles*100:.0f}%', x=0.5, y=0.5, font_size=24, showarrow=False)]
     )
     return fig.to_html(full_html=False, include_plotlyjs=False)
 
-def create_map_preview(df):
-    """Mapa de densidad de árboles."""
-    # Filtrar solo los que tienen coordenadas y tomar una muestra para rendimiento
-    df_geo = df[df['lat'].notna()].copy()
-
-    # Tomar muestra si hay muchos puntos
-    if len(df_geo) > 10000:
-        df_sample = df_geo.sample(n=10000, random_state=42)
+def create_map_preview(resumen, por_especie=False, como='eq_hist'):
+    """Mapa de densidad con todos los árboles, como imagen PNG sobre el mapa base."""
+    if por_especie:
+        colores = densidad.COLORES_ESPECIES + [densidad.COLOR_OTRAS]
+        imagen = densidad.sombrear_categorias(resumen.densidad, colores, como)
     else:
-        df_sample = df_geo
-
-    fig = go.Figure(go.Scattermapbox(
-        lat=df_sample['lat'],
-        lon=df_sample['lng'],
-        mode='markers',
-        marker=dict(
-            size=4,
-            color='#27ae60',
-            opacity=0.6
-        ),
-        text=df_sample['Nombre científico'],
-        hovertemplate='<b>%{text}</b><extra></extra>'
-    ))
-
+        imagen = densidad.sombrear(resumen.densidad.sum(axis=0), como)
+    fuente = 'data:image/png;base64,' + base64.b64encode(densidad.png(imagen)).decode('ascii')
+    lng0, lat0, lng1, lat1 = resumen.extension
+
+    # Plotly >= 5.24 usa MapLibre (Scattermap, 'map'); las versiones previas, Scattermapbox
+    traza, clave = (go.Scattermap, 'map') if hasattr(go, 'Scattermap') else (go.Scattermapbox, 'mapbox')
+    fig = go.Figure(traza(lat=[], lon=[], mode='markers'))
+    fig.update_layout({clave: dict(
+        style='carto-positron',
+        center=dict(lat=(lat0 + lat1) / 2, lon=(lng0 + lng1) / 2),
+        zoom=10.5,
+        layers=[dict(sourcetype='image', source=fuente, below='traces',
+                     coordinates=[[lng0, lat1], [lng1, lat1], [lng1, lat0], [lng0, lat0]])],
+    )})
+    if por_especie:
+        nombres = resumen.especies_mapa + ['Otras']
+        for nombre, color in zip(nombres, colores):
+            fig.add_trace(traza(lat=[None], lon=[None], mode='markers', name=nombre,
+                                marker=dict(size=10, color=color)))
     fig.update_layout(
-        mapbox=dict(
-            style='carto-positron',
-            center=dict(lat=-34.85, lon=-56.18),
-            zoom=10.5
-        ),
         height=500,
         margin=dict(l=0, r=0, t=40, b=0),
-        title='Distribución de Árboles en Montevideo (muestra de 10,000)'
+        title=f'Distribución de Árboles en Montevideo ({int(resumen.densidad.sum()):,} árboles'
+              + (f'; {resumen.fuera_mapa:,} fuera del mapa)' if resumen.fuera_mapa else ')'),
+        showlegend=por_especie
     )
     return fig.to_html(full_html=False, include_plotlyjs=False)
 
-def create_top_streets_chart(df):
+def create_top_streets_chart(resumen):
     """Top calles con más árboles."""
-    top_streets = df['Calle'].dropna().value_counts().head(15).reset_index()
+    top_streets = resumen.calles.reset_index()
     top_streets.columns = ['Calle', 'Cantidad']
 
     fig = go.Figure(go.Bar(
@@ -270,54 +378,146 @@ def create_top_streets_chart(df):
     )
     return fig.to_html(full_html=False, include_plotlyjs=False)
 
-def create_height_by_species_box(df):
-    """Box plot de altura por especie."""
-    top_species = df['Nombre científico'].value_counts().head(10).index.tolist()
-    df_filtered = df[df['Nombre científico'].isin(top_species)]
-    df_filtered = df_filtered[df_filtered['Altura'].notna() & (df_filtered['Altura'] <= 50)]
-
-    fig = px.box(
-        df_filtered,
-        x='Nombre científico',
-        y='Altura',
-        title='Altura por Especie (Top 10)',
-        color='Nombre científico'
-    )
+def create_height_by_species_box(resumen):
+    """Box plot de altura por especie (cuartiles precalculados)."""
+    colores = px.colors.qualitative.Plotly
+    fig = go.Figure([go.Box(
+        name=c['especie'],
+        q1=[c['q1']], median=[c['mediana']], q3=[c['q3']],
+        lowerfence=[c['min']], upperfence=[c['max']], mean=[c['media']],
+        marker_color=colores[k % len(colores)]
+    ) for k, c in enumerate(resumen.altura_cajas.to_dict('records'))])
     fig.update_layout(
+        title='Altura por Especie (Top 10)',
+        xaxis_title='Nombre científico',
+        yaxis_title='Altura',
         height=500,
         showlegend=False,
         xaxis_tickangle=-45
     )
     return fig.to_html(full_html=False, include_plotlyjs=False)
 
-def generate_html_report(df):
-    """Genera el reporte HTML completo."""
+# ── Fragmentos en paralelo y en caché ────────────────────────────────────────
+
+# nombre: (función, versión, campos del resumen que usa). Subir la versión al
+# cambiar el código de un gráfico invalida sus fragmentos en caché.
+GRAFICOS = {
+    'species': (create_species_chart, 1, ('especies',)),
+    'ccz': (create_ccz_chart, 1, ('ccz',)),
+    'health': (create_health_chart, 1, ('estados',)),
+    'height_hist': (create_height_histogram, 1, ('altura_hist',)),
+    'crown_hist': (create_crown_histogram, 1, ('copa_hist',)),
+    'streets': (create_top_streets_chart, 1, ('calles',)),
+    'height_box': (create_height_by_species_box, 1, ('altura_cajas',)),
+    'map': (create_map_preview, 2, ('densidad', 'extension', 'especies_mapa', 'fuera_mapa')),
+}
+
+def hash_agregado(valor):
+    """Hash del contenido de un agregado del resumen (Series, DataFrame, array u otro)."""
+    h = hashlib.sha256(type(valor).__name__.encode())
+    if isinstance(valor, (pd.Series, pd.DataFrame)):
+        h.update(pd.util.hash_pandas_object(valor, index=True).to_numpy().tobytes())
+        h.update(repr((list(valor.columns) if isinstance(valor, pd.DataFrame) else valor.name,
+                       valor.index.name)).encode())
+    elif isinstance(valor, np.ndarray):
+        h.update(repr((valor.dtype.str, valor.shape)).encode())
+        h.update(np.ascontiguousarray(valor).tobytes())
+    else:
+        h.update(repr(valor).encode())
+    return h.hexdigest()
+
+def clave_fragmento(nombre, resumen, opciones):
+    """Clave de caché: (gráfico, versión, hash de sus agregados y opciones)."""
+    _, version, campos = GRAFICOS[nombre]
+    partes = [nombre, str(version), repr(sorted(opciones.items()))]
+    partes += [hash_agregado(getattr(resumen, campo)) for campo in campos]
+    return hashlib.sha256('\0'.join(partes).encode()).hexdigest()[:16]
+
+def render_chart(tarea):
+    """(fragmento HTML, segundos) de un gráfico (se ejecuta en los procesos de trabajo)."""
+    nombre, entradas, opciones = tarea
+    inicio = time.perf_counter()
+    html = GRAFICOS[nombre][0](SimpleNamespace(**entradas), **opciones)
+    return html, time.perf_counter() - inicio
+
+def render_charts(resumen, procesos=1, cache_dir=CACHE_DIR, opciones=None):
+    """{nombre: fragmento HTML} de todos los gráficos y {nombre: segundos} de los renderizados.
+
+    Cada gráfico se busca en cache_dir por su clave; los que faltan se
+    renderizan en un pool de procesos (cada uno recibe solo los agregados que
+    usa) y se guardan; los fragmentos viejos de cada gráfico se borran.
+    cache_dir None desactiva la caché.
+    """
+    opciones = opciones or {}
+    fragmentos, pendientes, vigentes = {}, [], set()
+    for nombre, (_, _, campos) in GRAFICOS.items():
+        opciones_grafico = opciones.get(nombre, {})
+        ruta = None
+        if cache_dir is not None:
+            ruta = Path(cache_dir) / f'{nombre}-{clave_fragmento(nombre, resumen, opciones_grafico)}.html'
+            vigentes.add(ruta.name)
+            if ruta.exists():
+                fragmentos[nombre] = ruta.read_text(encoding='utf-8')
+                continue
+        entradas = {campo: getattr(resumen, campo) for campo in campos}
+        pendientes.append((ruta, (nombre, entradas, opciones_grafico)))
+
+    tareas = [tarea for _, tarea in pendientes]
+    if procesos > 1 and len(tareas) > 1:
+        with Pool(min(procesos, len(tareas))) as pool:
+            resultados = pool.map(render_chart, tareas, chunksize=1)
+    else:
+        resultados = list(map(render_chart, tareas))
+
+    tiempos = {}
+    for (ruta, (nombre, _, _)), (html, segundos) in zip(pendientes, resultados):
+        fragmentos[nombre] = html
+        tiempos[nombre] = segundos
+        if ruta is not None:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            temporal = ruta.with_suffix('.tmp')
+            temporal.write_text(html, encoding='utf-8')
+            temporal.replace(ruta)
+
+    if cache_dir is not None and Path(cache_dir).is_dir():
+        fragmento = re.compile(rf"({'|'.join(map(re.escape, GRAFICOS))})-[0-9a-f]{{16}}\.html")
+        for ruta in Path(cache_dir).iterdir():
+            if fragmento.fullmatch(ruta.name) and ruta.name not in vigentes:
+                ruta.unlink()
+    return fragmentos, tiempos
+
+def generate_html_report(df, fragmentos=None):
+    """Genera el reporte HTML completo (fragmentos: de render_charts, opcional)."""
+    resumen = build_summary(df)
 
     # Calcular estadísticas
-    total_arboles = len(df)
-    total_especies = df['Nombre científico'].nunique()
-    total_calles = df['Calle'].dropna().nunique()
-    altura_media = df['Altura'].mean()
-    copa_media = df['Diametro Copa'].mean() if 'Diametro Copa' in df.columns else 0
+    total_arboles = resumen.total_arboles
+    total_especies = resumen.total_especies
+    total_calles = resumen.total_calles
+    altura_media = resumen.altura_media
+    copa_media = resumen.copa_media
 
     # Georeferenciación
-    con_coords = df['lat'].notna().sum()
+    con_coords = resumen.con_coords
     pct_geo = (con_coords / total_arboles) * 100
 
     # Estado de salud
-    buenos = ((df['EV'].astype(str) == '1') | (df['EV'].astype(str) == '2')).sum()
-    total_con_ev = df['EV'].notna().sum()
+    buenos = int(resumen.estados.get(1, 0) + resumen.estados.get(2, 0))
+    total_con_ev = resumen.total_con_ev
     pct_buenos = (buenos / total_con_ev) * 100 if total_con_ev > 0 else 0
 
-    # Generar gráficos
-    print("Generando gráficos...")
-    species_chart = create_species_chart(df)
-    ccz_chart = create_ccz_chart(df)
-    health_chart = create_health_chart(df)
-    height_hist = create_height_histogram(df)
-    crown_hist = create_crown_histogram(df)
-    streets_chart = create_top_streets_chart(df)
-    height_box = create_height_by_species_box(df)
+    # Gráficos
+    if fragmentos is None:
+        print("Generando gráficos...")
+        fragmentos = render_charts(resumen, cache_dir=None)[0]
+    species_chart = fragmentos['species']
+    ccz_chart = fragmentos['ccz']
+    health_chart = fragmentos['health']
+    height_hist = fragmentos['height_hist']
+    crown_hist = fragmentos['crown_hist']
+    streets_chart = fragmentos['streets']
+    height_box = fragmentos['height_box']
+    map_chart = fragmentos['map']
 
     html_content = f'''<!DOCTYPE html>
 <html lang="es">
@@ -325,7 +525,7 @@ def generate_html_report(df):
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Censo de Arbolado de Montevideo - Análisis</title>
-    <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
+    <script src="https://cdn.plot.ly/plotly-{PLOTLYJS_VERSION}.min.js"></script>
     <style>
         * {{
             margin: 0;
@@ -498,6 +698,9 @@ def generate_html_report(df):
                 <div class="chart-container">
                     {streets_chart}
                 </div>
+                <div class="chart-container full-width">
+                    {map_chart}
+                </div>
             </div>
         </div>
 
@@ -538,21 +741,61 @@ def generate_html_report(df):
 
     return html_content
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generar el reporte HTML del censo.")
+    parser.add_argument("--mapa-especies", action="store_true",
+                        help="colorear el mapa de densidad por especie (las más comunes)")
+    parser.add_argument("--sombreado", choices=["eq_hist", "log"], default="eq_hist",
+                        help="escala del mapa de densidad (default eq_hist)")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1,
+                        help="procesos para renderizar gráficos (default: todos los núcleos)")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help=f"renderizar todos los gráficos sin usar {CACHE_DIR}")
+    agregar_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas = Metricas.desde_args("generate_report", args)
+
     print("Cargando datos...")
-    df = load_data()
+    with metricas.etapa("cargar_csv") as etapa:
+        df = load_data()
+        etapa.filas_salida = len(df)
     print(f"  {len(df):,} registros cargados")
 
+    print("\nResumiendo datos...")
+    with metricas.etapa("resumen", filas_entrada=len(df)):
+        resumen = build_summary(df)
+
+    print(f"Generando gráficos ({args.procesos} procesos)...")
+    with metricas.etapa("graficos", filas_entrada=len(GRAFICOS)) as etapa:
+        opciones = {'map': {'por_especie': args.mapa_especies, 'como': args.sombreado}}
+        fragmentos, tiempos = render_charts(resumen, args.procesos,
+                                            None if args.sin_cache else CACHE_DIR, opciones)
+        en_cache = len(fragmentos) - len(tiempos)
+        etapa.filas_salida = len(fragmentos)
+        etapa.extra["en_cache"] = en_cache
+        etapa.extra["renderizados"] = len(tiempos)
+        # Segundos de render de cada gráfico renderizado (en su proceso); el
+        # mapa (sombreado + PNG) aparte: None si salió de la caché
+        etapa.extra["segundos"] = {n: round(t, 4) for n, t in tiempos.items() if n != 'map'}
+        etapa.extra["mapa_s"] = round(tiempos['map'], 4) if 'map' in tiempos else None
+        etapa.extra["bytes_mapa"] = len(fragmentos['map'])
+    print(f"  {en_cache} de {len(fragmentos)} desde la caché")
+
     print("\nGenerando reporte HTML...")
-    html = generate_html_report(df)
+    with metricas.etapa("generar_html", filas_entrada=len(df)):
+        html = generate_html_report(df, fragmentos)
 
     print(f"\nGuardando en {OUTPUT_FILE}...")
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        f.write(html)
+    with metricas.etapa("reporte_arbolado.html") as etapa:
+        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+            f.write(html)
+        etapa.extra["bytes"] = OUTPUT_FILE.stat().st_size
 
     print(f"\n✓ Reporte generado exitosamente!")
     print(f"  Archivo: {OUTPUT_FILE}")
     print(f"  Tamaño: {OUTPUT_FILE.stat().st_size / 1024:.1f} KB")
 
+    metricas.guardar(args.metrics)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Generar un censo sintético a escala para pruebas de rendimiento.
+
+Produce, en un directorio destino, los mismos archivos de entrada que usa el
+pipeline:
+  - raw/archivo_comunal{1..18}.csv  Censo (filas remuestreadas del censo real)
+  - raw/codigos-de-especie.csv      Copia de la tabla real de especies
+  - raw/wfs_arboles.geojson         Árboles con coordenadas (subconjunto + solo WFS)
+  - raw/wfs_puertas.geojson         Base de puertas de las calles sintéticas
+
+Las distribuciones se toman del censo real: cada réplica de la ciudad remuestrea
+filas completas (especie, calle, número, medidas, estado), así que se conservan
+las correlaciones entre columnas. Las réplicas k > 0 renombran sus calles y se
+ubican desplazadas en el espacio, como si fueran otras ciudades del área
+metropolitana.
+
+Uso:
+    python scripts/generate_synthetic.py --escala 10 --destino data/benchmark/x10
+"""
+
+import argparse
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+import analyze_data
+
+BASE_DIR = Path(__file__).parent.parent
+RAW_DIR = BASE_DIR / "data" / "raw"
+
+# Bounding box aproximado de Montevideo urbano
+LNG_MIN, LNG_MAX = -56.30, -56.05
+LAT_MIN, LAT_MAX = -34.92, -34.78
+
+# Un número de puerta equivale aproximadamente a un metro
+GRADOS_POR_METRO = 1e-5
+
+# Proporciones observadas entre censo y WFS
+FRACCION_EN_WFS = 0.80
+FRACCION_SOLO_WFS = 0.10
+
+# Separación entre puertas sintéticas adicionales (además de las de árboles)
+PASO_PUERTAS = 40
+
+COLUMNAS_CENSO = [
+    'Arbol', 'Cod Calle', 'Calle', 'Cod Entre', 'Entre', 'Cod Y', 'Y', 'Numero',
+    'Ajuste', 'Acera', 'Alineacion', 'Ordinal', 'Ancho Vereda', 'Distancia', 'CAP',
+    'Altura', 'Diametro Copa', 'EV', 'Int.Aerea', 'Int.Sub', 'Genero', 'Especie',
+    'Nombre científico',
+]
+
+
+def cargar_semilla():
+    """Cargar el censo real y la tabla de especies como semilla."""
+    print("Cargando censo real como semilla...")
+    censo = analyze_data.load_and_unify_trees()
+    censo = censo[[c for c in COLUMNAS_CENSO + ['CCZ'] if c in censo.columns]]
+    censo = censo[censo['Calle'].notna()].reset_index(drop=True)
+    censo['num'] = pd.to_numeric(censo['Numero'], errors='coerce').fillna(0).clip(lower=0)
+
+    especies = analyze_data.load_species_codes()
+    nombres = dict(zip(especies['Nombre Científico'], especies['Nombre común']))
+    print(f"  {len(censo):,} filas semilla, {censo['Calle'].nunique():,} calles")
+    return censo, nombres
+
+
+def centros_ccz(rng, desplazamiento):
+    """Centro (lng, lat) de cada CCZ, distribuidos en una grilla de 6x3."""
+    centros = {}
+    for i in range(18):
+        fila, col = divmod(i, 6)
+        lng = LNG_MIN + (col + 0.5) * (LNG_MAX - LNG_MIN) / 6
+        lat = LAT_MIN + (fila + 0.5) * (LAT_MAX - LAT_MIN) / 3
+        centros[i + 1] = (lng + desplazamiento[0], lat + desplazamiento[1])
+    return centros
+
+
+def geometria_calles(censo, rng, desplazamiento):
+    """Asignar a cada calle un segmento recto cerca del centro de su CCZ principal."""
+    por_calle = censo.groupby('Calle').agg(
+        ccz=('CCZ', lambda s: s.mode().iat[0]),
+        max_num=('num', 'max'),
+    )
+    centros = centros_ccz(rng, desplazamiento)
+    centro = np.array([centros[c] for c in por_calle['ccz']])
+    n = len(por_calle)
+
+    largo = np.maximum(por_calle['max_num'].to_numpy(), 200) * GRADOS_POR_METRO
+    angulo = rng.uniform(0, np.pi, n)
+    medio = centro + rng.normal(0, 0.01, (n, 2))
+    direccion = np.column_stack([np.cos(angulo), np.sin(angulo)])
+
+    geo = pd.DataFrame({
+        'lng0': medio[:, 0] - direccion[:, 0] * largo / 2,
+        'lat0': medio[:, 1] - direccion[:, 1] * largo / 2,
+        'dlng': direccion[:, 0] * largo,
+        'dlat': direccion[:, 1] * largo,
+        'max_num': np.maximum(por_calle['max_num'].to_numpy(), 200),
+    }, index=por_calle.index)
+    return geo
+
+
+def posicion(geo, calles, numeros):
+    """Posición (lng, lat) de un número de puerta sobre el segmento de su calle."""
+    g = geo.loc[calles]
+    t = np.clip(numeros / g['max_num'].to_numpy(), 0, 1)
+    lng = g['lng0'].to_numpy() + t * g['dlng'].to_numpy()
+    lat = g['lat0'].to_numpy() + t * g['dlat'].to_numpy()
+    return lng, lat
+
+
+def feature_json(lng, lat, props):
+    """Serializar un feature Point con propiedades ya codificadas como JSON."""
+    return (f'{{"type": "Feature", "geometry": {{"type": "Point", '
+            f'"coordinates": [{lng:.7f}, {lat:.7f}]}}, "properties": {{{props}}}}}')
+
+
+def json_o_null(valor):
+    """Codificar un valor escalar como JSON (NaN -> null)."""
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+        return 'null'
+    return json.dumps(valor, ensure_ascii=False)
+
+
+class EscritorGeoJSON:
+    """Escritor incremental de un FeatureCollection (una línea por feature)."""
+
+    def __init__(self, ruta):
+        self.f = open(ruta, 'w', encoding='utf-8')
+        self.f.write('{"type": "FeatureCollection", "features": [\n')
+        self.total = 0
+
+    def escribir(self, features):
+        if not features:
+            return
+        if self.total:
+            self.f.write(',\n')
+        self.f.write(',\n'.join(features))
+        self.total += len(features)
+
+    def cerrar(self):
+        self.f.write('\n]}\n')
+        self.f.close()
+
+
+def generar_replica(k, n_filas, censo, nombres, rng, escritores, siguiente_id):
+    """Generar una réplica de la ciudad y agregarla a los archivos de salida."""
+    # Las réplicas se disponen en una grilla alrededor de Montevideo
+    fila, col = divmod(k, 10)
+    desplazamiento = (col * (LNG_MAX - LNG_MIN + 0.05), -fila * (LAT_MAX - LAT_MIN + 0.05))
+    sufijo = f" R{k}" if k else ""
+
+    muestra = censo.iloc[rng.integers(0, len(censo), n_filas)].reset_index(drop=True)
+    geo = geometria_calles(muestra, rng, desplazamiento)
+
+    ids = np.arange(siguiente_id, siguiente_id + n_filas)
+    muestra['Arbol'] = ids
+    calles = muestra['Calle'].to_numpy()
+
+    # ── Censo: un CSV por CCZ ────────────────────────────────────────────
+    censo_out = muestra.copy()
+    if sufijo:
+        for col in ('Calle', 'Entre', 'Y'):
+            censo_out[col] = censo_out[col].where(censo_out[col].isna(), censo_out[col] + sufijo)
+        for col in ('Cod Calle', 'Cod Entre', 'Cod Y'):
+            cod = pd.to_numeric(censo_out[col], errors='coerce')
+            censo_out[col] = (cod + k * 100000).astype('Int64')
+    for ccz, grupo in censo_out.groupby('CCZ'):
+        grupo[COLUMNAS_CENSO].to_csv(
+            escritores['censo'][ccz], header=False, index=False)
+
+    # ── WFS árboles ──────────────────────────────────────────────────────
+    lng, lat = posicion(geo, calles, muestra['num'].to_numpy())
+    sin_numero = muestra['num'].to_numpy() <= 0
+    t = rng.random(sin_numero.sum())
+    g = geo.loc[calles[sin_numero]]
+    lng[sin_numero] = g['lng0'].to_numpy() + t * g['dlng'].to_numpy()
+    lat[sin_numero] = g['lat0'].to_numpy() + t * g['dlat'].to_numpy()
+    # Vereda: unos metros a un lado de la línea de puertas
+    lng += rng.normal(0, 5, n_filas) * GRADOS_POR_METRO
+    lat += rng.normal(0, 5, n_filas) * GRADOS_POR_METRO
+
+    en_wfs = rng.random(n_filas) < FRACCION_EN_WFS
+    n_solo = int(n_filas * FRACCION_SOLO_WFS)
+    extra = censo.iloc[rng.integers(0, len(censo), n_solo)]
+    extra_ids = np.arange(siguiente_id + n_filas, siguiente_id + n_filas + n_solo)
+    extra_pos = rng.integers(0, n_filas, n_solo)
+
+    cientificos = pd.concat([muestra['Nombre científico'][en_wfs], extra['Nombre científico']])
+    filas_wfs = pd.DataFrame({
+        'arbol': np.concatenate([ids[en_wfs], extra_ids]),
+        'nom_cientifico': cientificos.to_numpy(),
+        'nom_comun': cientificos.map(nombres).to_numpy(),
+        'altura': pd.to_numeric(pd.concat([muestra['Altura'][en_wfs], extra['Altura']]), errors='coerce').to_numpy(),
+        'cap': pd.to_numeric(pd.concat([muestra['CAP'][en_wfs], extra['CAP']]), errors='coerce').to_numpy() / 100,
+        'distancia': pd.to_numeric(pd.concat([muestra['Distancia'][en_wfs], extra['Distancia']]), errors='coerce').to_numpy(),
+        'lng': np.concatenate([lng[en_wfs], lng[extra_pos] + rng.normal(0, 20, n_solo) * GRADOS_POR_METRO]),
+        'lat': np.concatenate([lat[en_wfs], lat[extra_pos] + rng.normal(0, 20, n_solo) * GRADOS_POR_METRO]),
+    })
+    escritores['arboles'].escribir([
+        feature_json(r.lng, r.lat, (
+            f'"arbol": {r.arbol}, "nom_cientifico": {json_o_null(r.nom_cientifico)}, '
+            f'"nom_comun": {json_o_null(r.nom_comun)}, "altura": {json_o_null(r.altura)}, '
+            f'"cap": {json_o_null(r.cap)}, "distancia": {json_o_null(r.distancia)}'))
+        for r in filas_wfs.itertuples(index=False)
+    ])
+
+    # ── Puertas: números de los árboles + puertas cada PASO_PUERTAS ──────
+    con_numero = muestra[muestra['num'] > 0]
+    por_calle = np.ceil(geo['max_num'].to_numpy() / PASO_PUERTAS).astype(int)
+    inicio = np.repeat(np.cumsum(por_calle) - por_calle, por_calle)
+    regulares = pd.DataFrame({
+        'Calle': np.repeat(geo.index.to_numpy(), por_calle),
+        'num': 1 + (np.arange(por_calle.sum()) - inicio) * PASO_PUERTAS,
+    })
+    puertas = pd.concat([con_numero[['Calle', 'num']], regulares], ignore_index=True).drop_duplicates()
+    p_lng, p_lat = posicion(geo, puertas['Calle'].to_numpy(), puertas['num'].to_numpy())
+    nombres_calle = {c: json.dumps(c + sufijo, ensure_ascii=False) for c in geo.index}
+    escritores['puertas'].escribir([
+        feature_json(x, y, f'"nom_calle": {nombres_calle[c]}, "num_puerta": {int(n)}')
+        for c, n, x, y in zip(puertas['Calle'], puertas['num'], p_lng, p_lat)
+    ])
+
+    return siguiente_id + n_filas + n_solo, len(filas_wfs), len(puertas)
+
+
+def generar(escala, destino, semilla=42):
+    """Generar el censo sintético a la escala pedida en destino/raw."""
+    censo, nombres = cargar_semilla()
+    rng = np.random.default_rng(semilla)
+
+    raw = Path(destino) / "raw"
+    raw.mkdir(parents=True, exist_ok=True)
+    shutil.copy(RAW_DIR / "codigos-de-especie.csv", raw / "codigos-de-especie.csv")
+
+    escritores = {
+        'censo': {},
+        'arboles': EscritorGeoJSON(raw / "wfs_arboles.geojson"),
+        'puertas': EscritorGeoJSON(raw / "wfs_puertas.geojson"),
+    }
+    for ccz in range(1, 19):
+        f = open(raw / f"archivo_comunal{ccz}.csv", 'w', encoding='utf-8', newline='')
+        f.write(','.join(COLUMNAS_CENSO) + '\n')
+        escritores['censo'][ccz] = f
+
+    total = int(round(len(censo) * escala))
+    replicas = int(np.ceil(total / len(censo)))
+    print(f"\nGenerando {total:,} árboles en {replicas} réplica(s)...")
+
+    siguiente_id = 1
+    generados, total_wfs, total_puertas = 0, 0, 0
+    for k in range(replicas):
+        n = min(len(censo), total - generados)
+        siguiente_id, n_wfs, n_puertas = generar_replica(
+            k, n, censo, nombres, rng, escritores, siguiente_id)
+        generados += n
+        total_wfs += n_wfs
+        total_puertas += n_puertas
+        print(f"  Réplica {k + 1}/{replicas}: {generados:,} árboles")
+
+    for f in escritores['censo'].values():
+        f.close()
+    escritores['arboles'].cerrar()
+    escritores['puertas'].cerrar()
+
+    print(f"\nCenso:   {generados:,} árboles en 18 archivos")
+    print(f"WFS:     {total_wfs:,} árboles")
+    print(f"Puertas: {total_puertas:,} direcciones")
+    print(f"Destino: {raw}")
+    return raw
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generar un censo sintético a escala.")
+    parser.add_argument("--escala", type=float, default=1.0,
+                        help="múltiplo del tamaño del censo real (1 = ~211k árboles)")
+    parser.add_argument("--destino", type=Path, required=True,
+                        help="directorio destino (se crea destino/raw)")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args(argv)
+    generar(args.escala, args.destino, args.semilla)
+
+
+if __name__ == "__main__":
+    main()
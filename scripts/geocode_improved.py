@@ -6,6 +6,7 @@ Geocodificación mejorada de árboles usando múltiples estrategias:
 3. Ubicación por intersección de calles (para árboles sin número)
 """
 
+import argparse
 import json
 import pandas as pd
 import numpy as np
@@ -13,6 +14,8 @@ import re
 from pathlib import Path
 from collections import defaultdict
 
+from metrics import Metricas, agregar_argumentos
+
 BASE_DIR = Path(__file__).parent.parent
 RAW_DIR = BASE_DIR / "data" / "raw"
 PROCESSED_DIR = BASE_DIR / "data" / "processed"
@@ -487,21 +490,32 @@ def geocodificar_por_interseccion(row, indice_calle):
     return None, None, None
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Geocodificación mejorada de árboles.")
+    agregar_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas = Metricas.desde_args("geocode_improved", args)
+
     print("=" * 60)
     print("GEOCODIFICACIÓN MEJORADA")
     print("=" * 60)
 
     # Cargar datos
-    puertas_df = cargar_puertas()
-    arboles_df = pd.read_csv(PROCESSED_DIR / "arboles_montevideo_geo.csv", low_memory=False)
+    with metricas.etapa("cargar_puertas") as etapa:
+        puertas_df = cargar_puertas()
+        etapa.filas_salida = len(puertas_df)
+    with metricas.etapa("cargar_arboles") as etapa:
+        arboles_df = pd.read_csv(PROCESSED_DIR / "arboles_montevideo_geo.csv", low_memory=False)
+        etapa.filas_salida = len(arboles_df)
 
     print(f"\nTotal árboles: {len(arboles_df):,}")
     ya_tienen = arboles_df['lat'].notna().sum()
     print(f"Ya tienen coordenadas: {ya_tienen:,}")
 
     # Crear índices
-    indice_exacto, indice_calle = crear_indices(puertas_df)
+    with metricas.etapa("crear_indices", filas_entrada=len(puertas_df)) as etapa:
+        indice_exacto, indice_calle = crear_indices(puertas_df)
+        etapa.filas_salida = len(indice_exacto)
 
     # Procesar solo los que no tienen coordenadas
     sin_coords = arboles_df[arboles_df['lat'].isna()].copy()
@@ -510,30 +524,32 @@ def main():
     # Estadísticas
     stats = {'exacto': 0, 'interpolado': 0, 'interseccion': 0, 'centroide_calle': 0, 'no_encontrado': 0}
 
-    # Geocodificar
-    nuevas_coords = []
-    for idx, row in sin_coords.iterrows():
-        lat, lng, metodo = None, None, None
-
-        # Primero intentar por número
-        if pd.notna(row['Numero']) and row['Numero'] > 0:
-            lat, lng, metodo = geocodificar_por_numero(row, indice_exacto, indice_calle)
+    with metricas.etapa("ronda_1_puertas", filas_entrada=len(sin_coords)) as etapa:
+        # Geocodificar
+        nuevas_coords = []
+        for idx, row in sin_coords.iterrows():
+            lat, lng, metodo = None, None, None
 
-        # Si no funcionó, intentar por intersección
-        if lat is None:
-            lat, lng, metodo = geocodificar_por_interseccion(row, indice_calle)
+            # Primero intentar por número
+            if pd.notna(row['Numero']) and row['Numero'] > 0:
+                lat, lng, metodo = geocodificar_por_numero(row, indice_exacto, indice_calle)
 
-        if lat is not None:
-            stats[metodo] += 1
-            nuevas_coords.append({'idx': idx, 'lat': lat, 'lng': lng})
-        else:
-            stats['no_encontrado'] += 1
+            # Si no funcionó, intentar por intersección
+            if lat is None:
+                lat, lng, metodo = geocodificar_por_interseccion(row, indice_calle)
 
-    # Aplicar coordenadas de primera ronda
-    print("\nAplicando coordenadas (ronda 1)...")
-    for item in nuevas_coords:
-        arboles_df.at[item['idx'], 'lat'] = item['lat']
-        arboles_df.at[item['idx'], 'lng'] = item['lng']
+            if lat is not None:
+                stats[metodo] += 1
+                nuevas_coords.append({'idx': idx, 'lat': lat, 'lng': lng})
+            else:
+                stats['no_encontrado'] += 1
+
+        # Aplicar coordenadas de primera ronda
+        print("\nAplicando coordenadas (ronda 1)...")
+        for item in nuevas_coords:
+            arboles_df.at[item['idx'], 'lat'] = item['lat']
+            arboles_df.at[item['idx'], 'lng'] = item['lng']
+        etapa.filas_salida = len(nuevas_coords)
 
     # RONDA 2: Vecinos de cuadra
     # Para los que aún no tienen coords, buscar otros árboles en la misma cuadra
@@ -541,39 +557,42 @@ def main():
     print("RONDA 2: Vecinos de cuadra")
     print("-" * 60)
 
-    sin_coords_r2 = arboles_df[arboles_df['lat'].isna()].copy()
-    print(f"Árboles sin coordenadas: {len(sin_coords_r2):,}")
-
-    # Crear índice de cuadras con coordenadas
-    con_coords_df = arboles_df[arboles_df['lat'].notna()].copy()
-    con_coords_df['cuadra_key'] = (
-        con_coords_df['Calle'].fillna('').astype(str) + '|' +
-        con_coords_df['Entre'].fillna('').astype(str) + '|' +
-        con_coords_df['Y'].fillna('').astype(str)
-    )
-
-    # Agrupar por cuadra
-    cuadras = con_coords_df.groupby('cuadra_key').agg({
-        'lat': 'mean',
-        'lng': 'mean'
-    }).to_dict('index')
-
-    stats['vecino_cuadra'] = 0
-    nuevas_coords_r2 = []
-
-    for idx, row in sin_coords_r2.iterrows():
-        cuadra_key = f"{row['Calle'] or ''}|{row['Entre'] or ''}|{row['Y'] or ''}"
-        if cuadra_key in cuadras:
-            lat = cuadras[cuadra_key]['lat']
-            lng = cuadras[cuadra_key]['lng']
-            nuevas_coords_r2.append({'idx': idx, 'lat': lat, 'lng': lng})
-            stats['vecino_cuadra'] += 1
-
-    print(f"Geocodificados por vecino de cuadra: {stats['vecino_cuadra']:,}")
-
-    for item in nuevas_coords_r2:
-        arboles_df.at[item['idx'], 'lat'] = item['lat']
-        arboles_df.at[item['idx'], 'lng'] = item['lng']
+    with metricas.etapa("ronda_2_vecino_cuadra") as etapa:
+        sin_coords_r2 = arboles_df[arboles_df['lat'].isna()].copy()
+        print(f"Árboles sin coordenadas: {len(sin_coords_r2):,}")
+        etapa.filas_entrada = len(sin_coords_r2)
+
+        # Crear índice de cuadras con coordenadas
+        con_coords_df = arboles_df[arboles_df['lat'].notna()].copy()
+        con_coords_df['cuadra_key'] = (
+            con_coords_df['Calle'].fillna('').astype(str) + '|' +
+            con_coords_df['Entre'].fillna('').astype(str) + '|' +
+            con_coords_df['Y'].fillna('').astype(str)
+        )
+
+        # Agrupar por cuadra
+        cuadras = con_coords_df.groupby('cuadra_key').agg({
+            'lat': 'mean',
+            'lng': 'mean'
+        }).to_dict('index')
+
+        stats['vecino_cuadra'] = 0
+        nuevas_coords_r2 = []
+
+        for idx, row in sin_coords_r2.iterrows():
+            cuadra_key = f"{row['Calle'] or ''}|{row['Entre'] or ''}|{row['Y'] or ''}"
+            if cuadra_key in cuadras:
+                lat = cuadras[cuadra_key]['lat']
+                lng = cuadras[cuadra_key]['lng']
+                nuevas_coords_r2.append({'idx': idx, 'lat': lat, 'lng': lng})
+                stats['vecino_cuadra'] += 1
+
+        print(f"Geocodificados por vecino de cuadra: {stats['vecino_cuadra']:,}")
+
+        for item in nuevas_coords_r2:
+            arboles_df.at[item['idx'], 'lat'] = item['lat']
+            arboles_df.at[item['idx'], 'lng'] = item['lng']
+        etapa.filas_salida = stats['vecino_cuadra']
 
     # RONDA 3: Centroide por CCZ + Calle
     # Para los que aún faltan, usar el centroide de árboles de la misma calle en el mismo CCZ
@@ -581,67 +600,73 @@ def main():
     print("RONDA 3: Centroide por CCZ + Calle")
     print("-" * 60)
 
-    sin_coords_r3 = arboles_df[arboles_df['lat'].isna()].copy()
-    print(f"Árboles sin coordenadas: {len(sin_coords_r3):,}")
+    with metricas.etapa("ronda_3_centroide_ccz_calle") as etapa:
+        sin_coords_r3 = arboles_df[arboles_df['lat'].isna()].copy()
+        print(f"Árboles sin coordenadas: {len(sin_coords_r3):,}")
+        etapa.filas_entrada = len(sin_coords_r3)
 
-    con_coords_df = arboles_df[arboles_df['lat'].notna()].copy()
-    con_coords_df['ccz_calle'] = (
-        con_coords_df['CCZ'].fillna(0).astype(int).astype(str) + '|' +
-        con_coords_df['Calle'].fillna('').astype(str)
-    )
+        con_coords_df = arboles_df[arboles_df['lat'].notna()].copy()
+        con_coords_df['ccz_calle'] = (
+            con_coords_df['CCZ'].fillna(0).astype(int).astype(str) + '|' +
+            con_coords_df['Calle'].fillna('').astype(str)
+        )
 
-    ccz_calles = con_coords_df.groupby('ccz_calle').agg({
-        'lat': 'mean',
-        'lng': 'mean'
-    }).to_dict('index')
+        ccz_calles = con_coords_df.groupby('ccz_calle').agg({
+            'lat': 'mean',
+            'lng': 'mean'
+        }).to_dict('index')
 
-    stats['centroide_ccz_calle'] = 0
-    nuevas_coords_r3 = []
+        stats['centroide_ccz_calle'] = 0
+        nuevas_coords_r3 = []
 
-    for idx, row in sin_coords_r3.iterrows():
-        ccz_calle = f"{int(row['CCZ']) if pd.notna(row['CCZ']) else 0}|{row['Calle'] or ''}"
-        if ccz_calle in ccz_calles:
-            lat = ccz_calles[ccz_calle]['lat']
-            lng = ccz_calles[ccz_calle]['lng']
-            nuevas_coords_r3.append({'idx': idx, 'lat': lat, 'lng': lng})
-            stats['centroide_ccz_calle'] += 1
+        for idx, row in sin_coords_r3.iterrows():
+            ccz_calle = f"{int(row['CCZ']) if pd.notna(row['CCZ']) else 0}|{row['Calle'] or ''}"
+            if ccz_calle in ccz_calles:
+                lat = ccz_calles[ccz_calle]['lat']
+                lng = ccz_calles[ccz_calle]['lng']
+                nuevas_coords_r3.append({'idx': idx, 'lat': lat, 'lng': lng})
+                stats['centroide_ccz_calle'] += 1
 
-    print(f"Geocodificados por centroide CCZ+Calle: {stats['centroide_ccz_calle']:,}")
+        print(f"Geocodificados por centroide CCZ+Calle: {stats['centroide_ccz_calle']:,}")
 
-    for item in nuevas_coords_r3:
-        arboles_df.at[item['idx'], 'lat'] = item['lat']
-        arboles_df.at[item['idx'], 'lng'] = item['lng']
+        for item in nuevas_coords_r3:
+            arboles_df.at[item['idx'], 'lat'] = item['lat']
+            arboles_df.at[item['idx'], 'lng'] = item['lng']
+        etapa.filas_salida = stats['centroide_ccz_calle']
 
     # RONDA 4: Centroide por CCZ (último recurso)
     print("\n" + "-" * 60)
     print("RONDA 4: Centroide por CCZ")
     print("-" * 60)
 
-    sin_coords_r4 = arboles_df[arboles_df['lat'].isna()].copy()
-    print(f"Árboles sin coordenadas: {len(sin_coords_r4):,}")
+    with metricas.etapa("ronda_4_centroide_ccz") as etapa:
+        sin_coords_r4 = arboles_df[arboles_df['lat'].isna()].copy()
+        print(f"Árboles sin coordenadas: {len(sin_coords_r4):,}")
+        etapa.filas_entrada = len(sin_coords_r4)
 
-    con_coords_df = arboles_df[arboles_df['lat'].notna()].copy()
-    ccz_centroides = con_coords_df.groupby('CCZ').agg({
-        'lat': 'mean',
-        'lng': 'mean'
-    }).to_dict('index')
+        con_coords_df = arboles_df[arboles_df['lat'].notna()].copy()
+        ccz_centroides = con_coords_df.groupby('CCZ').agg({
+            'lat': 'mean',
+            'lng': 'mean'
+        }).to_dict('index')
 
-    stats['centroide_ccz'] = 0
-    nuevas_coords_r4 = []
+        stats['centroide_ccz'] = 0
+        nuevas_coords_r4 = []
 
-    for idx, row in sin_coords_r4.iterrows():
-        ccz = row['CCZ']
-        if pd.notna(ccz) and ccz in ccz_centroides:
-            lat = ccz_centroides[ccz]['lat']
-            lng = ccz_centroides[ccz]['lng']
-            nuevas_coords_r4.append({'idx': idx, 'lat': lat, 'lng': lng})
-            stats['centroide_ccz'] += 1
+        for idx, row in sin_coords_r4.iterrows():
+            ccz = row['CCZ']
+            if pd.notna(ccz) and ccz in ccz_centroides:
+                lat = ccz_centroides[ccz]['lat']
+                lng = ccz_centroides[ccz]['lng']
+                nuevas_coords_r4.append({'idx': idx, 'lat': lat, 'lng': lng})
+                stats['centroide_ccz'] += 1
 
-    print(f"Geocodificados por centroide CCZ: {stats['centroide_ccz']:,}")
+        print(f"Geocodificados por centroide CCZ: {stats['centroide_ccz']:,}")
 
-    for item in nuevas_coords_r4:
-        arboles_df.at[item['idx'], 'lat'] = item['lat']
-        arboles_df.at[item['idx'], 'lng'] = item['lng']
+        for item in nuevas_coords_r4:
+            arboles_df.at[item['idx'], 'lat'] = item['lat']
+            arboles_df.at[item['idx'], 'lng'] = item['lng']
+        etapa.filas_salida = stats['centroide_ccz']
 
     # Actualizar no_encontrado
     stats['no_encontrado'] = arboles_df['lat'].isna().sum()
@@ -671,9 +696,13 @@ def main():
 
     # Guardar
     output_path = PROCESSED_DIR / "arboles_montevideo_geo.csv"
-    arboles_df.to_csv(output_path, index=False)
+    with metricas.etapa("guardar_csv", filas_entrada=len(arboles_df)) as etapa:
+        arboles_df.to_csv(output_path, index=False)
+        etapa.filas_salida = len(arboles_df)
     print(f"\nGuardado en: {output_path}")
 
+    metricas.guardar(args.metrics)
+
 
 if __name__ == "__main__":
     main()
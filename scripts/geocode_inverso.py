@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Geocodificación inversa: la puerta más cercana a cada árbol.
+
+Con un KD-tree sobre la base de puertas (vecinos.py) se busca, para todos
+los árboles con coordenadas a la vez, la puerta más cercana de su misma
+calle (si la calle está en la base y la puerta a menos de DISTANCIA_MAXIMA)
+o, si no, la más cercana de cualquier calle. Se agregan al CSV procesado:
+
+  - Puerta Calle      calle normalizada de la puerta
+  - Puerta Numero     número de la puerta
+  - Puerta Distancia  metros del árbol a la puerta (para control de calidad)
+
+y se completa Numero donde falta cuando la puerta es de la misma calle.
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from generate_addresses import cargar_puertas
+from geocode_puertas import normalizar_calle
+from metrics import Metricas, agregar_argumentos
+from vecinos import IndiceVecinos
+
+BASE_DIR = Path(__file__).parent.parent
+RAW_DIR = BASE_DIR / "data" / "raw"
+PROCESSED_DIR = BASE_DIR / "data" / "processed"
+
+# Metros máximos a una puerta de la misma calle para usarla (y completar Numero)
+DISTANCIA_MAXIMA = 60.0
+
+
+def asignar_puertas(arboles_df, puertas_df, distancia_maxima=DISTANCIA_MAXIMA):
+    """(calle, número, metros, misma calle) de la puerta asignada a cada árbol.
+
+    Arrays alineados con arboles_df; los árboles sin coordenadas quedan con
+    calle None, número 0 y distancia NaN.
+    """
+    n = len(arboles_df)
+    calle = np.full(n, None, dtype=object)
+    numero = np.zeros(n, dtype=np.int64)
+    metros = np.full(n, np.nan)
+    misma_calle = np.zeros(n, dtype=bool)
+
+    con_coords = (arboles_df["lat"].notna() & arboles_df["lng"].notna()).to_numpy()
+    posiciones = np.flatnonzero(con_coords)
+    if not len(posiciones) or not len(puertas_df):
+        return calle, numero, metros, misma_calle
+    lat = arboles_df["lat"].to_numpy(dtype=float)[posiciones]
+    lng = arboles_df["lng"].to_numpy(dtype=float)[posiciones]
+
+    indice = IndiceVecinos(puertas_df["lat"].to_numpy(), puertas_df["lng"].to_numpy(), puertas_df["calle"])
+    distancias, filas = indice.knn(lat, lng, 1)
+    distancias, filas = distancias[:, 0], filas[:, 0]
+    misma = np.zeros(len(posiciones), dtype=bool)
+
+    # Puerta de la misma calle: una consulta por lotes para cada calle
+    nombres = arboles_df["Calle"].to_numpy(dtype=object)[posiciones]
+    unicos = pd.unique(pd.Series(nombres).dropna())
+    normalizadas = pd.Series(nombres).map(dict(zip(unicos, map(normalizar_calle, unicos)))).to_numpy()
+    codigos, calles = pd.factorize(normalizadas)
+    orden = np.argsort(codigos, kind="stable")
+    limites = np.searchsorted(codigos[orden], np.arange(len(calles) + 1))
+    for k, nombre in enumerate(calles):
+        if nombre not in indice.subindices:
+            continue
+        grupo = orden[limites[k]:limites[k + 1]]
+        d, f = indice.knn(lat[grupo], lng[grupo], 1, especie=nombre)
+        cerca = d[:, 0] <= distancia_maxima
+        distancias[grupo[cerca]] = d[cerca, 0]
+        filas[grupo[cerca]] = f[cerca, 0]
+        misma[grupo[cerca]] = True
+
+    calle[posiciones] = puertas_df["calle"].to_numpy(dtype=object)[filas]
+    numero[posiciones] = puertas_df["numero"].to_numpy()[filas]
+    metros[posiciones] = distancias
+    misma_calle[posiciones] = misma
+    return calle, numero, metros, misma_calle
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Asignar a cada árbol la puerta más cercana.")
+    parser.add_argument("--distancia-maxima", type=float, default=DISTANCIA_MAXIMA,
+                        help=f"metros a una puerta de la misma calle (default {DISTANCIA_MAXIMA:g})")
+    agregar_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas = Metricas.desde_args("geocode_inverso", args)
+
+    print("=" * 60)
+    print("GEOCODIFICACIÓN INVERSA (PUERTA MÁS CERCANA)")
+    print("=" * 60)
+
+    with metricas.etapa("cargar_puertas") as etapa:
+        puertas_df = cargar_puertas(RAW_DIR / "wfs_puertas.geojson")
+        etapa.filas_salida = len(puertas_df)
+    with metricas.etapa("cargar_arboles") as etapa:
+        arboles_df = pd.read_csv(PROCESSED_DIR / "arboles_montevideo_geo.csv", low_memory=False)
+        etapa.filas_salida = len(arboles_df)
+    print(f"{len(puertas_df):,} puertas, {len(arboles_df):,} árboles")
+
+    with metricas.etapa("puerta_mas_cercana", filas_entrada=len(arboles_df)) as etapa:
+        calle, numero, metros, misma_calle = asignar_puertas(arboles_df, puertas_df, args.distancia_maxima)
+        asignados = int(np.isfinite(metros).sum())
+        etapa.filas_salida = asignados
+        etapa.extra["misma_calle"] = int(misma_calle.sum())
+
+    arboles_df["Puerta Calle"] = calle
+    arboles_df["Puerta Numero"] = pd.Series(numero, index=arboles_df.index) \
+        .where(np.isfinite(metros)).astype("Int64")
+    arboles_df["Puerta Distancia"] = np.round(metros, 1)
+
+    sin_numero = (arboles_df["Numero"].isna() | (arboles_df["Numero"] <= 0)).to_numpy()
+    completar = sin_numero & misma_calle
+    arboles_df.loc[completar, "Numero"] = numero[completar]
+
+    distancias = metros[np.isfinite(metros)]
+    print(f"\nÁrboles con puerta asignada: {asignados:,}")
+    print(f"  De su misma calle:         {int(misma_calle.sum()):,}")
+    if len(distancias):
+        print(f"  Distancia p50 / p90 / max: {np.percentile(distancias, 50):.1f} / "
+              f"{np.percentile(distancias, 90):.1f} / {distancias.max():.1f} m")
+    print(f"Numero completado:           {int(completar.sum()):,} de {int(sin_numero.sum()):,} sin número")
+
+    output_path = PROCESSED_DIR / "arboles_montevideo_geo.csv"
+    with metricas.etapa("guardar_csv", filas_entrada=len(arboles_df)) as etapa:
+        arboles_df.to_csv(output_path, index=False)
+        etapa.filas_salida = len(arboles_df)
+    print(f"\nGuardado en: {output_path}")
+
+    metricas.guardar(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Publicar los datos de web/public con nombres versionados por contenido.
+
+Copia cada artefacto de datos a un nombre con el hash de su contenido
+(trees.pmtiles -> trees.3fa2b1c9.pmtiles), escribe assets-manifest.json con
+la correspondencia y regenera en sw.js la versión del caché y la lista de
+archivos a precachear. El service worker sirve la versión con hash aunque
+la app pida el nombre original: si un archivo no cambió, su nombre tampoco,
+y sigue en caché entre deploys. Los nombres con hash se sirven con
+Cache-Control immutable (ver web/next.config.ts).
+
+Los archivos originales se mantienen para el desarrollo local y para los
+clientes sin service worker.
+
+Uso:
+    python scripts/hash_assets.py
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import shutil
+from pathlib import Path
+
+from metrics import Metricas, agregar_argumentos
+
+BASE_DIR = Path(__file__).parent.parent
+WEB_PUBLIC = BASE_DIR / "web" / "public"
+
+# Artefactos de datos publicados con hash (los que falten se omiten). Son los
+# que pide el cliente: el service worker precachea todos los de esta lista.
+ARTEFACTOS = [
+    "trees.pmtiles",
+    "trees-data.json.gz",
+    "species.json",
+    "species-counts.json",
+    "species-metadata.json",
+]
+
+MANIFEST = "assets-manifest.json"
+LARGO_HASH = 8
+
+# Bloque de sw.js que se regenera
+BLOQUE_SW = re.compile(r"(// <assets>[^\n]*\n).*?(// </assets>)", re.DOTALL)
+
+
+def separar_extension(nombre):
+    """('trees-data', '.json.gz'): la extensión incluye todos los sufijos."""
+    base, _, extension = nombre.partition(".")
+    return base, f".{extension}" if extension else ""
+
+
+def nombre_con_hash(nombre, digest):
+    base, extension = separar_extension(nombre)
+    return f"{base}.{digest[:LARGO_HASH]}{extension}"
+
+
+def patron_con_hash(nombre):
+    """Regex de las copias con hash de un artefacto (de corridas anteriores)."""
+    base, extension = separar_extension(nombre)
+    return re.compile(rf"{re.escape(base)}\.[0-9a-f]{{{LARGO_HASH}}}{re.escape(extension)}")
+
+
+def sha256(ruta):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def publicar(directorio):
+    """Copiar los artefactos con hash y borrar las copias viejas; devuelve el manifest."""
+    assets = {}
+    for nombre in ARTEFACTOS:
+        ruta = directorio / nombre
+        if not ruta.exists():
+            continue
+        digest = sha256(ruta)
+        versionado = nombre_con_hash(nombre, digest)
+        destino = directorio / versionado
+        if not destino.exists():
+            shutil.copy2(ruta, destino)
+
+        patron = patron_con_hash(nombre)
+        for viejo in directorio.iterdir():
+            if viejo.name != versionado and patron.fullmatch(viejo.name):
+                viejo.unlink()
+
+        assets[f"/{nombre}"] = {
+            "archivo": f"/{versionado}",
+            "bytes": ruta.stat().st_size,
+            "sha256": digest,
+        }
+
+    # La versión del caché cambia solo si cambia algún artefacto
+    version = hashlib.sha256(
+        json.dumps({k: v["sha256"] for k, v in assets.items()}, sort_keys=True).encode()
+    ).hexdigest()[:LARGO_HASH]
+    return {"version": version, "assets": assets}
+
+
+def actualizar_service_worker(ruta, manifest):
+    """Reescribir el bloque <assets> de sw.js con la versión y los nombres con hash."""
+    mapa = {logico: datos["archivo"] for logico, datos in manifest["assets"].items()}
+    contenido = (
+        f"const CACHE_NAME = 'arboles-mvd-{manifest['version']}';\n"
+        f"const HASHED_ASSETS = {json.dumps(mapa, indent=2)};\n"
+    ).replace('"', "'")
+
+    texto = ruta.read_text(encoding="utf-8")
+    if not BLOQUE_SW.search(texto):
+        raise ValueError(f"{ruta} no tiene el bloque // <assets> ... // </assets>")
+    texto = BLOQUE_SW.sub(lambda m: m.group(1) + contenido + m.group(2), texto)
+    ruta.write_text(texto, encoding="utf-8")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publicar artefactos con nombres versionados.")
+    agregar_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas = Metricas.desde_args("hash_assets", args)
+
+    print("Publicando artefactos con hash...")
+    with metricas.etapa("publicar") as etapa:
+        manifest = publicar(WEB_PUBLIC)
+        etapa.filas_salida = len(manifest["assets"])
+        etapa.extra["bytes"] = sum(a["bytes"] for a in manifest["assets"].values())
+    for logico, datos in manifest["assets"].items():
+        print(f"  {logico:25s} -> {datos['archivo']}")
+
+    with metricas.etapa("manifest_y_sw"):
+        with open(WEB_PUBLIC / MANIFEST, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        actualizar_service_worker(WEB_PUBLIC / "sw.js", manifest)
+    print(f"\n  {WEB_PUBLIC / MANIFEST} (versión {manifest['version']})")
+    print(f"  {WEB_PUBLIC / 'sw.js'} actualizado")
+
+    metricas.guardar(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,13 @@
 Merge del censo de arbolado con los datos georeferenciados del WFS.
 """
 
+import argparse
 import json
 import pandas as pd
 from pathlib import Path
 
+from metrics import Metricas, agregar_argumentos
+
 # Rutas
 BASE_DIR = Path(__file__).parent.parent
 RAW_DIR = BASE_DIR / "data" / "raw"
@@ -122,20 +125,33 @@ def add_wfs_only_trees(merged_df, wfs_df, censo_df):
 
     return final
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge del censo con el WFS.")
+    agregar_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas = Metricas.desde_args("merge_datasets", args)
+
     print("=" * 60)
     print("MERGE DE DATASETS: CENSO + WFS")
     print("=" * 60)
 
     # Cargar datos
-    wfs_df = load_wfs_data()
-    censo_df = load_censo_data()
+    with metricas.etapa("cargar_wfs") as etapa:
+        wfs_df = load_wfs_data()
+        etapa.filas_salida = len(wfs_df)
+    with metricas.etapa("cargar_censo") as etapa:
+        censo_df = load_censo_data()
+        etapa.filas_salida = len(censo_df)
 
     # Merge principal
-    merged = merge_datasets(censo_df, wfs_df)
+    with metricas.etapa("merge", filas_entrada=len(censo_df)) as etapa:
+        merged = merge_datasets(censo_df, wfs_df)
+        etapa.filas_salida = len(merged)
 
     # Agregar árboles solo del WFS
-    final = add_wfs_only_trees(merged, wfs_df, censo_df)
+    with metricas.etapa("agregar_solo_wfs", filas_entrada=len(wfs_df)) as etapa:
+        final = add_wfs_only_trees(merged, wfs_df, censo_df)
+        etapa.filas_salida = len(final) - len(merged)
 
     # Reordenar columnas - poner lat/lng al principio para fácil acceso
     priority_cols = ['Arbol', 'lat', 'lng', 'Nombre científico', 'Nombre común', 'Calle', 'Numero', 'CCZ']
@@ -144,7 +160,9 @@ def main():
 
     # Guardar
     output_path = PROCESSED_DIR / "arboles_montevideo_geo.csv"
-    final.to_csv(output_path, index=False)
+    with metricas.etapa("guardar_csv", filas_entrada=len(final)) as etapa:
+        final.to_csv(output_path, index=False)
+        etapa.filas_salida = len(final)
 
     print("\n" + "=" * 60)
     print("RESUMEN FINAL")
@@ -155,5 +173,7 @@ def main():
     print(f"\nArchivo guardado: {output_path}")
     print(f"Tamaño: {output_path.stat().st_size / 1024 / 1024:.1f} MB")
 
+    metricas.guardar(args.metrics)
+
 if __name__ == "__main__":
     main()
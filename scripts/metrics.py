@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Instrumentación por etapa de los scripts del pipeline.
+
+Registra para cada etapa y sub-paso: tiempo real, tiempo de CPU, filas de
+entrada y salida, filas por segundo y memoria: RSS al inicio y al fin, el
+pico de RSS del proceso (acumulado desde que arrancó, no de la etapa) y cuánto
+lo subió la etapa, y opcionalmente el pico de tracemalloc. Cada corrida se guarda como un metrics.json.
+
+Uso dentro de un script:
+
+    metricas = Metricas("generate_geojson", perfilar=args.profile)
+    with metricas.etapa("cargar_csv") as etapa:
+        df = pd.read_csv(...)
+        etapa.filas_salida = len(df)
+    metricas.guardar(args.metrics)
+
+Comparar dos corridas:
+
+    python scripts/metrics.py antes.json despues.json
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASE_DIR = Path(__file__).parent.parent
+METRICS_DIR = BASE_DIR / "data" / "processed" / "metrics"
+
+# Umbral (relativo) a partir del cual una etapa se marca como regresión
+UMBRAL_REGRESION = 0.10
+
+
+def rss_actual():
+    """RSS actual del proceso en bytes (None si no se puede leer)."""
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def rss_pico():
+    """Pico de RSS del proceso en bytes (None si no está disponible)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return pico if sys.platform == "darwin" else pico * 1024
+
+
+def _a_json(valor):
+    """Serializar escalares numpy que aparezcan en los extras."""
+    if hasattr(valor, "item"):
+        return valor.item()
+    raise TypeError(f"Objeto de tipo {type(valor).__name__} no serializable")
+
+
+def agregar_argumentos(parser):
+    """Agregar --metrics, --profile y --tracemalloc a un ArgumentParser."""
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        default=None,
+        help="ruta del metrics.json (por defecto data/processed/metrics/<script>.json)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="guardar estadísticas de cProfile por etapa junto al metrics.json",
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="medir el pico de memoria Python por etapa con tracemalloc (más lento)",
+    )
+    return parser
+
+
+class Etapa:
+    """Registro de una etapa en curso; el script completa las filas."""
+
+    def __init__(self, nombre, filas_entrada=None):
+        self.nombre = nombre
+        self.filas_entrada = filas_entrada
+        self.filas_salida = None
+        self.extra = {}
+        self.pico_tracemalloc = 0
+
+    def como_dict(self, tiempo, cpu, rss_inicio, rss_fin, pico_antes):
+        # Los conteos suelen venir de pandas (numpy.int64): normalizar a int
+        entrada = int(self.filas_entrada) if self.filas_entrada is not None else None
+        salida = int(self.filas_salida) if self.filas_salida is not None else None
+        filas = salida if salida is not None else entrada
+        # ru_maxrss es el pico del proceso entero: la etapa solo puede subirlo
+        pico = rss_pico()
+        registro = {
+            "etapa": self.nombre,
+            "tiempo_s": round(tiempo, 6),
+            "cpu_s": round(cpu, 6),
+            "filas_entrada": entrada,
+            "filas_salida": salida,
+            "filas_por_s": round(filas / tiempo, 1) if filas and tiempo > 0 else None,
+            "rss_inicio_bytes": rss_inicio,
+            "rss_fin_bytes": rss_fin,
+            "rss_pico_proceso_bytes": pico,
+            "rss_pico_delta_bytes": pico - pico_antes if pico is not None and pico_antes is not None else None,
+        }
+        if tracemalloc.is_tracing():
+            registro["tracemalloc_pico_bytes"] = self.pico_tracemalloc
+        if self.extra:
+            registro["extra"] = self.extra
+        return registro
+
+
+class Metricas:
+    """Colector de métricas de una corrida de un script."""
+
+    def __init__(self, script, perfilar=False, usar_tracemalloc=False):
+        self.script = script
+        self.perfilar = perfilar
+        self.etapas = []
+        self._pila = []
+        self._perfiles = {}
+        self._inicio = time.perf_counter()
+        self._inicio_cpu = time.process_time()
+        self._fecha = datetime.now().isoformat(timespec="seconds")
+        if usar_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @classmethod
+    def desde_args(cls, script, args):
+        """Crear el colector a partir de los argumentos de agregar_argumentos."""
+        return cls(script, perfilar=args.profile, usar_tracemalloc=args.tracemalloc)
+
+    def _propagar_pico_tracemalloc(self):
+        """Acumular el pico de tracemalloc en todas las etapas abiertas."""
+        if not tracemalloc.is_tracing():
+            return
+        pico = tracemalloc.get_traced_memory()[1]
+        for etapa in self._pila:
+            etapa.pico_tracemalloc = max(etapa.pico_tracemalloc, pico)
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def etapa(self, nombre, filas_entrada=None):
+        """Medir un bloque. Las etapas anidadas se registran como padre/hijo."""
+        self._propagar_pico_tracemalloc()
+        ruta = "/".join([e.nombre for e in self._pila] + [nombre])
+        registro = Etapa(ruta, filas_entrada)
+        if tracemalloc.is_tracing():
+            registro.pico_tracemalloc = tracemalloc.get_traced_memory()[0]
+
+        # cProfile no admite perfiles anidados: solo etapas de primer nivel
+        perfil = None
+        if self.perfilar and not self._pila:
+            perfil = cProfile.Profile()
+
+        self._pila.append(registro)
+        rss_inicio = rss_actual()
+        pico_antes = rss_pico()
+        inicio = time.perf_counter()
+        inicio_cpu = time.process_time()
+        if perfil is not None:
+            perfil.enable()
+        try:
+            yield registro
+        finally:
+            if perfil is not None:
+                perfil.disable()
+                self._perfiles[ruta] = perfil
+            tiempo = time.perf_counter() - inicio
+            cpu = time.process_time() - inicio_cpu
+            self._propagar_pico_tracemalloc()
+            self._pila.pop()
+            self.etapas.append(registro.como_dict(tiempo, cpu, rss_inicio, rss_actual(), pico_antes))
+
+    def resumen(self):
+        """Diccionario serializable con todas las etapas de la corrida."""
+        return {
+            "script": self.script,
+            "fecha": self._fecha,
+            "python": sys.version.split()[0],
+            "tiempo_total_s": round(time.perf_counter() - self._inicio, 6),
+            "cpu_total_s": round(time.process_time() - self._inicio_cpu, 6),
+            "rss_pico_bytes": rss_pico(),
+            "etapas": self.etapas,
+        }
+
+    def guardar(self, ruta=None):
+        """Escribir metrics.json (y los .prof si se pidió --profile)."""
+        ruta = Path(ruta) if ruta else METRICS_DIR / f"{self.script}.json"
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        with open(ruta, "w") as f:
+            json.dump(self.resumen(), f, ensure_ascii=False, indent=2, default=_a_json)
+        print(f"\nMétricas guardadas en {ruta}")
+
+        if self._perfiles:
+            perfiles_dir = ruta.parent / f"{ruta.stem}.profile"
+            perfiles_dir.mkdir(parents=True, exist_ok=True)
+            for nombre, perfil in self._perfiles.items():
+                destino = perfiles_dir / f"{nombre.replace('/', '__')}.prof"
+                perfil.dump_stats(destino)
+            print(f"Perfiles cProfile en {perfiles_dir}")
+        return ruta
+
+
+def comparar(antes, despues, umbral=UMBRAL_REGRESION):
+    """Comparar dos metrics.json etapa por etapa.
+
+    Devuelve una lista de filas (etapa, tiempo antes, tiempo después, delta
+    relativo, regresión) en el orden de la corrida más reciente.
+    """
+    previas = {e["etapa"]: e for e in antes["etapas"]}
+    filas = []
+    for etapa in despues["etapas"]:
+        previa = previas.get(etapa["etapa"])
+        t_antes = previa["tiempo_s"] if previa else None
+        t_despues = etapa["tiempo_s"]
+        delta = (t_despues - t_antes) / t_antes if t_antes else None
+        filas.append({
+            "etapa": etapa["etapa"],
+            "antes_s": t_antes,
+            "despues_s": t_despues,
+            "delta": delta,
+            "regresion": delta is not None and delta > umbral,
+        })
+    return filas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Comparar dos corridas (metrics.json).")
+    parser.add_argument("antes", type=Path)
+    parser.add_argument("despues", type=Path)
+    parser.add_argument("--umbral", type=float, default=UMBRAL_REGRESION,
+                        help="delta relativo de tiempo para marcar regresión (default 0.10)")
+    args = parser.parse_args(argv)
+
+    with open(args.antes) as f:
+        antes = json.load(f)
+    with open(args.despues) as f:
+        despues = json.load(f)
+
+    filas = comparar(antes, despues, args.umbral)
+    print(f"{'Etapa':45s} {'Antes':>10s} {'Después':>10s} {'Delta':>8s}")
+    print("-" * 76)
+    for fila in filas:
+        antes_s = f"{fila['antes_s']:.3f}s" if fila["antes_s"] is not None else "-"
+        delta = f"{fila['delta'] * 100:+.1f}%" if fila["delta"] is not None else "nueva"
+        marca = "  ← REGRESIÓN" if fila["regresion"] else ""
+        print(f"{fila['etapa']:45s} {antes_s:>10s} {fila['despues_s']:>9.3f}s {delta:>8s}{marca}")
+
+    regresiones = [f for f in filas if f["regresion"]]
+    print(f"\n{len(regresiones)} etapa(s) con regresión mayor a {args.umbral * 100:.0f}%")
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Codificación mínima de Mapbox Vector Tiles (MVT 2.1) para capas de puntos.
+
+Sin dependencias: el protobuf se escribe a mano. Solo se cubre lo que usa el
+mapa (una capa de puntos con propiedades enteras y de texto); el decodificador
+acepta cualquier tesela para poder inspeccionar también las de tippecanoe.
+
+Referencia: https://github.com/mapbox/vector-tile-spec/tree/master/2.1
+"""
+
+import struct
+
+EXTENT = 4096
+
+# Tipos de geometría
+PUNTO = 1
+
+# Comandos de geometría
+MOVE_TO = 1
+LINE_TO = 2
+CLOSE_PATH = 7
+
+
+# ── Protobuf ─────────────────────────────────────────────────────────────────
+
+def _varint(n):
+    salida = bytearray()
+    while n > 0x7F:
+        salida.append((n & 0x7F) | 0x80)
+        n >>= 7
+    salida.append(n)
+    return bytes(salida)
+
+
+# Los enteros chicos (coordenadas, índices de tags) se codifican por tabla
+_VARINTS = [_varint(n) for n in range(1 << 14)]
+
+
+def varint(n):
+    """Entero no negativo como varint de protobuf."""
+    return _VARINTS[n] if n < 16384 else _varint(n)
+
+
+def zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def campo_bytes(numero, datos):
+    """Campo length-delimited (wire type 2)."""
+    return varint((numero << 3) | 2) + varint(len(datos)) + datos
+
+
+def campo_varint(numero, valor):
+    """Campo varint (wire type 0)."""
+    return varint(numero << 3) + varint(valor)
+
+
+def leer_varint(datos, pos):
+    resultado = 0
+    desplazamiento = 0
+    while True:
+        b = datos[pos]
+        pos += 1
+        resultado |= (b & 0x7F) << desplazamiento
+        if b < 0x80:
+            return resultado, pos
+        desplazamiento += 7
+
+
+def campos(datos):
+    """Iterar (numero, wire_type, valor) de un mensaje protobuf."""
+    pos = 0
+    fin = len(datos)
+    while pos < fin:
+        clave, pos = leer_varint(datos, pos)
+        numero, tipo = clave >> 3, clave & 7
+        if tipo == 0:
+            valor, pos = leer_varint(datos, pos)
+        elif tipo == 1:
+            valor, pos = datos[pos:pos + 8], pos + 8
+        elif tipo == 2:
+            largo, pos = leer_varint(datos, pos)
+            valor, pos = datos[pos:pos + largo], pos + largo
+        elif tipo == 5:
+            valor, pos = datos[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"wire type {tipo} no soportado")
+        yield numero, tipo, valor
+
+
+def varints_empaquetados(datos):
+    pos = 0
+    valores = []
+    while pos < len(datos):
+        v, pos = leer_varint(datos, pos)
+        valores.append(v)
+    return valores
+
+
+# ── Codificación ─────────────────────────────────────────────────────────────
+
+def codificar_valor(valor):
+    """Mensaje Value: texto, entero o float."""
+    if isinstance(valor, str):
+        return campo_bytes(1, valor.encode("utf-8"))
+    if isinstance(valor, bool):
+        return campo_varint(7, int(valor))
+    if isinstance(valor, int):
+        return campo_varint(5, valor) if valor >= 0 else campo_varint(6, zigzag(valor))
+    return varint((3 << 3) | 1) + struct.pack("<d", valor)
+
+
+def codificar_capa(nombre, xs, ys, propiedades, extent=EXTENT):
+    """Tesela MVT con una capa de puntos.
+
+    xs, ys son coordenadas enteras dentro de la tesela (0..extent) y
+    propiedades un dict clave -> lista de valores alineada con los puntos.
+    Devuelve los bytes del mensaje Tile sin comprimir.
+    """
+    claves = list(propiedades)
+    columnas = [propiedades[k] for k in claves]
+    valores = {}  # (tipo, valor) -> índice en la tabla de valores
+    features = []
+    for fila, (x, y) in enumerate(zip(xs, ys)):
+        tags = bytearray()
+        for k, columna in enumerate(columnas):
+            valor = columna[fila]
+            clave_valor = (type(valor), valor)
+            indice = valores.get(clave_valor)
+            if indice is None:
+                indice = valores[clave_valor] = len(valores)
+            tags += varint(k)
+            tags += varint(indice)
+        geometria = varint((1 << 3) | MOVE_TO) + varint(zigzag(x)) + varint(zigzag(y))
+        features.append(campo_bytes(2, campo_bytes(2, bytes(tags)) +
+                                    campo_varint(3, PUNTO) +
+                                    campo_bytes(4, geometria)))
+
+    capa = bytearray(campo_varint(15, 2))
+    capa += campo_bytes(1, nombre.encode("utf-8"))
+    for feature in features:
+        capa += feature
+    for clave in claves:
+        capa += campo_bytes(3, clave.encode("utf-8"))
+    for _, valor in valores:
+        capa += campo_bytes(4, codificar_valor(valor))
+    capa += campo_varint(5, extent)
+    return campo_bytes(3, bytes(capa))
+
+
+# ── Decodificación ───────────────────────────────────────────────────────────
+
+def decodificar_valor(datos):
+    for numero, _, valor in campos(datos):
+        if numero == 1:
+            return bytes(valor).decode("utf-8")
+        if numero == 2:
+            return struct.unpack("<f", valor)[0]
+        if numero == 3:
+            return struct.unpack("<d", valor)[0]
+        if numero in (4, 5):
+            return valor if numero == 5 or valor < 1 << 63 else valor - (1 << 64)
+        if numero == 6:
+            return (valor >> 1) ^ -(valor & 1)
+        if numero == 7:
+            return bool(valor)
+    return None
+
+
+def decodificar_geometria(comandos):
+    """Lista de vértices (x, y) absolutos de una geometría codificada."""
+    puntos = []
+    x = y = 0
+    i = 0
+    while i < len(comandos):
+        comando, cantidad = comandos[i] & 7, comandos[i] >> 3
+        i += 1
+        if comando == CLOSE_PATH:
+            continue
+        for _ in range(cantidad):
+            dx, dy = comandos[i], comandos[i + 1]
+            x += (dx >> 1) ^ -(dx & 1)
+            y += (dy >> 1) ^ -(dy & 1)
+            puntos.append((x, y))
+            i += 2
+    return puntos
+
+
+def decodificar(datos):
+    """Decodificar una tesela: {capa: {"extent", "features": [...]}}."""
+    capas = {}
+    for numero, _, valor in campos(datos):
+        if numero != 3:
+            continue
+        nombre, extent = None, EXTENT
+        claves, valores, crudas = [], [], []
+        for n, _, v in campos(valor):
+            if n == 1:
+                nombre = bytes(v).decode("utf-8")
+            elif n == 2:
+                crudas.append(v)
+            elif n == 3:
+                claves.append(bytes(v).decode("utf-8"))
+            elif n == 4:
+                valores.append(decodificar_valor(v))
+            elif n == 5:
+                extent = v
+
+        features = []
+        for cruda in crudas:
+            feature = {"id": None, "type": 0, "properties": {}, "geometry": []}
+            for n, _, v in campos(cruda):
+                if n == 1:
+                    feature["id"] = v
+                elif n == 2:
+                    tags = varints_empaquetados(v)
+                    for k in range(0, len(tags), 2):
+                        feature["properties"][claves[tags[k]]] = valores[tags[k + 1]]
+                elif n == 3:
+                    feature["type"] = v
+                elif n == 4:
+                    feature["geometry"] = decodificar_geometria(varints_empaquetados(v))
+            features.append(feature)
+        capas[nombre] = {"extent": extent, "features": features}
+    return capas
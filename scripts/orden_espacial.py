@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Orden espacial de los árboles por curva de Hilbert.
+
+Con --orden-espacial, generate_geojson.py y generate_pmtiles.py ordenan las
+filas por la clave de Hilbert de sus coordenadas antes de escribir nada:
+árboles cercanos quedan contiguos, lo que comprime mejor las coordenadas y
+da localidad a los lectores de teselas y shards.
+
+Ejecutado como script, genera las salidas con y sin orden espacial y
+compara el tamaño comprimido de cada artefacto y el tiempo de las teselas:
+
+    python scripts/orden_espacial.py
+"""
+
+import argparse
+import gzip
+import shutil
+import tempfile
+import time
+import numpy as np
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = Path(__file__).parent.parent
+PROCESSED_DIR = BASE_DIR / "data" / "processed"
+
+# Resolución de la grilla: 2^16 celdas por lado sobre el rectángulo de los datos
+BITS = 16
+
+
+def clave_hilbert(lat, lng, bits=BITS):
+    """Índice de Hilbert (vectorizado) de cada coordenada dentro de su bounding box."""
+    lat = np.asarray(lat, dtype=float)
+    lng = np.asarray(lng, dtype=float)
+    n = 1 << bits
+
+    def escalar(v):
+        minimo, rango = v.min(), np.ptp(v)
+        if rango == 0:
+            return np.zeros(len(v), dtype=np.int64)
+        return np.minimum(((v - minimo) / rango * n).astype(np.int64), n - 1)
+
+    x, y = escalar(lng), escalar(lat)
+    d = np.zeros(len(x), dtype=np.int64)
+    s = n >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+        # Rotar el cuadrante
+        invertir = ~ry & rx
+        x = np.where(invertir, n - 1 - x, x)
+        y = np.where(invertir, n - 1 - y, y)
+        x, y = np.where(~ry, y, x), np.where(~ry, x, y)
+        s >>= 1
+    return d
+
+
+def orden(lat, lng):
+    """Permutación estable que ordena las coordenadas por Hilbert."""
+    return np.argsort(clave_hilbert(lat, lng), kind="stable")
+
+
+def ordenar(df):
+    """DataFrame ordenado por Hilbert (conserva el índice original)."""
+    return df.iloc[orden(df["lat"].to_numpy(), df["lng"].to_numpy())]
+
+
+# ── Comparación ──────────────────────────────────────────────────────────────
+
+ARTEFACTOS = ["trees.json", "trees-data.json", "trees-data.bin", "trees.pmtiles"]
+
+
+def comprimidos(ruta):
+    """Tamaños crudo, gzip -9 y (si está disponible) brotli."""
+    datos = ruta.read_bytes()
+    tamanos = {"crudo": len(datos), "gz": len(gzip.compress(datos, 9, mtime=0))}
+    if brotli is not None:
+        tamanos["br"] = len(brotli.compress(datos, quality=9))
+    return tamanos
+
+
+def generar(destino, espacial, processed_dir=None):
+    """Correr generate_geojson y generate_pmtiles con todas sus salidas en destino.
+
+    WEB_PUBLIC y PROCESSED_DIR se redirigen a destino (como en
+    benchmark_pipeline.rutas_datos); el CSV procesado se enlaza ahí.
+    """
+    # Importados acá: ambos scripts importan este módulo
+    import generate_geojson
+    import generate_pmtiles
+
+    processed_dir = processed_dir or PROCESSED_DIR
+    procesados = destino / "processed"
+    procesados.mkdir(parents=True, exist_ok=True)
+    csv = procesados / "arboles_montevideo_geo.csv"
+    if not csv.exists():
+        try:
+            csv.symlink_to((processed_dir / csv.name).resolve())
+        except OSError:
+            shutil.copyfile(processed_dir / csv.name, csv)
+    for modulo in (generate_geojson, generate_pmtiles):
+        modulo.WEB_PUBLIC = destino
+        modulo.PROCESSED_DIR = procesados
+    extra = ["--orden-espacial"] if espacial else []
+    generate_geojson.main(["--metrics", str(destino / "generate_geojson.json")] + extra)
+    inicio = time.perf_counter()
+    generate_pmtiles.main(["--metrics", str(destino / "generate_pmtiles.json")] + extra)
+    return time.perf_counter() - inicio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Comparar salidas con y sin orden espacial.")
+    parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tiempos = {}
+        for nombre, espacial in (("fila", False), ("hilbert", True)):
+            print(f"\n── Orden por {nombre} " + "─" * 40)
+            tiempos[nombre] = generar(Path(tmp) / nombre, espacial)
+
+        print("\n" + "=" * 72)
+        print(f"{'Artefacto':18s} {'códec':>6s} {'por fila':>14s} {'Hilbert':>14s} {'cambio':>9s}")
+        print("-" * 72)
+        for artefacto in ARTEFACTOS:
+            antes = comprimidos(Path(tmp) / "fila" / artefacto)
+            despues = comprimidos(Path(tmp) / "hilbert" / artefacto)
+            for codec in antes:
+                cambio = (despues[codec] - antes[codec]) / antes[codec] * 100
+                print(f"{artefacto:18s} {codec:>6s} {antes[codec]:14,} {despues[codec]:14,} {cambio:+8.1f}%")
+        print(f"\ngenerate_pmtiles: {tiempos['fila']:.2f}s por fila, {tiempos['hilbert']:.2f}s Hilbert")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Prioridad de dibujo de cada árbol (0-255) para el raleo de teselas.
+
+Combina el percentil de altura, CAP y diámetro de copa con la rareza de la
+especie: los ejemplares grandes y las especies poco frecuentes quedan
+arriba, así que al ralear una tesela se pierden antes los árboles chicos y
+comunes. Los datos faltantes (o alturas imposibles) cuentan como el mínimo.
+
+Es un entero chico (propiedad p de trees.json) para que cualquier
+generador de teselas pueda quedarse con los N primeros de cada tesela; los
+empates se resuelven con un hash del id, así el resultado no depende del
+orden de las filas.
+"""
+
+import numpy as np
+import pandas as pd
+
+from estadisticas import ALTURA_MAX_VALIDA
+
+# Peso de cada componente en el puntaje (suman 1)
+PESOS = {"altura": 0.3, "cap": 0.25, "copa": 0.25, "rareza": 0.2}
+MAXIMO = 255
+
+
+def percentil(valores, validos):
+    """Percentil (0-1) de cada valor entre los válidos; 0 para los demás."""
+    serie = pd.Series(np.where(validos, valores, np.nan))
+    return serie.rank(pct=True).fillna(0.0).to_numpy()
+
+
+def calcular(df):
+    """Prioridad uint8 de cada fila (mayor = más importante)."""
+    altura = df["Altura"].to_numpy(dtype=float)
+    cap = df["CAP"].to_numpy(dtype=float)
+    copa = df["Diametro Copa"].to_numpy(dtype=float)
+
+    # Rareza: 1 para una especie con un solo árbol, 0 para la más común
+    especie = df["Nombre común"]
+    conteos = especie.map(especie.value_counts()).to_numpy(dtype=float)
+    maximo = np.nanmax(conteos) if np.isfinite(conteos).any() else 1.0
+    rareza = np.where(np.isnan(conteos), 0.0,
+                      1.0 - np.log(np.nan_to_num(conteos, nan=1.0)) / np.log(max(maximo, 2.0)))
+
+    puntaje = (
+        PESOS["altura"] * percentil(altura, (altura > 0) & (altura <= ALTURA_MAX_VALIDA))
+        + PESOS["cap"] * percentil(cap, cap > 0)
+        + PESOS["copa"] * percentil(copa, copa > 0)
+        + PESOS["rareza"] * rareza
+    )
+    return np.clip(np.rint(puntaje * MAXIMO), 0, MAXIMO).astype(np.uint8)
+
+
+def clave_orden(prioridad, ids):
+    """Clave ascendente para ralear: primero mayor prioridad, empates por hash del id."""
+    mezcla = (np.asarray(ids, dtype=np.int64) * 2654435761) % (1 << 32)
+    return (MAXIMO - prioridad.astype(np.int64)) << 32 | mezcla
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Servicio HTTP local de consultas sobre los árboles.
+
+Carga los datos en arrays columnares (desde trees-data.bin o desde el CSV
+procesado) y arma un índice espacial de grilla: los árboles
+quedan ordenados por celda y cada fila de celdas de un bbox es un rango
+contiguo del array. Responde JSON:
+
+    GET /tree/<id>                                registro como en trees-data.json
+    GET /bbox?bbox=lng0,lat0,lng1,lat1[&especie=][&ccz=][&limite=]
+    GET /count?[bbox=][&especie=][&ccz=]          total, por especie y por CCZ
+    GET /nearest?lat=&lng=[&k=][&especie=][&ccz=] los k árboles más cercanos
+    GET /health
+
+Usa solo asyncio (HTTP/1.1 con keep-alive), sin dependencias extra.
+
+Uso:
+    python scripts/query_service.py
+    python scripts/query_service.py --datos data/processed/arboles_montevideo_geo.csv --puerto 8080
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import trees_data_bin
+from generate_geojson import filas_por_id
+
+BASE_DIR = Path(__file__).parent.parent
+PROCESSED_DIR = BASE_DIR / "data" / "processed"
+WEB_PUBLIC = BASE_DIR / "web" / "public"
+
+HOST = "127.0.0.1"
+PUERTO = 8765
+# Lado de la celda de la grilla en grados (~200 m en Montevideo)
+CELDA = 0.002
+# Máximo de árboles devueltos por /bbox y de vecinos por /nearest
+LIMITE_BBOX = 1_000
+K_MAX = 100
+ESPECIES_TOP = 20
+
+# Metros por grado de latitud (aproximación local, suficiente para ordenar)
+METROS_GRADO = 111_320.0
+
+
+class ErrorConsulta(ValueError):
+    """Parámetros inválidos: se responde 400."""
+
+
+# ── Datos ────────────────────────────────────────────────────────────────────
+
+def cargar_bin(ruta):
+    """(header, columnas, diccionarios) desde trees-data.bin."""
+    return trees_data_bin.leer(ruta)
+
+
+def cargar_csv(ruta):
+    """Las mismas columnas que trees-data.bin, armadas desde el CSV procesado."""
+    df = pd.read_csv(ruta, low_memory=False)
+    df = df[df["lat"].notna() & df["lng"].notna()]
+    df = df.iloc[filas_por_id(df)]
+    _, columnas, diccionarios = trees_data_bin.columnas_desde_df(df)
+    header = {"columnas": [{"nombre": nombre, **opciones}
+                           for nombre, (_, opciones) in columnas.items()]}
+    return header, {nombre: valores for nombre, (valores, _) in columnas.items()}, diccionarios
+
+
+# ── Índice espacial ──────────────────────────────────────────────────────────
+
+class IndiceGrilla:
+    """Grilla regular lat/lng con los puntos ordenados por celda (formato CSR)."""
+
+    def __init__(self, lat, lng, celda=CELDA):
+        self.celda = celda
+        self.lat0, self.lng0 = float(lat.min()), float(lng.min())
+        cx = ((lng - self.lng0) / celda).astype(np.int64)
+        cy = ((lat - self.lat0) / celda).astype(np.int64)
+        self.ancho = int(cx.max()) + 1
+        self.alto = int(cy.max()) + 1
+        clave = cy * self.ancho + cx
+        # filas: posición original de cada punto, en orden de celda
+        self.filas = np.argsort(clave, kind="stable")
+        self.inicios = np.searchsorted(clave[self.filas], np.arange(self.ancho * self.alto + 1))
+        self.lat = lat[self.filas]
+        self.lng = lng[self.filas]
+        # Escala de longitud a metros en la latitud media
+        self.escala_lng = math.cos(math.radians(float(lat.mean())))
+
+    def _rango(self, valor, origen, limite):
+        return min(max(int((valor - origen) / self.celda), 0), limite - 1)
+
+    def _candidatos(self, cx0, cy0, cx1, cy1):
+        """Posiciones (en orden de celda) de los puntos de un rectángulo de celdas."""
+        tramos = [np.arange(self.inicios[cy * self.ancho + cx0], self.inicios[cy * self.ancho + cx1 + 1])
+                  for cy in range(cy0, cy1 + 1)]
+        return np.concatenate(tramos) if tramos else np.empty(0, dtype=np.int64)
+
+    def en_bbox(self, min_lng, min_lat, max_lng, max_lat):
+        """Filas originales de los puntos dentro del bbox."""
+        if max_lng < self.lng0 or max_lat < self.lat0:
+            return np.empty(0, dtype=np.int64)
+        cx0 = self._rango(min_lng, self.lng0, self.ancho)
+        cx1 = self._rango(max_lng, self.lng0, self.ancho)
+        cy0 = self._rango(min_lat, self.lat0, self.alto)
+        cy1 = self._rango(max_lat, self.lat0, self.alto)
+        posiciones = self._candidatos(cx0, cy0, cx1, cy1)
+        lat, lng = self.lat[posiciones], self.lng[posiciones]
+        dentro = (lat >= min_lat) & (lat <= max_lat) & (lng >= min_lng) & (lng <= max_lng)
+        return self.filas[posiciones[dentro]]
+
+    def cercanos(self, lat, lng, k, filtro=None):
+        """(filas, metros) de los k puntos más cercanos.
+
+        filtro, si se da, recibe filas originales y devuelve la máscara de
+        las que se pueden elegir.
+
+        Recorre cuadrados de celdas cada vez más grandes alrededor del punto
+        hasta tener k candidatos a una distancia que el cuadrado ya cubre.
+        """
+        cx = self._rango(lng, self.lng0, self.ancho)
+        cy = self._rango(lat, self.lat0, self.alto)
+        # Un cuadrado de radio r cubre al menos r celdas alrededor del punto
+        # (menos las que el punto esté fuera de la grilla)
+        fuera = max(abs(math.floor((lng - self.lng0) / self.celda) - cx),
+                    abs(math.floor((lat - self.lat0) / self.celda) - cy))
+        lado_metros = self.celda * METROS_GRADO * min(1.0, self.escala_lng)
+        radio_max = max(self.ancho, self.alto)
+        radio = 0
+        while True:
+            posiciones = self._candidatos(max(cx - radio, 0), max(cy - radio, 0),
+                                          min(cx + radio, self.ancho - 1), min(cy + radio, self.alto - 1))
+            if filtro is not None:
+                posiciones = posiciones[filtro(self.filas[posiciones])]
+            dy = (self.lat[posiciones] - lat) * METROS_GRADO
+            dx = (self.lng[posiciones] - lng) * METROS_GRADO * self.escala_lng
+            distancias = np.hypot(dx, dy)
+            if len(posiciones) >= k:
+                mas_cercanos = np.argpartition(distancias, k - 1)[:k]
+                if distancias[mas_cercanos].max() <= (radio - fuera) * lado_metros or radio >= radio_max + fuera:
+                    break
+            elif radio >= radio_max + fuera:
+                mas_cercanos = np.arange(len(posiciones))
+                break
+            radio = radio * 2 + 1 if radio else 1
+        mas_cercanos = mas_cercanos[np.argsort(distancias[mas_cercanos], kind="stable")]
+        return self.filas[posiciones[mas_cercanos]], distancias[mas_cercanos]
+
+
+# ── Consultas ────────────────────────────────────────────────────────────────
+
+class ServicioArboles:
+    """Consultas sobre las columnas de trees-data y su índice de grilla."""
+
+    def __init__(self, header, columnas, diccionarios):
+        self.opciones = {col["nombre"]: col for col in header["columnas"]}
+        self.columnas = columnas
+        self.diccionarios = diccionarios
+        self.ids = columnas["id"]
+        self.lat = columnas["lat"] / trees_data_bin.ESCALA_COORDENADAS
+        self.lng = columnas["lng"] / trees_data_bin.ESCALA_COORDENADAS
+        self.indice = IndiceGrilla(self.lat, self.lng)
+
+        self.especie = columnas["nombre_comun"].astype(np.int64)  # 0 = sin nombre
+        self.especies = [None] + diccionarios["nombre_comun"]
+        self.codigo_especie = {nombre: k for k, nombre in enumerate(self.especies) if nombre}
+        self.ccz = columnas["ccz"].astype(np.int64)  # NULO_UINT8 = sin CCZ
+        # Conteos especie x CCZ precalculados: /count sin bbox no recorre filas
+        self.tabla = np.bincount(self.especie * 256 + self.ccz,
+                                 minlength=len(self.especies) * 256).reshape(-1, 256)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def registro(self, fila):
+        """Registro de una fila con los campos de trees-data.json."""
+        resultado = {}
+        for campo in trees_data_bin.CAMPOS:
+            valor = self.columnas[campo][fila].item()
+            opciones = self.opciones[campo]
+            if "nulo" in opciones and valor == opciones["nulo"]:
+                valor = None
+            elif "diccionario" in opciones:
+                valor = self.diccionarios[opciones["diccionario"]][valor - 1]
+            elif "escala" in opciones:
+                valor = valor / opciones["escala"]
+            resultado[campo] = valor
+        return resultado
+
+    def _filtro(self, especie, ccz):
+        """Código de especie y CCZ a filtrar (None = sin filtro)."""
+        codigo = None
+        if especie is not None:
+            codigo = self.codigo_especie.get(especie)
+            if codigo is None:
+                raise ErrorConsulta(f"especie desconocida: {especie}")
+        if ccz is not None and not 0 <= ccz < trees_data_bin.NULO_UINT8:
+            raise ErrorConsulta(f"CCZ inválido: {ccz}")
+        return codigo, ccz
+
+    def _mascara(self, filas, codigo, ccz):
+        mascara = np.ones(len(filas), dtype=bool)
+        if codigo is not None:
+            mascara &= self.especie[filas] == codigo
+        if ccz is not None:
+            mascara &= self.ccz[filas] == ccz
+        return mascara
+
+    def arbol(self, tree_id):
+        fila = trees_data_bin.buscar(self.columnas, tree_id)
+        return None if fila is None else {"id": tree_id, **self.registro(fila)}
+
+    def bbox(self, caja, especie=None, ccz=None, limite=LIMITE_BBOX):
+        codigo, ccz = self._filtro(especie, ccz)
+        filas = self.indice.en_bbox(*caja)
+        filas = filas[self._mascara(filas, codigo, ccz)]
+        filas.sort()
+        muestra = filas[:limite]
+        return {
+            "total": len(filas),
+            "arboles": [
+                {"i": i, "lat": la, "lng": ln, "e": self.especies[e], "c": None if c == 255 else c}
+                for i, la, ln, e, c in zip(
+                    self.ids[muestra].tolist(), self.lat[muestra].tolist(), self.lng[muestra].tolist(),
+                    self.especie[muestra].tolist(), self.ccz[muestra].tolist())
+            ],
+        }
+
+    def conteo(self, caja=None, especie=None, ccz=None):
+        codigo, ccz = self._filtro(especie, ccz)
+        if caja is None:
+            tabla = self.tabla
+        else:
+            filas = self.indice.en_bbox(*caja)
+            tabla = np.bincount(self.especie[filas] * 256 + self.ccz[filas],
+                                minlength=len(self.especies) * 256).reshape(-1, 256)
+        if codigo is not None:
+            tabla = tabla[[codigo]]
+            filas_especie = np.array([codigo])
+        else:
+            filas_especie = np.arange(len(tabla))
+        if ccz is not None:
+            columnas = np.array([ccz])
+            tabla = tabla[:, columnas]
+        else:
+            columnas = np.arange(256)
+        por_especie = tabla.sum(axis=1)
+        por_ccz = tabla.sum(axis=0)
+        top = np.argsort(-por_especie, kind="stable")[:ESPECIES_TOP]
+        return {
+            "arboles": int(por_especie.sum()),
+            "por_especie": {self.especies[filas_especie[k]] or "": int(por_especie[k])
+                            for k in top if por_especie[k]},
+            "por_ccz": {("" if c == 255 else str(c)): int(n)
+                        for c, n in zip(columnas.tolist(), por_ccz.tolist()) if n},
+        }
+
+    def cercanos(self, lat, lng, k=10, especie=None, ccz=None):
+        codigo, ccz = self._filtro(especie, ccz)
+
+        def filtro(filas):
+            return self._mascara(filas, codigo, ccz)
+
+        filas, metros = self.indice.cercanos(
+            lat, lng, k, filtro if codigo is not None or ccz is not None else None)
+        return {
+            "arboles": [
+                {"i": i, "lat": la, "lng": ln, "e": self.especies[e], "metros": round(m, 1)}
+                for i, la, ln, e, m in zip(
+                    self.ids[filas].tolist(), self.lat[filas].tolist(), self.lng[filas].tolist(),
+                    self.especie[filas].tolist(), metros.tolist())
+            ],
+        }
+
+
+# ── HTTP ─────────────────────────────────────────────────────────────────────
+
+def _parametro(parametros, nombre, tipo=str, defecto=None):
+    valores = parametros.get(nombre)
+    if not valores or valores[0] == "":
+        return defecto
+    try:
+        return tipo(valores[0])
+    except ValueError:
+        raise ErrorConsulta(f"parámetro inválido: {nombre}={valores[0]}") from None
+
+
+def _finito(texto):
+    """float(texto), sin aceptar "nan" ni "inf"."""
+    valor = float(texto)
+    if not math.isfinite(valor):
+        raise ValueError(texto)
+    return valor
+
+
+def _caja(parametros, obligatoria=False):
+    texto = _parametro(parametros, "bbox")
+    if texto is None:
+        if obligatoria:
+            raise ErrorConsulta("falta bbox=lng0,lat0,lng1,lat1")
+        return None
+    try:
+        caja = [_finito(v) for v in texto.split(",")]
+    except ValueError:
+        caja = []
+    if len(caja) != 4 or caja[0] > caja[2] or caja[1] > caja[3]:
+        raise ErrorConsulta("bbox debe ser lng0,lat0,lng1,lat1")
+    return caja
+
+
+def responder(servicio, ruta, parametros):
+    """(status, cuerpo) para una ruta y sus parámetros de query."""
+    partes = ruta.strip("/").split("/")
+    try:
+        especie = _parametro(parametros, "especie")
+        ccz = _parametro(parametros, "ccz", int)
+        if partes == ["health"]:
+            return 200, {"ok": True, "arboles": len(servicio)}
+        if len(partes) == 2 and partes[0] == "tree":
+            try:
+                tree_id = int(partes[1])
+            except ValueError:
+                raise ErrorConsulta(f"id inválido: {partes[1]}") from None
+            arbol = servicio.arbol(tree_id)
+            return (200, arbol) if arbol else (404, {"error": f"no existe el árbol {tree_id}"})
+        if partes == ["bbox"]:
+            limite = _parametro(parametros, "limite", int, LIMITE_BBOX)
+            if limite < 1:
+                raise ErrorConsulta(f"limite debe ser al menos 1: {limite}")
+            limite = min(limite, LIMITE_BBOX)
+            return 200, servicio.bbox(_caja(parametros, obligatoria=True), especie, ccz, limite)
+        if partes == ["count"]:
+            return 200, servicio.conteo(_caja(parametros), especie, ccz)
+        if partes == ["nearest"]:
+            lat = _parametro(parametros, "lat", _finito)
+            lng = _parametro(parametros, "lng", _finito)
+            if lat is None or lng is None:
+                raise ErrorConsulta("faltan lat y lng")
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                raise ErrorConsulta(f"lat/lng fuera de rango: {lat},{lng}")
+            k = min(max(_parametro(parametros, "k", int, 10), 1), K_MAX)
+            return 200, servicio.cercanos(lat, lng, k, especie, ccz)
+    except ErrorConsulta as e:
+        return 400, {"error": str(e)}
+    return 404, {"error": f"ruta desconocida: {ruta}"}
+
+
+ESTADOS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+async def atender(servicio, lector, escritor):
+    """Atender las peticiones de una conexión (keep-alive) hasta que se cierre."""
+    try:
+        while True:
+            linea = await lector.readline()
+            if not linea:
+                break
+            try:
+                metodo, objetivo, version = linea.decode("latin-1").split()
+            except ValueError:
+                break
+            cerrar = version == "HTTP/1.0"
+            while True:
+                cabecera = await lector.readline()
+                if cabecera in (b"\r\n", b"\n", b""):
+                    break
+                nombre, _, valor = cabecera.decode("latin-1").partition(":")
+                if nombre.strip().lower() == "connection":
+                    cerrar = valor.strip().lower() == "close"
+
+            url = urlsplit(objetivo)
+            if metodo != "GET":
+                status, cuerpo = 405, {"error": "solo GET"}
+            else:
+                status, cuerpo = responder(servicio, unquote(url.path), parse_qs(url.query))
+            datos = json.dumps(cuerpo, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            escritor.write(
+                f"HTTP/1.1 {status} {ESTADOS[status]}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(datos)}\r\n"
+                f"Access-Control-Allow-Origin: *\r\n"
+                f"Connection: {'close' if cerrar else 'keep-alive'}\r\n\r\n".encode("latin-1") + datos)
+            await escritor.drain()
+            if cerrar:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        escritor.close()
+
+
+async def servir(servicio, host, puerto):
+    servidor = await asyncio.start_server(
+        lambda lector, escritor: atender(servicio, lector, escritor), host, puerto)
+    print(f"Escuchando en http://{host}:{puerto}")
+    async with servidor:
+        await servidor.serve_forever()
+
+
+def cargar_servicio(ruta=None):
+    """Servicio con los datos de trees-data.bin o de un CSV procesado (.csv)."""
+    ruta = Path(ruta or WEB_PUBLIC / "trees-data.bin")
+    inicio = time.perf_counter()
+    datos = cargar_csv(ruta) if ruta.suffix == ".csv" else cargar_bin(ruta)
+    servicio = ServicioArboles(*datos)
+    print(f"{len(servicio):,} árboles cargados de {ruta.name} e indexados en "
+          f"{time.perf_counter() - inicio:.2f}s (grilla {servicio.indice.ancho}x{servicio.indice.alto})")
+    return servicio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP de consultas de árboles.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--datos", type=Path, default=None,
+                        help="trees-data.bin o CSV procesado (default web/public/trees-data.bin)")
+    args = parser.parse_args(argv)
+
+    servicio = cargar_servicio(args.datos)
+    try:
+        asyncio.run(servir(servicio, args.host, args.puerto))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
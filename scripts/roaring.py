@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Bitmaps comprimidos estilo Roaring para conjuntos de ids (enteros de 32 bits).
+
+Los valores se parten por sus 16 bits altos en contenedores: un contenedor
+con hasta 4096 valores es un array ordenado de uint16 (los 16 bits bajos) y
+uno más denso es un bitmap de 65536 bits (1024 uint64). Así un conjunto
+chico ocupa 2 bytes por valor y uno grande como mucho 8 KB por contenedor,
+y las operaciones AND/OR trabajan contenedor a contenedor con numpy.
+
+La serialización es el formato portable de Roaring (cookie 12346, sin
+contenedores run), el que leen CRoaring, roaring-java y las librerías de
+JavaScript, para que el cliente pueda filtrar con los mismos bitmaps. Al
+leer se aceptan también contenedores run (cookie 12347).
+"""
+
+import struct
+import numpy as np
+
+MAXIMO_ARRAY = 4096
+PALABRAS = 1024  # uint64 por contenedor bitmap
+
+COOKIE_SIN_RUNS = 12346
+COOKIE_CON_RUNS = 12347
+# Con runs, los offsets se escriben solo a partir de esta cantidad de contenedores
+MINIMO_OFFSETS_CON_RUNS = 4
+
+
+# ── Contenedores ─────────────────────────────────────────────────────────────
+
+def es_bitmap(contenedor):
+    return contenedor.dtype == np.uint64
+
+
+def popcount(palabras):
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(palabras).sum())
+    return int(np.unpackbits(palabras.view(np.uint8)).sum())
+
+
+def cardinalidad(contenedor):
+    return popcount(contenedor) if es_bitmap(contenedor) else len(contenedor)
+
+
+def a_bitmap(bajos):
+    """uint16 ordenados -> 1024 uint64 (bit k de la palabra w = valor 64 w + k)."""
+    bits = np.zeros(1 << 16, dtype=bool)
+    bits[bajos] = True
+    return np.packbits(bits, bitorder="little").view("<u8").astype(np.uint64)
+
+
+def a_array(palabras):
+    """1024 uint64 -> uint16 ordenados."""
+    bits = np.unpackbits(palabras.astype("<u8").view(np.uint8), bitorder="little")
+    return np.flatnonzero(bits).astype(np.uint16)
+
+
+def normalizar(contenedor):
+    """Elegir la representación según la cardinalidad (None si quedó vacío)."""
+    n = cardinalidad(contenedor)
+    if n == 0:
+        return None
+    if es_bitmap(contenedor):
+        return a_array(contenedor) if n <= MAXIMO_ARRAY else contenedor
+    return a_bitmap(contenedor) if n > MAXIMO_ARRAY else contenedor
+
+
+def contiene(palabras, bajos):
+    """Máscara de los valores bajos presentes en un contenedor bitmap."""
+    bajos = bajos.astype(np.uint64)
+    return (palabras[bajos >> np.uint64(6)] >> (bajos & np.uint64(63))) & np.uint64(1) != 0
+
+
+def interseccion(a, b):
+    if es_bitmap(a) and es_bitmap(b):
+        return normalizar(a & b)
+    if es_bitmap(a):
+        a, b = b, a
+    if es_bitmap(b):
+        return normalizar(a[contiene(b, a)])
+    return normalizar(np.intersect1d(a, b, assume_unique=True))
+
+
+def union(contenedores):
+    """Unión de varios contenedores de la misma clave."""
+    if len(contenedores) == 1:
+        return contenedores[0]
+    arrays = [c for c in contenedores if not es_bitmap(c)]
+    bitmaps = [c for c in contenedores if es_bitmap(c)]
+    if not bitmaps and sum(len(c) for c in arrays) <= MAXIMO_ARRAY:
+        valores = np.concatenate(arrays)
+        valores.sort()
+        return valores[np.concatenate(([True], valores[1:] != valores[:-1]))]
+    resultado = np.bitwise_or.reduce(bitmaps) if bitmaps else np.zeros(PALABRAS, dtype=np.uint64)
+    if arrays:
+        resultado = resultado | a_bitmap(np.concatenate(arrays))
+    return normalizar(resultado)
+
+
+# ── Bitmap ───────────────────────────────────────────────────────────────────
+
+class Bitmap:
+    """Conjunto de enteros sin signo de 32 bits en contenedores por 16 bits altos."""
+
+    __slots__ = ("claves", "contenedores")
+
+    def __init__(self, claves=(), contenedores=()):
+        self.claves = list(claves)
+        self.contenedores = list(contenedores)
+
+    @classmethod
+    def desde_valores(cls, valores):
+        valores = np.unique(np.asarray(valores, dtype=np.int64))
+        if len(valores) and (valores[0] < 0 or valores[-1] >= 1 << 32):
+            raise ValueError("los valores deben estar entre 0 y 2^32 - 1")
+        altos = (valores >> 16).astype(np.uint32)
+        claves, inicios = np.unique(altos, return_index=True)
+        limites = list(inicios[1:]) + [len(valores)]
+        bajos = (valores & 0xFFFF).astype(np.uint16)
+        return cls(claves.tolist(),
+                   [normalizar(bajos[i:f]) for i, f in zip(inicios.tolist(), limites)])
+
+    def __len__(self):
+        return sum(cardinalidad(c) for c in self.contenedores)
+
+    def __bool__(self):
+        return bool(self.claves)
+
+    def __eq__(self, otro):
+        return isinstance(otro, Bitmap) and self.claves == otro.claves and all(
+            es_bitmap(a) == es_bitmap(b) and np.array_equal(a, b)
+            for a, b in zip(self.contenedores, otro.contenedores))
+
+    def __contains__(self, valor):
+        clave, bajo = valor >> 16, valor & 0xFFFF
+        for k, c in zip(self.claves, self.contenedores):
+            if k == clave:
+                if es_bitmap(c):
+                    return bool(contiene(c, np.array([bajo]))[0])
+                i = np.searchsorted(c, bajo)
+                return i < len(c) and c[i] == bajo
+        return False
+
+    def __and__(self, otro):
+        claves, contenedores = [], []
+        i = j = 0
+        while i < len(self.claves) and j < len(otro.claves):
+            a, b = self.claves[i], otro.claves[j]
+            if a == b:
+                contenedor = interseccion(self.contenedores[i], otro.contenedores[j])
+                if contenedor is not None:
+                    claves.append(a)
+                    contenedores.append(contenedor)
+                i += 1
+                j += 1
+            elif a < b:
+                i += 1
+            else:
+                j += 1
+        return Bitmap(claves, contenedores)
+
+    def __or__(self, otro):
+        return Bitmap.union_de([self, otro])
+
+    @staticmethod
+    def union_de(bitmaps):
+        """Unión de varios bitmaps, de a una clave por vez."""
+        por_clave = {}
+        for bitmap in bitmaps:
+            for clave, contenedor in zip(bitmap.claves, bitmap.contenedores):
+                por_clave.setdefault(clave, []).append(contenedor)
+        claves = sorted(por_clave)
+        return Bitmap(claves, [union(por_clave[k]) for k in claves])
+
+    @staticmethod
+    def interseccion_de(bitmaps):
+        bitmaps = sorted(bitmaps, key=lambda b: len(b.claves))
+        if not bitmaps:
+            raise ValueError("intersección de cero bitmaps")
+        resultado = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            resultado = resultado & bitmap
+        return resultado
+
+    def valores(self):
+        """Valores ordenados como array uint32."""
+        partes = [(np.uint32(k) << np.uint32(16)) |
+                  (a_array(c) if es_bitmap(c) else c).astype(np.uint32)
+                  for k, c in zip(self.claves, self.contenedores)]
+        return np.concatenate(partes) if partes else np.zeros(0, dtype=np.uint32)
+
+    # ── Formato portable ─────────────────────────────────────────────────────
+
+    def serializar(self):
+        """Bytes en el formato portable de Roaring (sin contenedores run)."""
+        n = len(self.claves)
+        partes = [struct.pack("<II", COOKIE_SIN_RUNS, n)]
+        partes += [struct.pack("<HH", k, cardinalidad(c) - 1)
+                   for k, c in zip(self.claves, self.contenedores)]
+        datos = [c.astype("<u8" if es_bitmap(c) else "<u2").tobytes() for c in self.contenedores]
+        offset = 8 + 8 * n
+        for d in datos:
+            partes.append(struct.pack("<I", offset))
+            offset += len(d)
+        return b"".join(partes + datos)
+
+    @classmethod
+    def deserializar(cls, datos):
+        datos = memoryview(datos)
+        cookie = struct.unpack_from("<I", datos, 0)[0]
+        if cookie == COOKIE_SIN_RUNS:
+            n = struct.unpack_from("<I", datos, 4)[0]
+            runs = bytes(0)
+            pos = 8
+        elif cookie & 0xFFFF == COOKIE_CON_RUNS:
+            n = (cookie >> 16) + 1
+            runs = bytes(datos[4:4 + (n + 7) // 8])
+            pos = 4 + len(runs)
+        else:
+            raise ValueError(f"cookie de Roaring desconocida: {cookie}")
+        descriptores = np.frombuffer(datos, dtype="<u2", count=2 * n, offset=pos).reshape(n, 2)
+        pos += 4 * n
+        if cookie == COOKIE_SIN_RUNS or n >= MINIMO_OFFSETS_CON_RUNS:
+            pos += 4 * n  # los contenedores se leen en orden, los offsets no hacen falta
+
+        claves, contenedores = [], []
+        for k, (clave, cardinal) in enumerate(descriptores.tolist()):
+            es_run = runs and runs[k // 8] >> (k % 8) & 1
+            if es_run:
+                cantidad = struct.unpack_from("<H", datos, pos)[0]
+                pares = np.frombuffer(datos, dtype="<u2", count=2 * cantidad,
+                                      offset=pos + 2).reshape(cantidad, 2).astype(np.int64)
+                pos += 2 + 4 * cantidad
+                bajos = np.concatenate([np.arange(i, i + largo + 1) for i, largo in pares]) \
+                    if cantidad else np.zeros(0, dtype=np.int64)
+                contenedor = normalizar(bajos.astype(np.uint16))
+            elif cardinal + 1 > MAXIMO_ARRAY:
+                contenedor = np.frombuffer(datos, dtype="<u8", count=PALABRAS, offset=pos).astype(np.uint64)
+                pos += 8 * PALABRAS
+            else:
+                contenedor = np.frombuffer(datos, dtype="<u2", count=cardinal + 1, offset=pos).astype(np.uint16)
+                pos += 2 * (cardinal + 1)
+            claves.append(clave)
+            contenedores.append(contenedor)
+        return cls(claves, contenedores)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Shards espaciales de trees-data.
+
+generate_geojson.py reparte los registros de trees-data.json en celdas de
+tesela (zoom 14 por defecto) y comprime cada una por separado en
+web/public/trees-data/<z>-<x>-<y>.json.gz. El manifest.json lista cada
+celda con su archivo, tamaño y cantidad de árboles; ids.bin permite ubicar
+el shard de un id sin coordenadas (ids uint32 ordenados seguidos del índice
+del shard de cada uno en el manifest).
+
+El cliente, que ya tiene las coordenadas del árbol en la tesela vectorial,
+calcula la celda y baja solo ese shard.
+
+Uso:
+    python scripts/shards.py                      # resumen de tamaños
+    python scripts/shards.py --id 12345           # shard y registro de un id
+    python scripts/shards.py --lat -34.9 --lng -56.16
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import numpy as np
+from pathlib import Path
+
+from generate_pmtiles import proyectar
+
+BASE_DIR = Path(__file__).parent.parent
+WEB_PUBLIC = BASE_DIR / "web" / "public"
+
+ZOOM_SHARDS = 14
+DIRECTORIO = "trees-data"
+MANIFEST = "manifest.json"
+INDICE_IDS = "ids.bin"
+
+
+def celdas(lat, lng, zoom=ZOOM_SHARDS):
+    """Celda (x, y) de tesela Web Mercator para arrays de coordenadas."""
+    tx, ty, _, _ = proyectar(np.asarray(lng, dtype=float), np.asarray(lat, dtype=float), zoom)
+    return tx, ty
+
+
+def nombre_shard(zoom, x, y):
+    return f"{zoom}-{x}-{y}.json.gz"
+
+
+def escribir_indice_ids(ruta, ids, shards, cantidad_shards):
+    """Escribir ids.bin (ordenado por id); devuelve su descripción para el manifest."""
+    orden = np.argsort(ids, kind="stable")
+    tipo = "<u2" if cantidad_shards < 0xFFFF else "<u4"
+    with open(ruta, "wb") as f:
+        f.write(ids[orden].astype("<u4").tobytes())
+        f.write(shards[orden].astype(tipo).tobytes())
+    return {"archivo": ruta.name, "ids": len(ids), "tipo_shard": tipo[1:]}
+
+
+class Shards:
+    """Resolver ids y coordenadas a su shard a partir del manifest."""
+
+    def __init__(self, directorio=WEB_PUBLIC / DIRECTORIO):
+        self.directorio = Path(directorio)
+        with open(self.directorio / MANIFEST, encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.zoom = self.manifest["zoom"]
+        self.shards = self.manifest["shards"]
+        self._por_celda = {(s["x"], s["y"]): s for s in self.shards}
+        self._ids = None
+        self._indices = None
+
+    def por_coordenada(self, lat, lng):
+        """Shard de la celda que contiene la coordenada (None si no hay árboles)."""
+        tx, ty = celdas([lat], [lng], self.zoom)
+        return self._por_celda.get((int(tx[0]), int(ty[0])))
+
+    def _cargar_indice_ids(self):
+        info = self.manifest["ids"]
+        datos = (self.directorio / info["archivo"]).read_bytes()
+        n = info["ids"]
+        self._ids = np.frombuffer(datos, dtype="<u4", count=n)
+        self._indices = np.frombuffer(datos, dtype="<" + info["tipo_shard"], count=n, offset=4 * n)
+
+    def por_id(self, tree_id):
+        """Shard que contiene el id (None si el id no existe)."""
+        if self._ids is None:
+            self._cargar_indice_ids()
+        fila = int(np.searchsorted(self._ids, tree_id))
+        if fila < len(self._ids) and self._ids[fila] == tree_id:
+            return self.shards[int(self._indices[fila])]
+        return None
+
+    def registros(self, shard):
+        """Registros (dict por id, como trees-data.json) de un shard."""
+        datos = (self.directorio / shard["archivo"]).read_bytes()
+        return json.loads(gzip.decompress(datos))
+
+    def registro(self, tree_id):
+        shard = self.por_id(tree_id)
+        return self.registros(shard).get(str(tree_id)) if shard else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consultar los shards de trees-data.")
+    parser.add_argument("--directorio", type=Path, default=WEB_PUBLIC / DIRECTORIO)
+    parser.add_argument("--id", type=int)
+    parser.add_argument("--lat", type=float)
+    parser.add_argument("--lng", type=float)
+    args = parser.parse_args(argv)
+
+    shards = Shards(args.directorio)
+    if args.id is not None:
+        shard = shards.por_id(args.id)
+        if shard is None:
+            print(f"id {args.id} no encontrado")
+            return 1
+        print(f"{shard['archivo']}: {shard['bytes']:,} bytes, {shard['arboles']:,} árboles")
+        print(json.dumps(shards.registro(args.id), ensure_ascii=False, indent=2))
+    elif args.lat is not None and args.lng is not None:
+        shard = shards.por_coordenada(args.lat, args.lng)
+        if shard is None:
+            print("sin árboles en esa celda")
+            return 1
+        print(f"{shard['archivo']}: {shard['bytes']:,} bytes, {shard['arboles']:,} árboles")
+    else:
+        tamanos = np.array([s["bytes"] for s in shards.shards])
+        print(f"{len(tamanos):,} shards (zoom {shards.zoom}), "
+              f"{shards.manifest['arboles']:,} árboles, {tamanos.sum() / 1024:.0f} KB en total")
+        print(f"  por shard: mediana {np.median(tamanos) / 1024:.1f} KB, "
+              f"máximo {tamanos.max() / 1024:.1f} KB")
+        manifest = (args.directorio / MANIFEST).stat().st_size
+        print(f"  manifest.json: {manifest / 1024:.1f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
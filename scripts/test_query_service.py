@@ -0,0 +1,62 @@
+"""Validación de parámetros de query_service.responder."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import query_service
+
+
+@pytest.fixture(scope="module")
+def servicio(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    n = 50
+    df = pd.DataFrame({
+        "Arbol": np.arange(1, n + 1),
+        "lat": -34.9 + rng.random(n) * 0.01,
+        "lng": -56.2 + rng.random(n) * 0.01,
+        "Nombre científico": "Fraxinus lanceolata",
+        "Nombre común": "Fresno americano",
+        "Calle": "YI",
+        "Numero": 1000.0,
+        "CCZ": 1.0,
+        "Altura": 10.0,
+        "CAP": 100.0,
+        "Diametro Copa": 5.0,
+        "EV": 2.0,
+    })
+    ruta = tmp_path_factory.mktemp("datos") / "arboles.csv"
+    df.to_csv(ruta, index=False)
+    return query_service.ServicioArboles(*query_service.cargar_csv(ruta))
+
+
+CAJA = "-56.3,-35.0,-56.1,-34.8"
+
+
+@pytest.mark.parametrize("limite", ["0", "-1"])
+def test_bbox_rechaza_limite_no_positivo(servicio, limite):
+    status, cuerpo = query_service.responder(servicio, "/bbox", {"bbox": [CAJA], "limite": [limite]})
+    assert status == 400
+    assert "limite" in cuerpo["error"]
+
+
+def test_bbox_limite_acotado(servicio):
+    status, cuerpo = query_service.responder(servicio, "/bbox", {"bbox": [CAJA], "limite": ["3"]})
+    assert status == 200
+    assert cuerpo["total"] == 50 and len(cuerpo["arboles"]) == 3
+
+
+@pytest.mark.parametrize("parametros", [
+    {"lat": ["nan"], "lng": ["-56.1"]},
+    {"lat": ["-34.9"], "lng": ["inf"]},
+    {"lat": ["1e300"], "lng": ["-56.1"]},
+    {"lat": ["-34.9"], "lng": ["-200"]},
+])
+def test_nearest_rechaza_coordenadas_invalidas(servicio, parametros):
+    status, _ = query_service.responder(servicio, "/nearest", parametros)
+    assert status == 400
+
+
+@pytest.mark.parametrize("caja", ["nan,-35,-56,-34", "-inf,-35,-56,-34"])
+def test_bbox_rechaza_no_finitos(servicio, caja):
+    assert query_service.responder(servicio, "/count", {"bbox": [caja]})[0] == 400
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Formato columnar binario de trees-data (trees-data.bin).
+
+Misma información que trees-data.json, pero por columnas: ids ordenados,
+arrays tipados, textos codificados por diccionario y coordenadas/medidas
+cuantizadas. Se puede leer sin parsear JSON (vistas directas sobre el buffer).
+
+Estructura (little-endian):
+
+    magic    8 bytes   b"ARBOLES1"
+    largo    uint32    largo del header JSON
+    header   JSON      {"version", "filas", "columnas": [...], "diccionarios": {...}}
+    (relleno hasta múltiplo de 8)
+    secciones          cada columna y diccionario alineado a 8 bytes
+
+Cada columna del header tiene nombre, tipo (uint8/uint16/uint32/int32),
+offset y largo en bytes (desde el inicio del archivo), el valor usado para
+null y, para valores cuantizados, la escala (valor = entero / escala). Las
+columnas de texto guardan códigos: 0 es null y k > 0 es la entrada k - 1 del
+diccionario (textos UTF-8 concatenados + offsets uint32).
+
+Uso (verificar contra el JSON):
+    python scripts/trees_data_bin.py web/public/trees-data.bin web/public/trees-data.json
+"""
+
+import argparse
+import gzip
+import json
+import struct
+import sys
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+MAGIC = b"ARBOLES1"
+VERSION = 1
+ALINEACION = 8
+
+NULO_INT32 = -(1 << 31)
+NULO_UINT8 = 255
+
+# Columnas de texto: (campo en trees-data.json, columna del CSV)
+TEXTOS = [
+    ("nombre_cientifico", "Nombre científico"),
+    ("nombre_comun", "Nombre común"),
+    ("calle", "Calle"),
+]
+# Medidas cuantizadas a centésimas
+MEDIDAS = [
+    ("altura", "Altura"),
+    ("cap", "CAP"),
+    ("diametro_copa", "Diametro Copa"),
+]
+ESCALA_MEDIDAS = 100
+ESCALA_COORDENADAS = 1_000_000
+
+# Orden de los campos en cada registro de trees-data.json
+CAMPOS = [
+    "nombre_cientifico", "nombre_comun", "calle", "numero", "ccz",
+    "altura", "cap", "diametro_copa", "estado", "lat", "lng",
+]
+
+
+# ── Escritura ────────────────────────────────────────────────────────────────
+
+def cuantizar(valores, escala, nulo=NULO_INT32):
+    """Floats -> int32 multiplicados por escala; NaN -> nulo.
+
+    Se redondea igual que round(v, decimales) en trees-data.json (redondeo
+    decimal de Python), no multiplicando en float, para que ambos coincidan.
+    """
+    decimales = len(str(escala)) - 1
+    redondeados = np.array([v if v != v else round(v, decimales) for v in valores.tolist()],
+                           dtype=float)
+    enteros = np.rint(np.nan_to_num(redondeados, nan=0.0) * escala).astype(np.int32)
+    return np.where(np.isnan(valores), nulo, enteros).astype(np.int32)
+
+
+def codificar_texto(serie):
+    """Códigos (0 = null) y diccionario ordenado de una columna de texto."""
+    codigos, unicos = pd.factorize(serie, sort=True)
+    tipo = np.uint16 if len(unicos) < 0xFFFF else np.uint32
+    return (codigos + 1).astype(tipo), [str(u) for u in unicos]
+
+
+def serializar_diccionario(textos):
+    """Offsets uint32 (n + 1) y bytes UTF-8 concatenados."""
+    codificados = [t.encode("utf-8") for t in textos]
+    offsets = np.zeros(len(codificados) + 1, dtype=np.uint32)
+    offsets[1:] = np.cumsum([len(c) for c in codificados])
+    return offsets, b"".join(codificados)
+
+
+def columnas_desde_df(df):
+    """Columnas tipadas a partir de las filas (ya sin ids repetidos)."""
+    df = df.sort_values("Arbol", kind="stable")
+    columnas = {"id": (df["Arbol"].to_numpy(dtype=np.uint32), {})}
+    diccionarios = {}
+
+    for campo, origen in TEXTOS:
+        codigos, textos = codificar_texto(df[origen])
+        columnas[campo] = (codigos, {"nulo": 0, "diccionario": campo})
+        diccionarios[campo] = textos
+
+    numero = df["Numero"].to_numpy(dtype=float)
+    columnas["numero"] = (
+        np.where(numero > 0, np.nan_to_num(numero), 0).astype(np.uint32), {"nulo": 0})
+    for campo, origen in (("ccz", "CCZ"), ("estado", "EV")):
+        valores = df[origen].to_numpy(dtype=float)
+        columnas[campo] = (
+            np.where(np.isnan(valores), NULO_UINT8, np.nan_to_num(valores)).astype(np.uint8),
+            {"nulo": NULO_UINT8})
+    for campo, origen in MEDIDAS:
+        columnas[campo] = (cuantizar(df[origen].to_numpy(dtype=float), ESCALA_MEDIDAS),
+                           {"nulo": NULO_INT32, "escala": ESCALA_MEDIDAS})
+    for campo in ("lat", "lng"):
+        columnas[campo] = (cuantizar(df[campo].to_numpy(dtype=float), ESCALA_COORDENADAS),
+                           {"nulo": NULO_INT32, "escala": ESCALA_COORDENADAS})
+    return len(df), columnas, diccionarios
+
+
+def escribir(df, ruta):
+    """Escribir trees-data.bin; devuelve el tamaño en bytes."""
+    filas, columnas, diccionarios = columnas_desde_df(df)
+
+    secciones = []  # (descriptor del header, bytes)
+    for nombre, (valores, opciones) in columnas.items():
+        secciones.append(({"nombre": nombre, "tipo": valores.dtype.name, **opciones},
+                          valores.astype(valores.dtype.newbyteorder("<")).tobytes()))
+    for nombre, textos in diccionarios.items():
+        offsets, datos = serializar_diccionario(textos)
+        secciones.append(({"diccionario": nombre, "parte": "offsets"}, offsets.astype("<u4").tobytes()))
+        secciones.append(({"diccionario": nombre, "parte": "datos", "entradas": len(textos)}, datos))
+
+    def alinear(n):
+        return -n % ALINEACION
+
+    # Los offsets dependen del largo del header: se fijan con un largo tentativo
+    # y se repite hasta que el header no cambie de tamaño
+    largo_header = 0
+    while True:
+        offset = len(MAGIC) + 4 + largo_header
+        offset += alinear(offset)
+        descriptores_col, descriptores_dic = [], {}
+        for descriptor, datos in secciones:
+            ubicacion = {"offset": offset, "largo": len(datos)}
+            if "parte" in descriptor:
+                dic = descriptores_dic.setdefault(descriptor["diccionario"], {})
+                dic[descriptor["parte"]] = ubicacion
+                if "entradas" in descriptor:
+                    dic["entradas"] = descriptor["entradas"]
+            else:
+                descriptores_col.append({**descriptor, **ubicacion})
+            offset += len(datos) + alinear(len(datos))
+        header = json.dumps({
+            "version": VERSION,
+            "filas": filas,
+            "columnas": descriptores_col,
+            "diccionarios": descriptores_dic,
+        }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if len(header) == largo_header:
+            break
+        largo_header = len(header)
+
+    with open(ruta, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(b"\0" * alinear(f.tell()))
+        for _, datos in secciones:
+            f.write(datos)
+            f.write(b"\0" * alinear(len(datos)))
+        return f.tell()
+
+
+# ── Lectura ──────────────────────────────────────────────────────────────────
+
+def leer(ruta):
+    """Leer trees-data.bin: (header, {columna: array}, {diccionario: [textos]})."""
+    buffer = Path(ruta).read_bytes()
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{ruta} no es un trees-data.bin")
+    (largo,) = struct.unpack_from("<I", buffer, len(MAGIC))
+    inicio = len(MAGIC) + 4
+    header = json.loads(buffer[inicio:inicio + largo])
+    if header["version"] != VERSION:
+        raise ValueError(f"versión {header['version']} no soportada")
+
+    columnas = {}
+    for col in header["columnas"]:
+        tipo = np.dtype(col["tipo"]).newbyteorder("<")
+        columnas[col["nombre"]] = np.frombuffer(
+            buffer, dtype=tipo, count=col["largo"] // tipo.itemsize, offset=col["offset"])
+
+    diccionarios = {}
+    for nombre, dic in header["diccionarios"].items():
+        offsets = np.frombuffer(buffer, dtype="<u4", count=dic["entradas"] + 1,
+                                offset=dic["offsets"]["offset"])
+        datos = buffer[dic["datos"]["offset"]:dic["datos"]["offset"] + dic["datos"]["largo"]]
+        texto = datos.decode("utf-8")
+        if len(texto) == len(datos):
+            # ASCII: los offsets en bytes sirven como índices de caracteres
+            diccionarios[nombre] = [texto[a:b] for a, b in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+        else:
+            diccionarios[nombre] = [datos[a:b].decode("utf-8")
+                                    for a, b in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+    return header, columnas, diccionarios
+
+
+def buscar(columnas, tree_id):
+    """Fila de un id (búsqueda binaria sobre la columna ordenada) o None."""
+    ids = columnas["id"]
+    fila = int(np.searchsorted(ids, tree_id))
+    if fila < len(ids) and ids[fila] == tree_id:
+        return fila
+    return None
+
+
+def a_registros(header, columnas, diccionarios):
+    """Reconstruir el dict de trees-data.json a partir de las columnas."""
+    listas = {}
+    for col in header["columnas"]:
+        nombre = col["nombre"]
+        valores = columnas[nombre]
+        nulos = valores == col["nulo"] if "nulo" in col else np.zeros(len(valores), bool)
+        if "diccionario" in col:
+            textos = [None] + diccionarios[col["diccionario"]]
+            listas[nombre] = [textos[c] for c in valores.tolist()]
+        elif "escala" in col:
+            reales = (valores / col["escala"]).tolist()
+            listas[nombre] = [None if n else v for v, n in zip(reales, nulos.tolist())]
+        else:
+            listas[nombre] = [None if n else v for v, n in zip(valores.tolist(), nulos.tolist())]
+
+    return {
+        str(tree_id): dict(zip(CAMPOS, valores))
+        for tree_id, valores in zip(listas["id"], zip(*(listas[c] for c in CAMPOS)))
+    }
+
+
+# ── Verificación ─────────────────────────────────────────────────────────────
+
+def diferencias(original, reconstruido, maximo=10):
+    """Primeras diferencias entre el JSON y lo leído del binario."""
+    errores = []
+    if set(original) != set(reconstruido):
+        faltan = len(set(original) - set(reconstruido))
+        sobran = len(set(reconstruido) - set(original))
+        errores.append(f"ids distintos: {faltan} faltan, {sobran} sobran")
+    tolerancias = {"lat": 0.5 / ESCALA_COORDENADAS, "lng": 0.5 / ESCALA_COORDENADAS}
+    tolerancias.update({campo: 0.5 / ESCALA_MEDIDAS for campo, _ in MEDIDAS})
+    for tree_id, registro in original.items():
+        otro = reconstruido.get(tree_id)
+        if otro is None:
+            continue
+        for campo in CAMPOS:
+            a, b = registro.get(campo), otro.get(campo)
+            if a is None or b is None or campo not in tolerancias:
+                igual = a == b
+            else:
+                igual = abs(a - b) <= tolerancias[campo] + 1e-9
+            if not igual:
+                errores.append(f"{tree_id}.{campo}: {a!r} != {b!r}")
+                if len(errores) >= maximo:
+                    return errores
+    return errores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verificar trees-data.bin contra trees-data.json.")
+    parser.add_argument("binario", type=Path)
+    parser.add_argument("json", type=Path)
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    with open(args.json, encoding="utf-8") as f:
+        original = json.load(f)
+    t_json = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    header, columnas, diccionarios = leer(args.binario)
+    t_columnas = time.perf_counter() - inicio
+    reconstruido = a_registros(header, columnas, diccionarios)
+    t_registros = time.perf_counter() - inicio
+
+    print(f"{'':22s} {'bytes':>12s} {'gzip -9':>12s}")
+    for nombre, ruta in (("trees-data.json", args.json), ("trees-data.bin", args.binario)):
+        datos = ruta.read_bytes()
+        print(f"{nombre:22s} {len(datos):12,} {len(gzip.compress(datos, 9, mtime=0)):12,}")
+    print(f"\nDecodificación: JSON {t_json:.3f}s, columnas {t_columnas:.3f}s "
+          f"(+ registros completos {t_registros:.3f}s)")
+
+    errores = diferencias(original, reconstruido)
+    if errores:
+        print(f"\n{len(errores)} diferencia(s):")
+        for error in errores:
+            print(f"  {error}")
+        return 1
+    print(f"\nOK: {len(original):,} registros idénticos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Almacén de registros por id de árbol, para abrir con memory-map.
+
+trees-data.store guarda los mismos registros que trees-data.json, pero en
+un formato que no hay que parsear para consultar un árbol: los procesos
+mapean el archivo (np.memmap), buscan los ids por búsqueda binaria y solo
+decodifican los registros pedidos. El sistema operativo comparte las
+páginas entre todos los procesos que lo abren.
+
+Formato (little-endian, secciones alineadas a 8 bytes):
+    magic "ARBSTOR1", uint64 cantidad de registros
+    ids       uint64[n]      ordenados
+    offsets   uint64[n + 1]  inicio de cada registro en el blob
+    blob      registros JSON UTF-8 concatenados
+
+Uso:
+    python scripts/trees_store.py 104 2450 13591
+    python scripts/trees_store.py --verificar web/public/trees-data.json
+"""
+
+import argparse
+import json
+import sys
+import time
+import numpy as np
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+PROCESSED_DIR = BASE_DIR / "data" / "processed"
+
+MAGIC = b"ARBSTOR1"
+TAMANO_HEADER = 16
+
+
+def escribir(ids, textos, ruta):
+    """Escribir el almacén (registros en cualquier orden); devuelve el tamaño en bytes."""
+    ids = np.asarray(ids, dtype=np.uint64)
+    orden = np.argsort(ids, kind="stable")
+    datos = [textos[k].encode("utf-8") for k in orden.tolist()]
+    offsets = np.zeros(len(datos) + 1, dtype="<u8")
+    offsets[1:] = np.cumsum([len(d) for d in datos])
+    with open(ruta, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(datos)).astype("<u8").tobytes())
+        f.write(ids[orden].astype("<u8").tobytes())
+        f.write(offsets.tobytes())
+        f.writelines(datos)
+        return f.tell()
+
+
+class AlmacenArboles:
+    """Registros de trees-data.store por id, sin cargar el archivo en memoria."""
+
+    def __init__(self, ruta=PROCESSED_DIR / "trees-data.store"):
+        self.ruta = Path(ruta)
+        mapa = np.memmap(self.ruta, dtype=np.uint8, mode="r")
+        if bytes(mapa[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{self.ruta} no es un trees-data.store")
+        n = int(mapa[len(MAGIC):TAMANO_HEADER].view("<u8")[0])
+        inicio_offsets = TAMANO_HEADER + 8 * n
+        inicio_blob = inicio_offsets + 8 * (n + 1)
+        self._mapa = mapa
+        self.ids = mapa[TAMANO_HEADER:inicio_offsets].view("<u8")
+        self.offsets = mapa[inicio_offsets:inicio_blob].view("<u8")
+        self.blob = mapa[inicio_blob:]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def filas(self, ids):
+        """Fila de cada id (-1 si no está), por búsqueda binaria en lote."""
+        ids = np.atleast_1d(np.asarray(ids, dtype=np.uint64))
+        filas = np.searchsorted(self.ids, ids)
+        encontrados = filas < len(self.ids)
+        encontrados[encontrados] = self.ids[filas[encontrados]] == ids[encontrados]
+        return np.where(encontrados, filas, -1)
+
+    def lookup_bytes(self, ids):
+        """Texto JSON (bytes) de cada registro, None si el id no existe."""
+        inicios = self.offsets[:-1]
+        finales = self.offsets[1:]
+        return [None if f < 0 else bytes(self.blob[inicios[f]:finales[f]])
+                for f in self.filas(ids).tolist()]
+
+    def lookup(self, ids):
+        """Registro (dict) de cada id, None si no existe."""
+        return [None if d is None else json.loads(d) for d in self.lookup_bytes(ids)]
+
+    def __contains__(self, tree_id):
+        return self.filas([tree_id])[0] >= 0
+
+    def __getitem__(self, tree_id):
+        registro = self.lookup([tree_id])[0]
+        if registro is None:
+            raise KeyError(tree_id)
+        return registro
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consultar o verificar trees-data.store.")
+    parser.add_argument("ids", type=int, nargs="*", help="ids a buscar")
+    parser.add_argument("--store", type=Path, default=PROCESSED_DIR / "trees-data.store")
+    parser.add_argument("--verificar", type=Path, default=None,
+                        help="trees-data.json contra el que comparar todos los registros")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    almacen = AlmacenArboles(args.store)
+    print(f"{args.store}: {len(almacen):,} registros, abierto en "
+          f"{(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+    for tree_id, registro in zip(args.ids, almacen.lookup(args.ids)):
+        print(f"  {tree_id}: {json.dumps(registro, ensure_ascii=False)}")
+
+    if args.verificar:
+        with open(args.verificar, encoding="utf-8") as f:
+            original = json.load(f)
+        inicio = time.perf_counter()
+        registros = almacen.lookup([int(k) for k in original])
+        tiempo = time.perf_counter() - inicio
+        distintos = [k for k, r in zip(original, registros) if r != original[k]]
+        print(f"  {len(original):,} ids buscados en {tiempo:.2f}s; "
+              f"{len(distintos):,} diferencias, {len(almacen) - len(original):,} registros de más")
+        if distintos or len(almacen) != len(original):
+            print(f"Error: el almacén no coincide con {args.verificar}")
+            return 1
+        print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Validar trees.pmtiles contra el diccionario de especies (species-ids.json).
+
+Decodifica cada tesela y verifica que cada feature tenga i y c enteros y un
+e coherente con el diccionario: un id válido (o -1, sin especie) si las
+teselas usan ids, o un nombre del diccionario si usan texto. Los ids deben
+estar ordenados por frecuencia, y en el zoom máximo ninguna especie puede
+tener más árboles que los que cuenta el diccionario (menos solo si se
+descartaron por densidad). En la capa de grupos, cada histograma suma la
+cantidad del grupo, la especie dominante lo encabeza y los histogramas de
+cada zoom suman exactamente los conteos del diccionario. Si la metadata
+declara el hash del diccionario, también se verifica.
+
+Uso:
+    python scripts/validar_teselas.py
+    python scripts/validar_teselas.py otro/trees.pmtiles --diccionario otro/species-ids.json
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+import mvt
+from archivo_pmtiles import COMPRESION_GZIP, LectorPMTiles
+from generate_pmtiles import CAPA, CAPA_GRUPOS, DICCIONARIO, WEB_PUBLIC
+
+# Errores listados antes de resumir el resto
+MAX_ERRORES = 20
+
+
+def validar(ruta_pmtiles, ruta_diccionario):
+    """Lista de errores (vacía si las teselas son coherentes) y un resumen."""
+    datos_diccionario = ruta_diccionario.read_bytes()
+    diccionario = json.loads(datos_diccionario)
+    especies = diccionario["especies"]
+    sin_especie = diccionario["sin_especie"]
+    nombres = set(especies)
+    errores = []
+    if diccionario["arboles"] != sorted(diccionario["arboles"], reverse=True):
+        errores.append(f"{ruta_diccionario.name} no está ordenado por frecuencia")
+
+    with LectorPMTiles(ruta_pmtiles) as lector:
+        metadata = lector.metadata()
+        comprimidas = lector.header["tile_compression"] == COMPRESION_GZIP
+        max_zoom = lector.header["max_zoom"]
+        campos = next((c["fields"] for c in metadata.get("vector_layers", [])
+                       if c["id"] == CAPA), {})
+        entero = campos.get("e") == "Number"
+
+        declarado = metadata.get("species_dictionary")
+        if entero and declarado is None:
+            errores.append("la metadata no declara species_dictionary para e numérico")
+        if declarado and declarado["sha256"] != hashlib.sha256(datos_diccionario).hexdigest():
+            errores.append(f"{ruta_diccionario.name} no es el diccionario con que se generaron las teselas")
+
+        teselas = features = 0
+        por_especie = Counter()
+        # Árboles por id de especie en cada zoom de la capa de grupos
+        grupos_por_zoom = {}
+        for z, x, y, datos in lector.teselas():
+            teselas += 1
+            capas = mvt.decodificar(gzip.decompress(datos) if comprimidas else datos)
+            if CAPA not in capas and CAPA_GRUPOS not in capas:
+                errores.append(f"{z}/{x}/{y}: no tiene la capa {CAPA} ni {CAPA_GRUPOS}")
+            for feature in capas.get(CAPA, {}).get("features", []):
+                features += 1
+                p = feature["properties"]
+                e = p.get("e")
+                if not isinstance(p.get("i"), int) or not isinstance(p.get("c"), int):
+                    errores.append(f"{z}/{x}/{y}: árbol {p.get('i')} con i o c no enteros")
+                if not especie_valida(e, entero, especies, nombres, sin_especie):
+                    errores.append(f"{z}/{x}/{y}: árbol {p.get('i')} con especie {e!r} fuera del diccionario")
+                elif z == max_zoom and e not in ("", sin_especie):
+                    por_especie[e] += 1
+            for feature in capas.get(CAPA_GRUPOS, {}).get("features", []):
+                features += 1
+                conteo = grupos_por_zoom.setdefault(z, Counter())
+                errores += validar_grupo(feature["properties"], f"{z}/{x}/{y}", conteo,
+                                         entero, especies, nombres, sin_especie)
+
+    # En el zoom máximo están todos los árboles (salvo los descartados por densidad)
+    esperados = Counter({(k if entero else especies[k]): n
+                         for k, n in enumerate(diccionario["arboles"])})
+    for clave, n in esperados.items():
+        if por_especie[clave] > n:
+            errores.append(f"especie {clave!r}: {por_especie[clave]:,} árboles en z{max_zoom}, "
+                           f"el diccionario dice {n:,}")
+    # Los grupos no descartan nada: cada zoom cuenta exactamente el diccionario
+    for z, conteo in sorted(grupos_por_zoom.items()):
+        conteo.pop(sin_especie, None)
+        if conteo != Counter(dict(enumerate(diccionario["arboles"]))):
+            errores.append(f"z{z}: los histogramas de {CAPA_GRUPOS} no suman los conteos del diccionario")
+    return errores, {"teselas": teselas, "features": features, "entero": entero,
+                     "exactos": sum(por_especie[k] == n for k, n in esperados.items()),
+                     "especies": len(especies), "zooms_grupos": sorted(grupos_por_zoom)}
+
+
+def especie_valida(e, entero, especies, nombres, sin_especie):
+    if entero:
+        return isinstance(e, int) and (e == sin_especie or 0 <= e < len(especies))
+    return e == "" or e in nombres
+
+
+def validar_grupo(p, tesela, conteo, entero, especies, nombres, sin_especie):
+    """Errores de un grupo; suma su histograma (por id de especie) a conteo."""
+    n, e, h = p.get("n"), p.get("e"), p.get("h")
+    if not isinstance(n, int) or n <= 0 or not isinstance(h, str):
+        return [f"{tesela}: grupo con n={n!r} h={h!r}"]
+    try:
+        histograma = [tuple(int(v) for v in par.split(":")) for par in h.split(",")]
+    except ValueError:
+        return [f"{tesela}: histograma ilegible {h!r}"]
+    errores = []
+    if any(k != sin_especie and not 0 <= k < len(especies) for k, _ in histograma):
+        errores.append(f"{tesela}: histograma con especies fuera del diccionario {h!r}")
+    elif sum(a for _, a in histograma) != n:
+        errores.append(f"{tesela}: el histograma {h!r} no suma n={n}")
+    if not especie_valida(e, entero, especies, nombres, sin_especie):
+        errores.append(f"{tesela}: grupo con especie {e!r} fuera del diccionario")
+    elif not errores:
+        dominante = histograma[0][0]
+        if e != (dominante if entero else especies[dominante] if dominante >= 0 else ""):
+            errores.append(f"{tesela}: la especie dominante {e!r} no encabeza el histograma {h!r}")
+        for k, a in histograma:
+            conteo[k] += a
+    return errores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validar trees.pmtiles contra species-ids.json.")
+    parser.add_argument("pmtiles", type=Path, nargs="?", default=WEB_PUBLIC / "trees.pmtiles")
+    parser.add_argument("--diccionario", type=Path, default=None,
+                        help=f"default: {DICCIONARIO} junto al PMTiles")
+    args = parser.parse_args(argv)
+    ruta_diccionario = args.diccionario or args.pmtiles.parent / DICCIONARIO
+
+    errores, resumen = validar(args.pmtiles, ruta_diccionario)
+    print(f"{resumen['teselas']:,} teselas, {resumen['features']:,} features, "
+          f"e {'numérico' if resumen['entero'] else 'texto'}; "
+          f"{resumen['exactos']}/{resumen['especies']} especies con conteo exacto en el zoom máximo")
+    if resumen["zooms_grupos"]:
+        print(f"Capa {CAPA_GRUPOS} en zooms {', '.join(map(str, resumen['zooms_grupos']))}")
+    for error in errores[:MAX_ERRORES]:
+        print(f"  {error}")
+    if len(errores) > MAX_ERRORES:
+        print(f"  ... y {len(errores) - MAX_ERRORES:,} errores más")
+    if errores:
+        print(f"Error: {len(errores):,} problemas")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Búsqueda de árboles cercanos: k vecinos y radio, por lotes de consultas.
+
+Proyecta lat/lng a metros (equirectangular alrededor de la latitud media,
+error despreciable a escala de Montevideo) y arma un KD-tree con todos los
+árboles más uno por especie, así "la Tipa más cercana" no recorre las
+demás especies. Las consultas reciben arrays de puntos y devuelven
+matrices, vectorizadas sobre miles de puntos a la vez.
+
+El KD-tree es el de scipy (scipy.spatial.cKDTree); si scipy no está
+instalado se usa la búsqueda exhaustiva por bloques, con los mismos
+resultados pero mucho más lenta.
+
+Ejecutado como script compara el KD-tree contra la fuerza bruta:
+
+    python scripts/vecinos.py
+    python scripts/vecinos.py --consultas 5000 --k 10 --radio 100
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from metrics import Metricas, agregar_argumentos
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+BASE_DIR = Path(__file__).parent.parent
+PROCESSED_DIR = BASE_DIR / "data" / "processed"
+
+RADIO_TIERRA = 6_371_008.8
+# Consultas por bloque en la fuerza bruta (bloque x árboles distancias en memoria)
+BLOQUE_FUERZA_BRUTA = 32
+
+
+def proyectar(lat, lng, lat0):
+    """Coordenadas en metros (x hacia el este, y hacia el norte), forma (n, 2)."""
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lng = np.radians(np.asarray(lng, dtype=float))
+    return np.column_stack([lng * np.cos(np.radians(lat0)), lat]) * RADIO_TIERRA
+
+
+# ── Fuerza bruta ─────────────────────────────────────────────────────────────
+
+def knn_fuerza_bruta(puntos, consultas, k):
+    """(distancias, posiciones) de forma (m, k); inf y -1 donde no hay suficientes."""
+    m = len(consultas)
+    distancias = np.full((m, k), np.inf)
+    posiciones = np.full((m, k), -1, dtype=np.int64)
+    kk = min(k, len(puntos))
+    if kk == 0:
+        return distancias, posiciones
+    for inicio in range(0, m, BLOQUE_FUERZA_BRUTA):
+        bloque = consultas[inicio:inicio + BLOQUE_FUERZA_BRUTA]
+        d = np.hypot(bloque[:, None, 0] - puntos[None, :, 0], bloque[:, None, 1] - puntos[None, :, 1])
+        cerca = np.argpartition(d, kk - 1, axis=1)[:, :kk] if kk < len(puntos) else \
+            np.broadcast_to(np.arange(len(puntos)), (len(bloque), len(puntos)))
+        dc = np.take_along_axis(d, cerca, axis=1)
+        orden = np.argsort(dc, axis=1, kind="stable")
+        distancias[inicio:inicio + len(bloque), :kk] = np.take_along_axis(dc, orden, axis=1)
+        posiciones[inicio:inicio + len(bloque), :kk] = np.take_along_axis(cerca, orden, axis=1)
+    return distancias, posiciones
+
+
+def radio_fuerza_bruta(puntos, consultas, metros):
+    """Posiciones (ordenadas) dentro del radio, una lista por consulta."""
+    resultado = []
+    for inicio in range(0, len(consultas), BLOQUE_FUERZA_BRUTA):
+        bloque = consultas[inicio:inicio + BLOQUE_FUERZA_BRUTA]
+        d = np.hypot(bloque[:, None, 0] - puntos[None, :, 0], bloque[:, None, 1] - puntos[None, :, 1])
+        resultado += [np.flatnonzero(fila <= metros) for fila in d]
+    return resultado
+
+
+class ArbolFuerzaBruta:
+    """Misma interfaz que usa IndiceVecinos de cKDTree, por búsqueda exhaustiva."""
+
+    def __init__(self, puntos):
+        self.data = puntos
+        self.n = len(puntos)
+
+    def query(self, consultas, k):
+        distancias, posiciones = knn_fuerza_bruta(self.data, consultas, k)
+        return distancias, np.where(posiciones < 0, self.n, posiciones)
+
+    def query_ball_point(self, consultas, metros):
+        return radio_fuerza_bruta(self.data, consultas, metros)
+
+
+def construir_arbol(puntos):
+    return cKDTree(puntos) if cKDTree is not None else ArbolFuerzaBruta(puntos)
+
+
+# ── Índice ───────────────────────────────────────────────────────────────────
+
+class IndiceVecinos:
+    """KD-tree de todos los árboles y uno por especie.
+
+    Las consultas devuelven filas del array original (lat/lng con que se
+    construyó); -1 donde no hay suficientes árboles.
+    """
+
+    def __init__(self, lat, lng, especies=None):
+        lat = np.asarray(lat, dtype=float)
+        self.lat0 = float(lat.mean())
+        self.puntos = proyectar(lat, lng, self.lat0)
+        self.arbol = construir_arbol(self.puntos)
+        self.subindices = {}
+        if especies is not None:
+            codigos, nombres = pd.factorize(pd.Series(especies))
+            orden = np.argsort(codigos, kind="stable")
+            limites = np.searchsorted(codigos[orden], np.arange(len(nombres) + 1))
+            for k, nombre in enumerate(nombres):
+                filas = orden[limites[k]:limites[k + 1]]
+                self.subindices[nombre] = (filas, construir_arbol(self.puntos[filas]))
+
+    @classmethod
+    def desde_csv(cls, ruta):
+        """Índice de los árboles con coordenadas del CSV procesado; devuelve (índice, ids)."""
+        df = pd.read_csv(ruta, usecols=["Arbol", "lat", "lng", "Nombre común"], low_memory=False)
+        df = df[df["lat"].notna() & df["lng"].notna()]
+        return cls(df["lat"].to_numpy(), df["lng"].to_numpy(), df["Nombre común"]), \
+            df["Arbol"].to_numpy(dtype=np.int64)
+
+    def especies(self):
+        return list(self.subindices)
+
+    def _arbol(self, especie):
+        if especie is None:
+            return None, self.arbol
+        if especie not in self.subindices:
+            raise KeyError(f"especie sin índice: {especie}")
+        return self.subindices[especie]
+
+    def knn(self, lat, lng, k=1, especie=None):
+        """(metros, filas) de forma (m, k) para m puntos de consulta."""
+        consultas = proyectar(np.atleast_1d(lat), np.atleast_1d(lng), self.lat0)
+        filas, arbol = self._arbol(especie)
+        distancias, posiciones = arbol.query(consultas, k=k)
+        distancias = np.asarray(distancias).reshape(len(consultas), k)
+        posiciones = np.asarray(posiciones).reshape(len(consultas), k)
+        validos = posiciones < arbol.n
+        posiciones = np.where(validos, posiciones, 0)
+        if filas is not None:
+            posiciones = filas[posiciones] if len(filas) else posiciones
+        return distancias, np.where(validos, posiciones, -1)
+
+    def en_radio(self, lat, lng, metros, especie=None):
+        """Filas a menos de `metros` de cada punto de consulta (una lista por punto)."""
+        consultas = proyectar(np.atleast_1d(lat), np.atleast_1d(lng), self.lat0)
+        filas, arbol = self._arbol(especie)
+        resultado = []
+        for posiciones in arbol.query_ball_point(consultas, metros):
+            posiciones = np.sort(np.asarray(posiciones, dtype=np.int64))
+            resultado.append(posiciones if filas is None else np.sort(filas[posiciones]))
+        return resultado
+
+    def contar_en_radio(self, lat, lng, metros, especie=None):
+        """Cantidad de árboles a menos de `metros` de cada punto de consulta."""
+        consultas = proyectar(np.atleast_1d(lat), np.atleast_1d(lng), self.lat0)
+        _, arbol = self._arbol(especie)
+        if cKDTree is not None:
+            return np.asarray(arbol.query_ball_point(consultas, metros, return_length=True))
+        return np.array([len(p) for p in arbol.query_ball_point(consultas, metros)])
+
+
+# ── Benchmark ────────────────────────────────────────────────────────────────
+
+def puntos_de_consulta(lat, lng, n, semilla=42, dispersion=0.002):
+    """Puntos cerca de árboles al azar (como una ubicación en la calle)."""
+    rng = np.random.default_rng(semilla)
+    filas = rng.integers(len(lat), size=n)
+    return (lat[filas] + rng.normal(0, dispersion, n),
+            lng[filas] + rng.normal(0, dispersion, n))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de vecinos: KD-tree vs fuerza bruta.")
+    parser.add_argument("--consultas", type=int, default=2_000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--radio", type=float, default=100.0, help="radio en metros")
+    agregar_argumentos(parser)
+    args = parser.parse_args(argv)
+    metricas = Metricas.desde_args("vecinos", args)
+
+    if cKDTree is None:
+        print("Aviso: falta scipy, el índice usa fuerza bruta (la comparación no es informativa)")
+
+    with metricas.etapa("construir_indice") as etapa:
+        df = pd.read_csv(PROCESSED_DIR / "arboles_montevideo_geo.csv",
+                         usecols=["lat", "lng", "Nombre común"], low_memory=False)
+        df = df[df["lat"].notna() & df["lng"].notna()]
+        lat, lng = df["lat"].to_numpy(), df["lng"].to_numpy()
+        inicio = time.perf_counter()
+        indice = IndiceVecinos(lat, lng, df["Nombre común"])
+        construccion = time.perf_counter() - inicio
+        etapa.filas_salida = len(df)
+    print(f"{len(df):,} árboles, {len(indice.subindices)} subíndices por especie, "
+          f"construidos en {construccion:.2f}s")
+
+    qlat, qlng = puntos_de_consulta(lat, lng, args.consultas)
+    consultas = proyectar(qlat, qlng, indice.lat0)
+    especie = df["Nombre común"].value_counts().index[0]
+    filas_especie = indice.subindices[especie][0]
+
+    casos = [
+        (f"k-NN k={args.k}",
+         lambda: indice.knn(qlat, qlng, args.k),
+         lambda: knn_fuerza_bruta(indice.puntos, consultas, args.k)),
+        (f"k-NN k={args.k} ({especie})",
+         lambda: indice.knn(qlat, qlng, args.k, especie),
+         lambda: knn_fuerza_bruta(indice.puntos[filas_especie], consultas, args.k)),
+        (f"radio {args.radio:g} m",
+         lambda: indice.en_radio(qlat, qlng, args.radio),
+         lambda: radio_fuerza_bruta(indice.puntos, consultas, args.radio)),
+    ]
+
+    print(f"\n{args.consultas:,} puntos de consulta por lote")
+    print(f"{'consulta':40s} {'KD-tree':>10s} {'f. bruta':>10s} {'aceleración':>12s}  iguales")
+    for nombre, rapido, lento in casos:
+        with metricas.etapa(nombre, filas_entrada=args.consultas) as etapa:
+            inicio = time.perf_counter()
+            resultado = rapido()
+            t_rapido = time.perf_counter() - inicio
+        with metricas.etapa(f"{nombre} fuerza bruta", filas_entrada=args.consultas):
+            inicio = time.perf_counter()
+            referencia = lento()
+            t_lento = time.perf_counter() - inicio
+        if nombre.startswith("radio"):
+            iguales = all(np.array_equal(a, b) for a, b in zip(resultado, referencia))
+            etapa.extra["encontrados"] = int(sum(len(r) for r in resultado))
+        else:
+            iguales = np.allclose(resultado[0], referencia[0])
+        print(f"{nombre[:40]:40s} {t_rapido * 1000:8.1f}ms {t_lento * 1000:8.1f}ms "
+              f"{t_lento / t_rapido:11.0f}x  {'sí' if iguales else 'NO'}")
+
+    metricas.guardar(args.metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,19 @@ import createNextIntlPlugin from 'next-intl/plugin';
 const withNextIntl = createNextIntlPlugin('./src/i18n/request.ts');
 
 const nextConfig: NextConfig = {
-  /* config options here */
+  async headers() {
+    return [
+      {
+        // Content-hashed data files (scripts/hash_assets.py) never change
+        source: '/:file([^/]+\\.[0-9a-f]{8}\\.(?:pmtiles|json|json\\.gz|bin))',
+        headers: [{ key: 'Cache-Control', value: 'public, max-age=31536000, immutable' }],
+      },
+      {
+        source: '/:file(sw\\.js|assets-manifest\\.json)',
+        headers: [{ key: 'Cache-Control', value: 'no-cache' }],
+      },
+    ];
+  },
 };
 
 export default withNextIntl(nextConfig);
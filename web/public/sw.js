@@ -1,14 +1,25 @@
+// <assets> Generated by scripts/hash_assets.py from assets-manifest.json
 const CACHE_NAME = 'arboles-mvd-v1';
-const STATIC_ASSETS = [
-  '/',
+const HASHED_ASSETS = {};
+// </assets>
+
+// Content-hashed data files never change: they live in their own cache and
+// survive deploys; only files that are no longer in the manifest are evicted.
+const ASSETS_CACHE = 'arboles-mvd-assets';
+// Unhashed data files, precached only when hash_assets.py has not run
+const DATA_ASSETS = [
   '/trees.pmtiles',
   '/trees-data.json.gz',
   '/species.json',
   '/species-counts.json',
-  '/species-metadata.json',
+  '/species-metadata.json'
+];
+const STATIC_ASSETS = [
+  '/',
   '/icons/icon-192.png',
   '/icons/icon-512.png',
-  '/icons/apple-touch-icon.png'
+  '/icons/apple-touch-icon.png',
+  ...(Object.keys(HASHED_ASSETS).length === 0 ? DATA_ASSETS : [])
 ];
 
 // Install: precache static assets
@@ -19,6 +30,7 @@ self.addEventListener('install', (event) => {
         console.log('[SW] Caching static assets');
         return cache.addAll(STATIC_ASSETS);
       })
+      .then(() => precacheHashedAssets())
       .then(() => self.skipWaiting())
   );
 });
@@ -29,13 +41,15 @@ self.addEventListener('activate', (event) => {
     caches.keys().then((cacheNames) => {
       return Promise.all(
         cacheNames
-          .filter((name) => name !== CACHE_NAME)
+          .filter((name) => name !== CACHE_NAME && name !== ASSETS_CACHE)
           .map((name) => {
             console.log('[SW] Deleting old cache:', name);
             return caches.delete(name);
           })
       );
-    }).then(() => self.clients.claim())
+    })
+      .then(() => evictStaleHashedAssets())
+      .then(() => self.clients.claim())
   );
 });
 
@@ -48,6 +62,29 @@ self.addEventListener('fetch', (event) => {
     return;
   }
 
+  // Data files: serve the current content-hashed version from its cache
+  const hashedPath = HASHED_ASSETS[url.pathname] ||
+    (Object.values(HASHED_ASSETS).includes(url.pathname) ? url.pathname : null);
+  if (url.origin === self.location.origin && hashedPath) {
+    event.respondWith(
+      caches.open(ASSETS_CACHE).then((cache) =>
+        cache.match(hashedPath).then((cached) => {
+          if (cached) {
+            return cached;
+          }
+          // Keep the original headers (pmtiles sends Range requests)
+          return fetch(new Request(hashedPath, { headers: event.request.headers })).then((response) => {
+            if (response.status === 200) {
+              cache.put(hashedPath, response.clone());
+            }
+            return response;
+          });
+        })
+      )
+    );
+    return;
+  }
+
   // Cache-first for static assets
   if (isStaticAsset(url.pathname)) {
     event.respondWith(
@@ -95,6 +132,32 @@ self.addEventListener('fetch', (event) => {
   // These will fail when offline, which the app handles gracefully
 });
 
+function precacheHashedAssets() {
+  return caches.open(ASSETS_CACHE).then((cache) =>
+    Promise.all(
+      Object.values(HASHED_ASSETS).map((path) =>
+        cache.match(path).then((cached) => cached || cache.add(path))
+      )
+    )
+  );
+}
+
+function evictStaleHashedAssets() {
+  const current = new Set(Object.values(HASHED_ASSETS));
+  return caches.open(ASSETS_CACHE).then((cache) =>
+    cache.keys().then((requests) =>
+      Promise.all(
+        requests
+          .filter((request) => !current.has(new URL(request.url).pathname))
+          .map((request) => {
+            console.log('[SW] Evicting stale asset:', request.url);
+            return cache.delete(request);
+          })
+      )
+    )
+  );
+}
+
 function isStaticAsset(pathname) {
   return STATIC_ASSETS.includes(pathname) ||
     pathname.endsWith('.pmtiles') ||